@@ -1,3 +1,4 @@
+import os
 import random
 from dotenv import load_dotenv
 import matplotlib.figure
@@ -7,8 +8,12 @@ import plotly.tools as tls
 
 import streamlit as st
 from src.modals.app_data import AppResult
+from src.modals.llm_data import TasksTag
+from src.modals.vectordb_data import IngestProgress
 from src.vectordb import VectorDBSession
-from src.app_workflow import generate_response
+from src.app_workflow import SPECULATIVE_CANDIDATES, generate_response
+from src.code_executor.sandbox import SANDBOX_ENABLED, get_sandbox_pool
+from src.code_executor.serialization import is_plotly_figure
 
 from src.utils.logger import get_module_logger
 from src.utils.commons import download_file
@@ -29,6 +34,10 @@ if 'vector_db' not in st.session_state:
 if 'processed_files' not in st.session_state:
     st.session_state['processed_files'] = set()
 
+# Warm up sandbox workers before the first query needs them, speculative candidates run there too
+if SANDBOX_ENABLED or SPECULATIVE_CANDIDATES > 1:
+    get_sandbox_pool()
+
 # Initialize chat history
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -71,13 +80,34 @@ urls = st.text_input("Source URLs for data separated by ,")
 uploaded_files = st.file_uploader(
     "Choose files",
     accept_multiple_files=True,
-    type=['csv', 'log', 'zip', 'json']
+    type=['csv', 'log', 'zip', 'json', 'jsonl']
 )
 
 
+def write_timings(content: AppResult):
+    '''Breakdown of time spent in each stage of the response.'''
+    depths = {}
+    rows = []
+    for span in content.trace:
+        depth = depths.get(span.parent_span_id, -1) + 1
+        depths[span.span_id] = depth
+        rows.append({
+            "Stage": "\u2003" * depth + span.name,
+            "Time (ms)": round(span.duration_ms, 1),
+            "Prompt tokens": span.attributes.get("prompt_tokens"),
+            "Completion tokens": span.attributes.get("completion_tokens"),
+            "Retries": span.attributes.get("retries"),
+            "Cache hit": span.attributes.get("cache_hit"),
+        })
+    with st.expander("Timings"):
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+
 def write_assistant_output(content: AppResult):
     if content.generation_status is False:
         st.error(body=content.message, icon='🚨')
+        if len(content.trace) > 0:
+            write_timings(content)
     else:
         st.markdown(f"**Question**: *{content.user_prompt.strip()}*")
 
@@ -91,6 +121,9 @@ def write_assistant_output(content: AppResult):
         elif isinstance(content.model_result, matplotlib.figure.Figure):
             fig = tls.mpl_to_plotly(content.model_result)
             st.plotly_chart(fig, use_container_width=True)
+        elif is_plotly_figure(content.model_result):
+            # Cached figures are plotly specs
+            st.plotly_chart(content.model_result, use_container_width=True)
         else:
             st.write(content.model_result)
 
@@ -101,26 +134,43 @@ def write_assistant_output(content: AppResult):
                     for metadata in vectordb_session.fetch_metadata_by_ids(content.file_metadata_ids):
                         markdown_res += f'- {metadata.id}: {metadata.file_name}\n'
                     st.markdown(markdown_res)
-                st.code(content.code)
+                st.code(content.code, language=content.code_language)
+
+        if len(content.trace) > 0:
+            write_timings(content)
 
 
 with st.spinner():
-    # Ingest current data into vectordb session
+    # Ingest current data into vectordb session, all new files in one batch
+    new_files, new_names = [], []
     if len(urls) > 0:
         for url in urls.split(","):
             if url not in st.session_state['processed_files']:
                 filename = download_file(url)
                 with open(filename, "rb") as fobj:
-                    vectordb_session.add_file(filename, fobj.read())
-                    st.session_state['processed_files'].add(url)
+                    new_files.append((filename, fobj.read()))
+                new_names.append(url)
 
     for file in uploaded_files:
         if file.name not in st.session_state['processed_files']:
-            vectordb_session.add_file(
-                file_name=file.name,
-                file_bytes=file.read()
+            new_files.append((file.name, file.read()))
+            new_names.append(file.name)
+
+    if len(new_files) > 0:
+        progress_bar = st.progress(0.0, text="Ingesting files...")
+
+        def show_progress(progress: IngestProgress):
+            status = "Failed" if progress.error is not None else "Ingested"
+            progress_bar.progress(
+                progress.done / progress.total,
+                text=f"{status} {progress.file_name} ({progress.done}/{progress.total})"
             )
-            st.session_state['processed_files'].add(file.name)
+
+        _, failures = vectordb_session.add_files(new_files, progress_cb=show_progress)
+        progress_bar.empty()
+        for file_path, error in failures:
+            st.warning(f"Unable to ingest {os.path.basename(file_path)}: {error}")
+        st.session_state['processed_files'].update(new_names)
 
 
 # Display chat messages from history on app rerun
@@ -142,23 +192,41 @@ if prompt := st.chat_input("Type your message..."):
 
     response = None
 
-    # Bring immediate previous message into context
-    # if prompt starts with "@prev "
-    if prompt.strip().startswith("@prev "):
-        previous_ai_response = st.session_state.messages[-2]['content']
-        response = generate_response(
-            code=previous_ai_response.code,
-            user_query=prompt.replace("@prev ", " ").strip(),
-            vector_db=vectordb_session,
-            file_metadata_ids=previous_ai_response.file_metadata_ids
-        )
-    else:
-        response = generate_response(
-            user_query=prompt,
-            vector_db=vectordb_session
-        )
-    # Display assistant response in chat message container
     with st.chat_message("assistant"):
+        # Render code and summary as they are streamed, replaced by the final output below.
+        stream_container = st.empty()
+        with stream_container.container():
+            code_placeholder = st.empty()
+            message_placeholder = st.empty()
+
+        def render_stream(tag: TasksTag, partial: str):
+            if tag == TasksTag.summarizer:
+                message_placeholder.write(partial)
+            else:
+                language = "sql" if tag in [TasksTag.sql_solver, TasksTag.sql_refinement] else "python"
+                code_placeholder.code(partial, language=language)
+
+        # Bring immediate previous message into context
+        # if prompt starts with "@prev "
+        if prompt.strip().startswith("@prev "):
+            previous_ai_response = st.session_state.messages[-2]['content']
+            response = generate_response(
+                code=previous_ai_response.code,
+                user_query=prompt.replace("@prev ", " ").strip(),
+                vector_db=vectordb_session,
+                file_metadata_ids=previous_ai_response.file_metadata_ids,
+                stream_cb=render_stream,
+                code_language=previous_ai_response.code_language
+            )
+        else:
+            response = generate_response(
+                user_query=prompt,
+                vector_db=vectordb_session,
+                stream_cb=render_stream
+            )
+
+        # Display assistant response in chat message container
+        stream_container.empty()
         write_assistant_output(response)
 
     # Add assistant response to chat history
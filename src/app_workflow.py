@@ -1,47 +1,137 @@
+import os
+import re
+import threading
+import contextvars
+import concurrent.futures
+from collections import Counter
+from functools import partial
+
 import pandas as pd
-from matplotlib.figure import Figure
 
-from typing import Any, List
+from typing import Any, Callable, Dict, List, Tuple
 
-from src.code_executor.local_executor import executor
+from src.code_executor.local_executor import executor, df_source_path
+from src.code_executor.df_cache import DataFrameCache
+from src.code_executor.sandbox import SANDBOX_ENABLED, sandbox_executor
+from src.code_executor.result_cache import SOLVER_CACHE, SOLVER_CACHE_ENABLED, make_solver_cache_key
+from src.code_executor.serialization import is_figure
+from src.code_executor.sql_executor import SQL_ENGINE_AVAILABLE, SQL_FILE_FORMATS, sql_executor
+from src.code_executor.code_validator import CODE_VALIDATION_ENABLED, validate_code
 from src.vectordb import VectorDBSession
 
 from src.modals.app_data import AppResult, CODE_EXECUTION_RETRIES
-from src.modals.file_types.base import FileMetadata
-from src.modals.llm_data import TasksTag
+from src.modals.file_types.base import FileMetadata, FileDataFormat
+from src.modals.llm_data import TasksTag, ModelResponse
+from src.modals.vectordb_data import ScoredFileMetadata
 
 from src.utils.logger import get_module_logger
+from src.utils.config import get_env_float, get_env_int, get_env_str
+from src.utils import tracing
 
 from src.llm.llm_executor import LLMTaskExecutor
+from src.llm.event_loop import submit
+from src.llm.llm_task import LLMTask
 
-from src.llm.tasks.data_for_task import DataForTask
+from src.llm.tasks.data_for_task import DataForTask, BatchDataForTask
 from src.llm.tasks.code_solver import CodeSolver
 from src.llm.tasks.code_refinement import CodeRefinement
+from src.llm.tasks.sql_solver import SQLSolver, SQLRefinement
 from src.llm.tasks.summarizer import Summarizer
 
 logger = get_module_logger(__name__)
 
+# Check relevance of candidate files in a single LLM call when there are at least these many.
+BATCH_RELEVANCE_MIN_FILES = 2
+
+# Vector search distance bands (Chroma's default squared L2, 0 is identical).
+# Files closer than ACCEPT are used without an LLM check, files farther than REJECT
+# are dropped and only the band in between is sent to DataForTask.
+RELEVANCE_ACCEPT_DISTANCE = get_env_float('RELEVANCE_ACCEPT_DISTANCE', 0.6)
+RELEVANCE_REJECT_DISTANCE = get_env_float('RELEVANCE_REJECT_DISTANCE', 1.6)
+
+# How often each relevance path was taken, per candidate file.
+RELEVANCE_PATH_COUNTS = Counter()
+_relevance_counts_lock = threading.Lock()
+
+# Number of CodeSolver candidates generated and run in parallel, the first one
+# to execute successfully wins. 1 disables speculative code generation.
+# Candidates always run in sandbox workers, so they run in parallel processes.
+SPECULATIVE_CANDIDATES = get_env_int('SPECULATIVE_CANDIDATES', 1)
+# Temperature of the most diverse candidate, the first one always uses default sampling.
+SPECULATIVE_MAX_TEMPERATURE = get_env_float('SPECULATIVE_MAX_TEMPERATURE', 0.8)
+
+# "pandas" generates Python code, "sql" DuckDB queries and "auto" picks per query:
+# SQL for questions over large tabular files which don't ask for a plot.
+SOLVER_BACKEND = get_env_str('SOLVER_BACKEND', 'auto')
+# Total size of data files from which "auto" answers with SQL.
+SQL_AUTO_MIN_BYTES = get_env_int('SQL_AUTO_MIN_BYTES', 32 * 1024 * 1024)
+PLOT_QUERY_PATTERN = re.compile(r"\b(plot|chart|graph|draw|visuali[sz]e|histogram)", re.IGNORECASE)
+
+# Receives (task tag, partial output) while a response is streamed.
+StreamCallback = Callable[[TasksTag, str], None]
+
 
 def generate_response(
     user_query: str,
     vector_db: VectorDBSession,
     code: str = None,
-    file_metadata_ids: List[str] = None
+    file_metadata_ids: List[str] = None,
+    stream_cb: StreamCallback = None,
+    code_language: str | None = None
 ) -> AppResult:
     '''
-    Response to return back to user query
+    Response to return back to user query.
+    Pass 'stream_cb' to receive the generated code and summary as they are streamed,
+    and 'code_language' of a given 'code' ("python" or "sql") to refine it.
+    Time spent in each stage is recorded in AppResult.trace.
     '''
+    with tracing.start_trace("generate_response", query=user_query) as trace:
+        result = run_response_pipeline(
+            user_query=user_query,
+            vector_db=vector_db,
+            code=code,
+            file_metadata_ids=file_metadata_ids,
+            stream_cb=stream_cb,
+            code_language=code_language,
+        )
+    result.trace = trace.finished_spans()
+    return result
+
+
+def run_response_pipeline(
+    user_query: str,
+    vector_db: VectorDBSession,
+    code: str = None,
+    file_metadata_ids: List[str] = None,
+    stream_cb: StreamCallback = None,
+    code_language: str | None = None
+) -> AppResult:
     filtered_results = None
 
     if file_metadata_ids is None:
         # Fetch results from Vector DB
-        vectordb_results = vector_db.query(
-            query_text=user_query
-        )
+        with tracing.span("vector_db.query") as span:
+            vectordb_results = vector_db.query(
+                query_text=user_query
+            )
+            span.attributes["results"] = len(vectordb_results)
         logger.info("Number of metadata files retrieved: %d", len(vectordb_results))
 
-        # Filter out VectorDB results
-        filtered_results = filter_vectordb_results_by_llm(user_query, vectordb_results)
+        # Skip LLM checks for clearly close and clearly far files
+        accepted_results, ambiguous_results = triage_vectordb_results(vectordb_results)
+
+        # Filter out ambiguous VectorDB results
+        relevant_ids = set(metadata.id for metadata in accepted_results)
+        if len(ambiguous_results) > 0:
+            with tracing.span("data_for_task", candidates=len(ambiguous_results)) as span:
+                relevant_results = filter_vectordb_results_by_llm(user_query, ambiguous_results)
+                span.attributes["relevant"] = len(relevant_results)
+            relevant_ids.update(metadata.id for metadata in relevant_results)
+
+        filtered_results = [
+            result.file_metadata for result in vectordb_results
+            if result.file_metadata.id in relevant_ids
+        ]
         logger.info("Number of metadata files after filtering: %d", len(filtered_results))
     else:
         filtered_results = vector_db.fetch_metadata_by_ids(ids=file_metadata_ids)
@@ -58,13 +148,64 @@ def generate_response(
         user_query=user_query,
         code=code,
         metadatas=filtered_results,
+        stream_cb=stream_cb,
+        df_cache=vector_db.df_cache,
+        code_language=code_language,
     )
 
 
+def triage_vectordb_results(
+    results: List[ScoredFileMetadata]
+) -> Tuple[List[FileMetadata], List[FileMetadata]]:
+    '''
+    Splits vector search results by distance into files accepted outright
+    and ambiguous files which need an LLM relevance check. Far files are dropped.
+    '''
+    accepted, ambiguous = [], []
+    counts = Counter()
+
+    for result in results:
+        if result.distance <= RELEVANCE_ACCEPT_DISTANCE:
+            accepted.append(result.file_metadata)
+            counts['accepted'] += 1
+        elif result.distance > RELEVANCE_REJECT_DISTANCE:
+            counts['rejected'] += 1
+        else:
+            ambiguous.append(result.file_metadata)
+            counts['llm_checked'] += 1
+
+    with _relevance_counts_lock:
+        RELEVANCE_PATH_COUNTS.update(counts)
+
+    logger.debug(
+        "Relevance triage distances: %s",
+        [(result.file_metadata.id, round(result.distance, 3)) for result in results]
+    )
+    return accepted, ambiguous
+
+
+def get_relevance_path_counts() -> Dict[str, int]:
+    '''Returns how often files were accepted, rejected or sent to the LLM check.'''
+    with _relevance_counts_lock:
+        return dict(RELEVANCE_PATH_COUNTS)
+
+
 def filter_vectordb_results_by_llm(user_query: str, results: List[FileMetadata]):
     '''
     Removes metadata that are not relevant to the query.
+    Candidates are checked in one batched call, falling back to a call per file
+    when the batched answer can't be parsed.
     '''
+    if len(results) >= BATCH_RELEVANCE_MIN_FILES:
+        try:
+            model_response = LLMTaskExecutor().execute(BatchDataForTask(
+                file_metadatas=results,
+                query=user_query
+            ))
+            return model_response.items
+        except ValueError as error:
+            logger.warning("Unable to parse batched relevance check, checking per file: %s", error)
+
     llm_executor = LLMTaskExecutor()
 
     for metadata_result in results:
@@ -85,40 +226,103 @@ def filter_vectordb_results_by_llm(user_query: str, results: List[FileMetadata])
     return results
 
 
-def generate_code(user_query: str, results: List[FileMetadata]):
+def run_llm_task(task: LLMTask, stream_cb: StreamCallback = None) -> ModelResponse:
+    '''Runs a single task, streaming partial output to 'stream_cb' when given.'''
     llm_executor = LLMTaskExecutor()
 
-    llm_executor.add_task(CodeSolver(
-        file_metadatas=results,
-        query=user_query
-    ))
+    if stream_cb is not None:
+        tag = task.tags[0]
+        return llm_executor.execute_stream(
+            task, on_partial=lambda partial: stream_cb(tag, partial)
+        )
 
+    llm_executor.add_task(task)
     llm_executor.run_tasks()
-    model_response = llm_executor.fetch_results()[0]
+    return llm_executor.fetch_results()[0]
 
-    return model_response.text
 
+def generate_code(user_query: str, results: List[FileMetadata], stream_cb: StreamCallback = None):
+    with tracing.span("code_solver"):
+        model_response = run_llm_task(CodeSolver(
+            file_metadatas=results,
+            query=user_query
+        ), stream_cb)
 
-def improve_code(code: str, user_query: str, results: List[FileMetadata]):
-    llm_executor = LLMTaskExecutor()
+    return model_response.text
 
-    llm_executor.add_task(CodeRefinement(
-        code=code,
-        file_metadatas=results,
-        query=user_query
-    ))
 
-    llm_executor.run_tasks()
-    model_response = llm_executor.fetch_results()[0]
+def improve_code(code: str, user_query: str, results: List[FileMetadata], stream_cb: StreamCallback = None):
+    with tracing.span("code_refinement"):
+        model_response = run_llm_task(CodeRefinement(
+            code=code,
+            file_metadatas=results,
+            query=user_query
+        ), stream_cb)
 
     return model_response.text
 
 
-def code_feedback_loop(user_query: str, metadatas: List[FileMetadata], code: str = None) -> AppResult:
+def choose_solver_backend(
+    user_query: str,
+    metadatas: List[FileMetadata],
+    code_language: str | None = None
+) -> str:
+    '''Returns "sql" or "pandas" for the query, see SOLVER_BACKEND.'''
+    if code_language is not None:
+        return "sql" if code_language == "sql" and SQL_ENGINE_AVAILABLE else "pandas"
+    if SOLVER_BACKEND == "pandas" or not SQL_ENGINE_AVAILABLE:
+        return "pandas"
+    if any(metadata.file_format not in SQL_FILE_FORMATS for metadata in metadatas):
+        return "pandas"
+    if SOLVER_BACKEND == "sql":
+        return "sql"
+
+    # Nested JSON is better served by jq, plots need matplotlib
+    if any(metadata.file_format == FileDataFormat.JSON for metadata in metadatas):
+        return "pandas"
+    if PLOT_QUERY_PATTERN.search(user_query) is not None:
+        return "pandas"
+    try:
+        data_size = sum(os.path.getsize(df_source_path(metadata)) for metadata in metadatas)
+    except OSError:
+        return "pandas"
+    return "sql" if data_size >= SQL_AUTO_MIN_BYTES else "pandas"
+
+
+def code_feedback_loop(
+    user_query: str,
+    metadatas: List[FileMetadata],
+    code: str = None,
+    stream_cb: StreamCallback = None,
+    df_cache: DataFrameCache | None = None,
+    code_language: str | None = None
+) -> AppResult:
     '''
     Method to run error feedback loop to generate valid code.
     It uses ReAct strategy to improve code with refinement.
     '''
+    backend = choose_solver_backend(user_query, metadatas, code_language if code is not None else None)
+    with tracing.span("code_feedback_loop", attempts=0, backend=backend):
+        if backend == "sql":
+            result = run_sql_feedback_loop(user_query, metadatas, code, stream_cb)
+            # Fall back to pandas when no working query could be generated
+            if result.generation_status or code is not None or SOLVER_BACKEND == "sql":
+                return result
+            logger.info("SQL solver failed, falling back to pandas: %s", result.message)
+            tracing.set_attributes(backend="pandas")
+
+        if code is None and SPECULATIVE_CANDIDATES > 1:
+            return speculative_code_feedback_loop(user_query, metadatas, stream_cb, df_cache)
+        return run_code_feedback_loop(user_query, metadatas, code, stream_cb, df_cache)
+
+
+def run_code_feedback_loop(
+    user_query: str,
+    metadatas: List[FileMetadata],
+    code: str = None,
+    stream_cb: StreamCallback = None,
+    df_cache: DataFrameCache | None = None
+) -> AppResult:
     retries_left = CODE_EXECUTION_RETRIES
     code_error = None
 
@@ -127,14 +331,16 @@ def code_feedback_loop(user_query: str, metadatas: List[FileMetadata], code: str
         # code solver task
         code = generate_code(
             user_query,
-            metadatas
+            metadatas,
+            stream_cb
         )
     else:
         # code refinment llm task
         code = improve_code(
             code,
             user_query,
-            metadatas
+            metadatas,
+            stream_cb
         )
 
     while retries_left != 0:
@@ -142,17 +348,15 @@ def code_feedback_loop(user_query: str, metadatas: List[FileMetadata], code: str
             logger.debug("Code Generated: %s", code)
 
             # 2. Try to run the generated code
-            code_result = executor(
-                code=code,
-                file_metadatas=metadatas
-            )
+            code, code_result = run_validated_code(code, metadatas, df_cache)
 
             # Code execution had no errors
 
             # 3. Generate a small summary on the result
             message = generate_data_summary(
                 code_result=code_result,
-                user_query=user_query
+                user_query=user_query,
+                stream_cb=stream_cb
             )
 
             return AppResult(
@@ -170,8 +374,9 @@ def code_feedback_loop(user_query: str, metadatas: List[FileMetadata], code: str
             # Try to generate code to fix user error.
             code = improve_code(
                 code,
-                f'{user_query}.\n\nCode Error: "{str(error)}"\n\nFix the issue.',
-                metadatas
+                code_error_query(user_query, error),
+                metadatas,
+                stream_cb
             )
             retries_left -= 1
 
@@ -184,7 +389,265 @@ def code_feedback_loop(user_query: str, metadatas: List[FileMetadata], code: str
     )
 
 
-def generate_data_summary(code_result: Any, user_query):
+def run_sql_feedback_loop(
+    user_query: str,
+    metadatas: List[FileMetadata],
+    sql: str = None,
+    stream_cb: StreamCallback = None
+) -> AppResult:
+    '''Same as run_code_feedback_loop() with SQL queries run by DuckDB.'''
+    retries_left = CODE_EXECUTION_RETRIES
+    sql_error = None
+
+    with tracing.span("sql_solver" if sql is None else "sql_refinement"):
+        if sql is None:
+            task = SQLSolver(file_metadatas=metadatas, query=user_query)
+        else:
+            task = SQLRefinement(code=sql, file_metadatas=metadatas, query=user_query)
+        sql = run_llm_task(task, stream_cb).text
+
+    while retries_left != 0:
+        try:
+            logger.debug("SQL Generated: %s", sql)
+
+            tracing.increment_attribute("attempts")
+            with tracing.span("sql_executor"):
+                sql_result = sql_executor(sql, metadatas)
+
+            message = generate_data_summary(
+                code_result=sql_result,
+                user_query=user_query,
+                stream_cb=stream_cb
+            )
+
+            return AppResult(
+                message=message,
+                user_prompt=user_query,
+                code=sql,
+                code_language="sql",
+                generation_status=True,
+                model_result=sql_result,
+                file_metadata_ids=[metadata.id for metadata in metadatas]
+            )
+
+        except Exception as error:
+            sql_error = error
+            logger.error("Found issue while executing SQL: %s", str(error))
+            with tracing.span("sql_refinement"):
+                sql = run_llm_task(SQLRefinement(
+                    code=sql,
+                    file_metadatas=metadatas,
+                    query=code_error_query(user_query, error)
+                ), stream_cb).text
+            retries_left -= 1
+
+    logger.error("All SQL generation retries completed.")
+    return AppResult(
+        user_prompt=user_query,
+        message="Generated SQL did not execute successfully.\n Latest Error:" + str(sql_error),
+        code=sql,
+        code_language="sql",
+        generation_status=False
+    )
+
+
+def code_error_query(user_query: str, error: Exception) -> str:
+    return f'{user_query}.\n\nCode Error: "{str(error)}"\n\nFix the issue.'
+
+
+def candidate_sampling_params(idx: int, candidates: int) -> Dict[str, Any] | None:
+    '''Spreads temperature of candidates from default sampling up to SPECULATIVE_MAX_TEMPERATURE.'''
+    if idx == 0:
+        return None
+    return {"temperature": round(SPECULATIVE_MAX_TEMPERATURE * idx / (candidates - 1), 2)}
+
+
+def run_validated_code(
+    code: str,
+    metadatas: List[FileMetadata],
+    df_cache: DataFrameCache | None = None,
+    sandbox: bool = SANDBOX_ENABLED,
+    cancel: threading.Event | None = None
+) -> Tuple[str, Any]:
+    '''
+    Checks the code statically before running it, so issues found by the check cost
+    no execution. Returns the code, with trivial issues fixed, and its result.
+    '''
+    if CODE_VALIDATION_ENABLED:
+        with tracing.span("code_validation") as span:
+            fixed_code = validate_code(code, metadatas)
+            span.attributes["fixed"] = fixed_code != code
+        code = fixed_code
+    return code, run_code(code, metadatas, df_cache, sandbox, cancel)
+
+
+def run_code(
+    code: str,
+    metadatas: List[FileMetadata],
+    df_cache: DataFrameCache | None = None,
+    sandbox: bool = SANDBOX_ENABLED,
+    cancel: threading.Event | None = None
+) -> Any:
+    '''
+    Runs the code in a sandbox worker when 'sandbox', in the app process otherwise.
+    Setting 'cancel' stops code running in a sandbox worker.
+    '''
+    tracing.increment_attribute("attempts")
+    run = partial(sandbox_executor, cancel=cancel) if sandbox else executor
+    try:
+        with tracing.span("executor", sandbox=sandbox) as span:
+            # Same code on unchanged data gives the same result
+            cache_key = make_solver_cache_key(code, metadatas) if SOLVER_CACHE_ENABLED else None
+            if cache_key is not None:
+                found, code_result = SOLVER_CACHE.get(cache_key)
+                span.attributes["cache_hit"] = found
+                if found:
+                    return code_result
+
+            code_result = run(
+                code=code,
+                file_metadatas=metadatas,
+                df_cache=df_cache
+            )
+            if cache_key is not None:
+                SOLVER_CACHE.set(cache_key, code_result)
+            return code_result
+    finally:
+        if df_cache is not None:
+            logger.debug("DataFrame cache: %s", df_cache.stats())
+        logger.debug("Solver result cache: %s", SOLVER_CACHE.stats())
+
+
+def race_code_candidates(
+    tasks: List[LLMTask],
+    metadatas: List[FileMetadata],
+    df_cache: DataFrameCache | None = None
+) -> Tuple[str | None, Any, List[Tuple[str, Exception]]]:
+    '''
+    Generates code for all tasks concurrently and runs each candidate as soon as it's ready.
+    Returns code and result of the first successful candidate along with the failed ones,
+    code still being generated, waiting or running is cancelled once there is a winner.
+    '''
+    failures = []
+    seen_code = set()
+    # Future to its candidate code, None while the code is being generated
+    pending: Dict[concurrent.futures.Future, str | None] = {}
+    # Stops candidates still running in sandbox workers once there is a winner
+    cancel = threading.Event()
+
+    # Candidates run in sandbox workers even when the sandbox is disabled for other code:
+    # separate processes run them in parallel, while the local executor shares pyplot state
+    # between threads and could only run them one at a time.
+    code_runner = concurrent.futures.ThreadPoolExecutor(len(tasks), thread_name_prefix="daita-candidate")
+
+    for task in tasks:
+        pending[submit(LLMTaskExecutor().execute_async(task))] = None
+
+    try:
+        while len(pending) != 0:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                code = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as error:
+                    if code is None:
+                        logger.warning("Unable to generate code candidate: %s", error)
+                    else:
+                        logger.info("Code candidate failed: %s", error)
+                        failures.append((code, error))
+                    continue
+
+                if code is not None:
+                    # Result of run_validated_code, with the code as it was run
+                    code, result = result
+                    return code, result, failures
+
+                # Identical candidates would fail (or pass) alike, run them once.
+                if result.text in seen_code:
+                    continue
+                seen_code.add(result.text)
+                pending[code_runner.submit(
+                    contextvars.copy_context().run,
+                    run_validated_code, result.text, metadatas, df_cache, True, cancel
+                )] = result.text
+
+        return None, None, failures
+    finally:
+        cancel.set()
+        for future in pending:
+            future.cancel()
+        code_runner.shutdown(wait=False, cancel_futures=True)
+
+
+def speculative_code_feedback_loop(
+    user_query: str,
+    metadatas: List[FileMetadata],
+    stream_cb: StreamCallback = None,
+    df_cache: DataFrameCache | None = None
+) -> AppResult:
+    '''
+    Variant of code_feedback_loop which generates SPECULATIVE_CANDIDATES solutions with
+    varied sampling at once, only candidates that failed go through refinement rounds.
+    '''
+    tasks = [
+        CodeSolver(
+            file_metadatas=metadatas,
+            query=user_query,
+            sampling_params=candidate_sampling_params(idx, SPECULATIVE_CANDIDATES)
+        )
+        for idx in range(SPECULATIVE_CANDIDATES)
+    ]
+    failures = []
+
+    for round_idx in range(CODE_EXECUTION_RETRIES + 1):
+        with tracing.span("speculative_round", round=round_idx, candidates=len(tasks)):
+            code, code_result, failures = race_code_candidates(tasks, metadatas, df_cache)
+
+        if code is not None:
+            logger.debug("Code Generated: %s", code)
+            if stream_cb is not None:
+                stream_cb(TasksTag.code_solver, code)
+
+            message = generate_data_summary(
+                code_result=code_result,
+                user_query=user_query,
+                stream_cb=stream_cb
+            )
+
+            return AppResult(
+                message=message,
+                user_prompt=user_query,
+                code=code,
+                generation_status=True,
+                model_result=code_result,
+                file_metadata_ids=[metadata.id for metadata in metadatas]
+            )
+
+        if len(failures) == 0:
+            break
+
+        # Try to fix each of the failed candidates.
+        tasks = [
+            CodeRefinement(
+                code=failed_code,
+                file_metadatas=metadatas,
+                query=code_error_query(user_query, error)
+            )
+            for failed_code, error in failures
+        ]
+
+    logger.error("All speculative code generation rounds completed.")
+    code, code_error = failures[-1] if len(failures) > 0 else ("", "No code could be generated.")
+    return AppResult(
+        user_prompt=user_query,
+        message="Generated code did not execute successfully.\n Latest Error:" + str(code_error),
+        code=code,
+        generation_status=False
+    )
+
+
+def generate_data_summary(code_result: Any, user_query, stream_cb: StreamCallback = None):
     '''
     Based on the result from model, try to generate a small caption on the generated data.
     '''
@@ -199,7 +662,7 @@ def generate_data_summary(code_result: Any, user_query):
             if r > 10 or c > 10:
                 return None
             data = data.to_string(index=False)
-        elif isinstance(code_result, Figure):
+        elif is_figure(code_result):
             # TODO: Use vision LLM to convert
             return None
         else:
@@ -211,15 +674,11 @@ def generate_data_summary(code_result: Any, user_query):
             return
 
         # Run Summarizer
-        llm_executor = LLMTaskExecutor()
-
-        llm_executor.add_task(Summarizer(
-            data=data,
-            user_query=user_query
-        ))
-
-        llm_executor.run_tasks()
-        model_response = llm_executor.fetch_results()[0]
+        with tracing.span("summarizer"):
+            model_response = run_llm_task(Summarizer(
+                data=data,
+                user_query=user_query
+            ), stream_cb)
 
         return model_response.text
 
@@ -0,0 +1,104 @@
+'''
+Offline benchmark of the generate_response pipeline against the stand-in LLM server.
+
+Usage:
+    python -m src.benchmark --files examples/data/csv/weather.csv --queries "max temperature" --runs 20
+    python -m src.benchmark --replay recordings.jsonl --latency lognormal:-1,0.5 --fault-429 0.05 ...
+
+LLM, solver result and DataFrame caches are disabled so every run measures the whole
+pipeline, --warm-cache keeps them on. Responses are never cached outside of the run.
+'''
+import os
+import time
+import tempfile
+import argparse
+import statistics
+import concurrent.futures
+from typing import List
+
+from src.llm.stand_in_server import StandInLLM, start_server
+from src.utils.logger import get_module_logger
+
+
+logger = get_module_logger(__name__)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def configure_caches(cache_dir: str, warm_cache: bool):
+    '''Must run before the late imports, cache settings are read when their modules load.'''
+    os.environ['LLM_CACHE_PATH'] = os.path.join(cache_dir, "llm_cache.sqlite3")
+    if not warm_cache:
+        os.environ['LLM_CACHE_ENABLED'] = "false"
+        os.environ['SOLVER_CACHE_ENABLED'] = "false"
+        os.environ['DF_CACHE_MAX_BYTES'] = "0"
+
+
+def run_benchmark(files: List[str], queries: List[str], runs: int, concurrency: int) -> List[float]:
+    '''Ingests files in one session and returns latency of each generate_response call.'''
+    # Imported late so the stand-in endpoint is configured before clients are created.
+    from src.vectordb import VectorDBSession
+    from src.app_workflow import generate_response
+
+    vector_db = VectorDBSession()
+    for file_path in files:
+        with open(file_path, 'rb') as fp:
+            vector_db.add_file(os.path.basename(file_path), fp.read())
+
+    def timed_query(run: int) -> float:
+        started_at = time.perf_counter()
+        result = generate_response(user_query=queries[run % len(queries)], vector_db=vector_db)
+        if not result.generation_status:
+            logger.warning("Run %d failed: %s", run, result.message)
+        return time.perf_counter() - started_at
+
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(timed_query, range(runs)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark d.AI.ta offline")
+    parser.add_argument("--files", nargs="+", required=True)
+    parser.add_argument("--queries", nargs="+", required=True)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--replay", help="JSONL recordings written with LLM_RECORD_PATH")
+    parser.add_argument("--latency", default="fixed:0")
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--fault-429", type=float, default=0.0)
+    parser.add_argument("--fault-500", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warm-cache", action="store_true", help="Keep caches on, later runs hit them")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.TemporaryDirectory(prefix="daita-benchmark")
+    configure_caches(cache_dir.name, args.warm_cache)
+
+    server = start_server(StandInLLM(
+        replay_path=args.replay,
+        latency=args.latency,
+        token_delay=args.token_delay,
+        fault_429=args.fault_429,
+        fault_500=args.fault_500,
+        retry_after=0.1,
+        seed=args.seed,
+    ))
+    os.environ['OPENAI_API_BASE'] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY') or "stand-in"
+    os.environ['MODEL'] = os.getenv('MODEL') or "stand-in"
+
+    latencies = run_benchmark(args.files, args.queries, args.runs, args.concurrency)
+    server.shutdown()
+    cache_dir.cleanup()
+
+    print(f"runs: {len(latencies)}, concurrency: {args.concurrency}")
+    print(f"mean: {statistics.mean(latencies):.3f}s")
+    for pct in [50, 90, 99]:
+        print(f"p{pct}: {percentile(latencies, pct):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+'''
+Static checks of generated solver code, run before it is executed.
+
+Catches syntax errors, a missing 'solver', forbidden imports, unknown file IDs,
+invalid jq queries and unknown column names without running the code. Trivial
+mismatches (case or whitespace of file IDs, columns and JSON keys) and imports of
+modules which are already available are fixed in place; anything else raises
+CodeValidationError, whose message is sent back to the LLM for refinement.
+'''
+import re
+import ast
+from typing import Dict, List, Set, Tuple
+
+from src.code_executor.json_query import compile_jq
+from src.errors import CodeValidationError
+from src.modals.file_types.base import FileMetadata, FileDataFormat
+from src.utils.config import get_env_bool
+from src.utils.logger import get_module_logger
+
+
+CODE_VALIDATION_ENABLED = get_env_bool('CODE_VALIDATION_ENABLED', True)
+
+# (module, name bound in the executor namespace), see local_executor.create_local_ns
+PROVIDED_IMPORTS = {
+    ("pandas", "pd"),
+    ("numpy", "np"),
+    ("math", "math"),
+    ("time", "time"),
+    ("matplotlib", "matplotlib"),
+    ("matplotlib.pyplot", "plt"),
+}
+DF_LOADERS = {"fetch_df": ["file_id", "columns", "filters"], "iter_df": ["file_id", "chunksize", "columns", "filters"]}
+JSON_LOADERS = {"fetch_json": ["file_id", "jq_query"]}
+# DataFrame methods whose first argument (or 'by') names columns
+COLUMN_METHODS = {"groupby", "sort_values"}
+# Indexers whose second key names columns, e.g. df.loc[mask, "column"] = value
+LABEL_INDEXERS = {"loc", "at"}
+MAX_LISTED_NAMES = 20
+JQ_FIELD_PATTERN = re.compile(r'(?<![\w$])\.([A-Za-z_]\w*)')
+JQ_STRING_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"')
+
+logger = get_module_logger(__name__)
+
+Edit = Tuple[int, int, str]  # Start and end offsets in the code, replacement text
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.split()).lower()
+
+
+def match_name(name: str, names: List[str]) -> str | None:
+    '''Returns the only name equal to 'name' ignoring case and whitespace.'''
+    matches = [candidate for candidate in names if normalize_name(candidate) == normalize_name(name)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def listed(names: List[str]) -> str:
+    shown = ", ".join(f'"{name}"' for name in names[:MAX_LISTED_NAMES])
+    if len(names) > MAX_LISTED_NAMES:
+        shown += f" and {len(names) - MAX_LISTED_NAMES} more"
+    return shown
+
+
+def call_argument(call: ast.Call, params: List[str], name: str) -> ast.expr | None:
+    for keyword in call.keywords:
+        if keyword.arg == name:
+            return keyword.value
+    idx = params.index(name)
+    return call.args[idx] if idx < len(call.args) else None
+
+
+def string_value(node: ast.expr | None) -> str | None:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def is_method_call(node: ast.AST | None, name: str, method: str) -> bool:
+    '''True for calls of the method on the variable, e.g. df.assign(...)'''
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == method \
+        and isinstance(node.func.value, ast.Name) and node.func.value.id == name
+
+
+def string_nodes(node: ast.expr | None) -> List[ast.Constant]:
+    '''String constants of "name" or ["name", ...] arguments.'''
+    if string_value(node) is not None:
+        return [node]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [item for item in node.elts if string_value(item) is not None]
+    return []
+
+
+class CodeValidator:
+    def __init__(self, code: str, file_metadatas: List[FileMetadata]):
+        self.code = code
+        self.metadatas = {metadata.id: metadata for metadata in file_metadatas}
+        self.issues: List[str] = []
+        self.edits: Dict[Tuple[int, int], str] = {}
+
+        self._line_starts = [0]
+        for line in code.splitlines(keepends=True):
+            self._line_starts.append(self._line_starts[-1] + len(line))
+        self._lines = code.splitlines(keepends=True)
+
+    def offset(self, lineno: int, col_offset: int) -> int:
+        # AST columns are UTF-8 byte offsets
+        line = self._lines[lineno - 1] if lineno - 1 < len(self._lines) else ""
+        return self._line_starts[lineno - 1] + len(line.encode('utf-8')[:col_offset].decode('utf-8', errors='ignore'))
+
+    def replace(self, node: ast.AST, text: str):
+        start = self.offset(node.lineno, node.col_offset)
+        end = self.offset(node.end_lineno, node.end_col_offset)
+        self.edits[(start, end)] = text
+
+    def fixed_code(self) -> str:
+        code = self.code
+        for (start, end), text in sorted(self.edits.items(), reverse=True):
+            code = code[:start] + text + code[end:]
+        return code
+
+    def validate(self) -> str:
+        try:
+            tree = ast.parse(self.code)
+        except SyntaxError as error:
+            raise CodeValidationError(f"SyntaxError: {error.msg} (line {error.lineno})") from error
+
+        if not any(isinstance(node, ast.FunctionDef) and node.name == "solver" for node in tree.body):
+            self.issues.append("The code must define a 'solver' method.")
+
+        self.check_imports(tree)
+        loaded = self.check_loader_calls(tree)
+        self.check_columns(tree, loaded)
+
+        if len(self.issues) > 0:
+            raise CodeValidationError("\n".join(self.issues))
+        return self.fixed_code()
+
+    def check_imports(self, tree: ast.AST):
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                bindings = [(alias.name, alias.asname or alias.name) for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                bindings = [(f"{node.module}.{alias.name}", alias.asname or alias.name) for alias in node.names]
+            else:
+                continue
+
+            if all(binding in PROVIDED_IMPORTS for binding in bindings):
+                # Already bound in the executor namespace
+                self.replace(node, "pass")
+            else:
+                self.issues.append(
+                    f"Do NOT import modules (line {node.lineno}), only use the pre-imported "
+                    f"{', '.join(sorted(name for _, name in PROVIDED_IMPORTS))}."
+                )
+
+    def resolve_file_id(self, loader: str, node: ast.expr | None) -> FileMetadata | None:
+        file_id = string_value(node)
+        if file_id is None:
+            return None
+        if file_id not in self.metadatas:
+            fixed_id = match_name(file_id, list(self.metadatas))
+            if fixed_id is None:
+                self.issues.append(
+                    f"Unknown file ID '{file_id}' in {loader}(), available file IDs: {listed(list(self.metadatas))}."
+                )
+                return None
+            self.replace(node, repr(fixed_id))
+            file_id = fixed_id
+
+        metadata = self.metadatas[file_id]
+        is_json = metadata.file_format == FileDataFormat.JSON
+        if loader in DF_LOADERS and is_json:
+            self.issues.append(f"File '{file_id}' is a JSON file, load it with fetch_json() instead of {loader}().")
+            return None
+        if loader in JSON_LOADERS and not is_json:
+            self.issues.append(f"File '{file_id}' is not a JSON file, load it with fetch_df() instead of {loader}().")
+            return None
+        return metadata
+
+    def check_loader_calls(self, tree: ast.AST) -> Dict[int, FileMetadata]:
+        '''Checks arguments of data loader calls, returns loaded file by id() of the call node.'''
+        loaded = {}
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Name):
+                continue
+            loader = node.func.id
+            if loader in DF_LOADERS:
+                params = DF_LOADERS[loader]
+                metadata = self.resolve_file_id(loader, call_argument(node, params, "file_id"))
+                if metadata is None:
+                    continue
+                loaded[id(node)] = metadata
+                columns = [field.name for field in metadata.fields]
+                for column_node in string_nodes(call_argument(node, params, "columns")):
+                    self.check_column(column_node, columns, metadata)
+                filters = call_argument(node, params, "filters")
+                if isinstance(filters, (ast.List, ast.Tuple)):
+                    for item in filters.elts:
+                        if isinstance(item, (ast.List, ast.Tuple)) and len(item.elts) > 0:
+                            for column_node in string_nodes(item.elts[0]):
+                                self.check_column(column_node, columns, metadata)
+            elif loader in JSON_LOADERS:
+                params = JSON_LOADERS[loader]
+                metadata = self.resolve_file_id(loader, call_argument(node, params, "file_id"))
+                if metadata is not None:
+                    self.check_jq_query(call_argument(node, params, "jq_query"), metadata)
+        return loaded
+
+    def check_column(self, node: ast.Constant, columns: List[str], metadata: FileMetadata):
+        if node.value in columns:
+            return
+        fixed_column = match_name(node.value, columns)
+        if fixed_column is not None:
+            self.replace(node, repr(fixed_column))
+            return
+        self.issues.append(
+            f"Unknown column '{node.value}' of file '{metadata.id}', available columns: {listed(columns)}."
+        )
+
+    def check_jq_query(self, node: ast.expr | None, metadata: FileMetadata):
+        jq_query = string_value(node)
+        if jq_query is None:
+            return
+        try:
+            compile_jq(jq_query)
+        except ValueError as error:
+            self.issues.append(f"Invalid jq query '{jq_query}' for file '{metadata.id}': {error}")
+            return
+
+        # Keys are sampled at ingest, so unknown keys may still exist and are only fixed, never reported
+        keys = sorted(set(
+            part for json_key in metadata.json_keys for part in re.split(r'\.|\[\]', json_key.key) if part != ""
+        ))
+        strings = [match.span() for match in JQ_STRING_PATTERN.finditer(jq_query)]
+
+        def fix_field(match: re.Match) -> str:
+            if match.group(1) in keys or any(start <= match.start() < end for start, end in strings):
+                return match.group(0)
+            fixed_key = match_name(match.group(1), keys)
+            return "." + fixed_key if fixed_key is not None else match.group(0)
+
+        fixed_query = JQ_FIELD_PATTERN.sub(fix_field, jq_query)
+        if fixed_query != jq_query:
+            self.replace(node, repr(fixed_query))
+
+    def tracked_frames(self, tree: ast.AST, loaded: Dict[int, FileMetadata]) -> Dict[str, FileMetadata]:
+        '''
+        Variables only ever bound to frames of one file by fetch_df()/iter_df(), e.g.
+        "df = fetch_df(...)" or "for chunk in iter_df(...)". Others can have any columns.
+        '''
+        bindings: Dict[str, List[FileMetadata | None]] = {}
+
+        def bind(target: ast.AST, value: ast.AST | None):
+            if isinstance(target, ast.Name) and is_method_call(value, target.id, "assign"):
+                return  # Same frame with added columns, see added_columns()
+            if isinstance(target, ast.Name):
+                bindings.setdefault(target.id, []).append(loaded.get(id(value)))
+            else:
+                for node in ast.walk(target):
+                    if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                        bindings.setdefault(node.id, []).append(None)
+
+        untracked: Set[str] = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    bind(target, node.value)
+            elif isinstance(node, (ast.AnnAssign, ast.AugAssign, ast.NamedExpr)):
+                bind(node.target, getattr(node, 'value', None) if not isinstance(node, ast.AugAssign) else None)
+            elif isinstance(node, (ast.For, ast.comprehension)):
+                loader = node.iter
+                is_iter_df = (
+                    isinstance(loader, ast.Call) and isinstance(loader.func, ast.Name) and loader.func.id == "iter_df"
+                )
+                bind(node.target, loader if is_iter_df else None)
+            elif isinstance(node, (ast.With, ast.AsyncWith)):
+                for item in node.items:
+                    if item.optional_vars is not None:
+                        bind(item.optional_vars, None)
+            elif isinstance(node, ast.arg):
+                bindings.setdefault(node.arg, []).append(None)
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+                # In place changes, e.g. df.rename(columns=..., inplace=True)
+                if isinstance(node.func.value, ast.Name) and any(
+                    keyword.arg == "inplace" for keyword in node.keywords
+                ):
+                    untracked.add(node.func.value.id)
+            elif isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Store):
+                if isinstance(node.value, ast.Name):
+                    untracked.add(node.value.id)  # e.g. df.columns = [...]
+
+        tracked = {}
+        for name, metadatas in bindings.items():
+            if name in untracked or any(metadata is None for metadata in metadatas):
+                continue
+            if len(set(metadata.id for metadata in metadatas)) == 1:
+                tracked[name] = metadatas[0]
+        return tracked
+
+    def added_columns(self, tree: ast.AST, tracked: Dict[str, FileMetadata]) -> Dict[str, Set[str]]:
+        '''
+        Columns the code adds to tracked frames, e.g. df["total"] = ..., df.loc[mask, "total"] = ...,
+        df.insert(0, "total", ...) or df = df.assign(total=...). Frames changed in ways
+        which can't be resolved (e.g. df[name] = ...) are no longer tracked.
+        '''
+        added: Dict[str, Set[str]] = {name: set() for name in tracked}
+        untracked: Set[str] = set()
+
+        def add(name: str, column_node: ast.expr | None):
+            columns = string_nodes(column_node)
+            keys = column_node.elts if isinstance(column_node, (ast.List, ast.Tuple)) else [column_node]
+            if len(columns) != len(keys):
+                untracked.add(name)
+            added[name].update(column.value for column in columns)
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store):
+                if isinstance(node.value, ast.Name) and node.value.id in tracked:
+                    add(node.value.id, node.slice)
+                elif isinstance(node.value, ast.Attribute) and node.value.attr in LABEL_INDEXERS \
+                        and isinstance(node.value.value, ast.Name) and node.value.value.id in tracked:
+                    # Assigning rows only (df.loc[label] = ...) adds no column
+                    if isinstance(node.slice, ast.Tuple) and len(node.slice.elts) == 2:
+                        add(node.value.value.id, node.slice.elts[1])
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+                    and isinstance(node.func.value, ast.Name) and node.func.value.id in tracked:
+                name = node.func.value.id
+                if node.func.attr == "insert":
+                    add(name, call_argument(node, ["loc", "column", "value"], "column"))
+                elif node.func.attr == "assign":
+                    if any(keyword.arg is None for keyword in node.keywords):
+                        untracked.add(name)  # e.g. df.assign(**columns)
+                    added[name].update(keyword.arg for keyword in node.keywords if keyword.arg is not None)
+
+        for name in untracked:
+            tracked.pop(name)
+        return added
+
+    def check_columns(self, tree: ast.AST, loaded: Dict[int, FileMetadata]):
+        tracked = self.tracked_frames(tree, loaded)
+        added = self.added_columns(tree, tracked)
+        if len(tracked) == 0:
+            return
+
+        for node in ast.walk(tree):
+            column_nodes, name = [], None
+            if isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Load) \
+                    and isinstance(node.value, ast.Name) and node.value.id in tracked:
+                name, column_nodes = node.value.id, string_nodes(node.slice)
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+                    and node.func.attr in COLUMN_METHODS \
+                    and isinstance(node.func.value, ast.Name) and node.func.value.id in tracked:
+                name = node.func.value.id
+                column_nodes = string_nodes(call_argument(node, ["by"], "by"))
+
+            if name is None:
+                continue
+            metadata = tracked[name]
+            columns = [field.name for field in metadata.fields] + sorted(added[name])
+            for column_node in column_nodes:
+                self.check_column(column_node, columns, metadata)
+
+
+def validate_code(code: str, file_metadatas: List[FileMetadata]) -> str:
+    '''
+    Returns the code with trivial issues fixed, raises CodeValidationError
+    listing the issues which need the code to be regenerated.
+    '''
+    fixed_code = CodeValidator(code, file_metadatas).validate()
+    if fixed_code != code:
+        logger.info("Fixed generated code before execution")
+        logger.debug("Fixed code: %s", fixed_code)
+    return fixed_code
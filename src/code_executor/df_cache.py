@@ -0,0 +1,131 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Tuple
+
+import pandas as pd
+
+from src.code_executor.df_filters import Filter, apply_filters, filter_columns
+from src.modals.executor_data import DataFrameCacheStats
+from src.utils.config import get_env_int
+from src.utils.logger import get_module_logger
+
+
+# Max. memory of DataFrames kept per session.
+DF_CACHE_MAX_BYTES = get_env_int('DF_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+
+logger = get_module_logger(__name__)
+
+# Sandbox workers run generated code with pandas copy-on-write (the default from pandas 3,
+# see sandbox.worker_main), frames handed out there are shallow copies whose data is only
+# copied when the code modifies it, so the cached frame stays intact. The option is
+# process-wide, so the app process keeps the default mode and hands out deep copies.
+try:
+    COPY_ON_WRITE_SUPPORTED = pd.get_option("mode.copy_on_write") is not None
+except (KeyError, AttributeError, pd.errors.OptionError):
+    COPY_ON_WRITE_SUPPORTED = False
+
+
+def copy_on_write_enabled() -> bool:
+    return COPY_ON_WRITE_SUPPORTED and pd.get_option("mode.copy_on_write") is True
+
+
+CacheKey = Tuple[str, str, int, int, Tuple[str, ...] | None, Tuple[Filter, ...] | None]
+
+
+def make_df_cache_key(
+    file_id: str,
+    file_path: str,
+    columns: List[str] | None = None,
+    filters: Tuple[Filter, ...] | None = None
+) -> CacheKey:
+    '''Key changes when the file on disk is replaced or modified.'''
+    stat = os.stat(file_path)
+    return (
+        file_id,
+        file_path,
+        stat.st_mtime_ns,
+        stat.st_size,
+        tuple(columns) if columns is not None else None,
+        filters
+    )
+
+
+class DataFrameCache:
+    '''
+    Memory bounded LRU cache of DataFrames loaded by fetch_df, one per VectorDB session.
+    '''
+    def __init__(self, max_bytes: int = DF_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._frames: OrderedDict[CacheKey, Tuple[pd.DataFrame, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = DataFrameCacheStats(max_bytes=max_bytes)
+
+    def _view(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.copy(deep=not copy_on_write_enabled())
+
+    def get_or_load(
+        self,
+        file_id: str,
+        file_path: str,
+        load: Callable[[], pd.DataFrame],
+        columns: List[str] | None = None,
+        filters: Tuple[Filter, ...] | None = None
+    ) -> pd.DataFrame:
+        '''
+        Returns a copy of the cached frame, loading it with 'load' on a miss.
+        A projection on 'columns' and/or selection by normalized 'filters' is
+        served from the full frame when that is cached.
+        '''
+        key = make_df_cache_key(file_id, file_path, columns, filters)
+        full_key = key[:4] + (None, None)
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is not None:
+                self._frames.move_to_end(key)
+                self._stats.hits += 1
+                return self._view(entry[0])
+
+            entry = self._frames.get(full_key)
+            if entry is not None and set(columns or []).union(filter_columns(filters)).issubset(entry[0].columns):
+                self._frames.move_to_end(full_key)
+                self._stats.hits += 1
+                full_df = entry[0]
+            else:
+                full_df = None
+                self._stats.misses += 1
+
+        if full_df is not None:
+            return self._view(apply_filters(full_df, filters, columns))
+
+        df = load()
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            logger.info("DataFrame of '%s' (%d bytes) exceeds cache size, not cached", file_id, size)
+            return df
+
+        with self._lock:
+            # Older versions of the same file are stale
+            for stale_key in [k for k in self._frames if k[0] == file_id and k[1:4] != key[1:4]]:
+                self._stats.bytes -= self._frames.pop(stale_key)[1]
+
+            if key not in self._frames:
+                self._frames[key] = (df, size)
+                self._stats.bytes += size
+
+            while self._stats.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._frames.popitem(last=False)
+                self._stats.bytes -= evicted_size
+                self._stats.evictions += 1
+            return self._view(self._frames[key][0])
+
+    def stats(self) -> DataFrameCacheStats:
+        with self._lock:
+            stats = self._stats.model_copy()
+            stats.items = len(self._frames)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._stats.bytes = 0
@@ -0,0 +1,79 @@
+'''
+Row filters of fetch_df, a list of (column, op, value) tuples which all must match.
+
+The same format as pyarrow/pandas read_parquet 'filters', so they are pushed down
+to the columnar sidecar (skipping row groups by their statistics) and applied
+chunk by chunk while reading CSV files.
+'''
+from typing import Any, List, Tuple
+
+import pandas as pd
+
+
+FILTER_OPERATORS = ["==", "!=", "<", "<=", ">", ">=", "in", "not in"]
+
+Filter = Tuple[str, str, Any]
+
+
+def normalize_filters(filters: List | None) -> Tuple[Filter, ...] | None:
+    '''Validates filters and returns them hashable (list values become tuples).'''
+    if filters is None or len(filters) == 0:
+        return None
+    normalized = []
+    for item in filters:
+        if not isinstance(item, (list, tuple)) or len(item) != 3:
+            raise ValueError(f"Invalid filter {item!r}, expected a (column, op, value) tuple")
+        column, op, value = item
+        op = "==" if op == "=" else op
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Invalid filter operator '{op}', expected one of {FILTER_OPERATORS}")
+        if op in ["in", "not in"]:
+            if isinstance(value, (str, bytes)) or not hasattr(value, '__iter__'):
+                raise ValueError(f"Value of '{op}' filter on '{column}' must be a list")
+            value = tuple(value)
+        normalized.append((column, op, value))
+    return tuple(normalized)
+
+
+def filter_columns(filters: Tuple[Filter, ...] | None) -> List[str]:
+    if filters is None:
+        return []
+    return list(dict.fromkeys(column for column, _, _ in filters))
+
+
+def filters_mask(df: pd.DataFrame, filters: Tuple[Filter, ...]) -> pd.Series:
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        if column not in df.columns:
+            raise KeyError(f"Filter column '{column}' not found")
+        series = df[column]
+        if op == "==":
+            mask &= series == value
+        elif op == "!=":
+            mask &= series != value
+        elif op == "<":
+            mask &= series < value
+        elif op == "<=":
+            mask &= series <= value
+        elif op == ">":
+            mask &= series > value
+        elif op == ">=":
+            mask &= series >= value
+        elif op == "in":
+            mask &= series.isin(value)
+        elif op == "not in":
+            mask &= ~series.isin(value)
+    return mask
+
+
+def apply_filters(
+    df: pd.DataFrame,
+    filters: Tuple[Filter, ...] | None,
+    columns: List[str] | None = None
+) -> pd.DataFrame:
+    '''Returns rows of df matching all filters, projected on columns when given.'''
+    if filters is not None:
+        df = df[filters_mask(df, filters)].reset_index(drop=True)
+    if columns is not None:
+        df = df[list(columns)]
+    return df
@@ -0,0 +1,225 @@
+'''
+jq queries over uploaded JSON files for fetch_json.
+
+Compiled programs and file texts are cached, jq parses the text natively so
+documents are never materialized as Python objects. Large JSON Lines files
+and record selections over large top-level arrays (".[] | ...") are streamed
+record by record instead.
+'''
+import os
+import re
+import sys
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+
+import jq
+
+from src.modals.executor_data import JSONCacheStats
+from src.utils.config import get_env_int
+from src.utils.logger import get_module_logger
+
+
+# Memory budget for cached JSON file texts, shared by all sessions.
+JSON_CACHE_MAX_BYTES = get_env_int('JSON_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+# Files from this size are streamed when the query allows it.
+JSON_STREAM_MIN_BYTES = get_env_int('JSON_STREAM_MIN_BYTES', 64 * 1024 * 1024)
+JSON_STREAM_CHUNK_SIZE = 1024 * 1024
+MAX_COMPILED_QUERIES = 256
+
+# ".[]" followed by a plain path and/or a pipe, which can run on each array item.
+RECORD_QUERY_PATTERN = re.compile(
+    r'^\s*\.\[\]\s*((?:\.[A-Za-z_]\w*|\["[^"]*"\]|\[\d+\])*)\s*(?:\|(.*))?$', re.DOTALL
+)
+JSON_WHITESPACE = " \t\r\n"
+
+logger = get_module_logger(__name__)
+
+
+@lru_cache(maxsize=MAX_COMPILED_QUERIES)
+def compile_jq(jq_query: str):
+    return jq.compile(jq_query)
+
+
+def record_query(jq_query: str) -> str | None:
+    '''Returns the query to run on each item for ".[] | <query>", None for other queries.'''
+    match = RECORD_QUERY_PATTERN.match(jq_query)
+    if match is None:
+        return None
+    path, rest = match.group(1), match.group(2)
+    item_query = "." + path.lstrip(".") if path != "" else "."
+    if rest is not None:
+        if rest.strip() == "":
+            return None
+        item_query += " | " + rest
+    return item_query
+
+
+def file_version(file_path: str) -> Tuple[str, int, int]:
+    stat = os.stat(file_path)
+    return (file_path, stat.st_mtime_ns, stat.st_size)
+
+
+def first_char(file_path: str) -> str:
+    with open(file_path, 'r', encoding='utf-8') as fp:
+        while True:
+            chunk = fp.read(4096)
+            if chunk == "":
+                return ""
+            stripped = chunk.lstrip(JSON_WHITESPACE)
+            if stripped != "":
+                return stripped[0]
+
+
+@lru_cache(maxsize=1024)
+def _is_json_lines(version: Tuple[str, int, int]) -> bool:
+    with open(version[0], 'r', encoding='utf-8') as fp:
+        first_line = fp.readline()
+        try:
+            json.loads(first_line)
+        except ValueError:
+            return False
+        # A single complete value on the first line followed by more values
+        for line in fp:
+            if line.strip() != "":
+                return True
+    return False
+
+
+def is_json_lines(file_path: str) -> bool:
+    '''True when the file has one JSON value per line.'''
+    return _is_json_lines(file_version(file_path))
+
+
+def iter_json_lines(file_path: str) -> Iterator[str]:
+    with open(file_path, 'r', encoding='utf-8') as fp:
+        for line in fp:
+            if line.strip() != "":
+                yield line
+
+
+def iter_array_items(file_path: str) -> Iterator[str]:
+    '''Yields the text of each item of a top-level JSON array, reading the file incrementally.'''
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as fp:
+        buffer, pos, eof = "", 0, False
+
+        def fill():
+            nonlocal buffer, pos, eof
+            # Read at least as much as is buffered, so large items parse in amortized linear time
+            chunk = fp.read(max(JSON_STREAM_CHUNK_SIZE, len(buffer) - pos))
+            eof = chunk == ""
+            buffer, pos = buffer[pos:] + chunk, 0
+
+        def skip(chars: str):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                fill()
+
+        skip(JSON_WHITESPACE)
+        if pos >= len(buffer) or buffer[pos] != "[":
+            raise ValueError("JSON document is not an array")
+        pos += 1
+
+        while True:
+            skip(JSON_WHITESPACE + ",")
+            if pos >= len(buffer):
+                raise ValueError("Unterminated JSON array")
+            if buffer[pos] == "]":
+                return
+
+            while True:
+                try:
+                    _, end = decoder.raw_decode(buffer, pos)
+                    # A number at the end of the buffer may continue in the next chunk
+                    if end < len(buffer) or eof:
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+            yield buffer[pos:end]
+            pos = end
+
+
+class JSONTextCache:
+    '''LRU cache of JSON file texts bounded by memory.'''
+
+    def __init__(self, max_bytes: int = JSON_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._texts: OrderedDict[Tuple[str, int, int], Tuple[str, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = JSONCacheStats(max_bytes=max_bytes)
+
+    def get_or_load(self, file_path: str) -> str:
+        version = file_version(file_path)
+        with self._lock:
+            entry = self._texts.get(version)
+            if entry is not None:
+                self._texts.move_to_end(version)
+                self._stats.hits += 1
+                return entry[0]
+            self._stats.misses += 1
+
+        with open(file_path, 'r', encoding='utf-8') as fp:
+            text = fp.read()
+        size = sys.getsizeof(text)
+        if size > self.max_bytes:
+            return text
+
+        with self._lock:
+            # Older versions of the same file are stale
+            for stale in [key for key in self._texts if key[0] == file_path and key != version]:
+                self._stats.bytes -= self._texts.pop(stale)[1]
+            if version not in self._texts:
+                self._texts[version] = (text, size)
+                self._stats.bytes += size
+            while self._stats.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._texts.popitem(last=False)
+                self._stats.bytes -= evicted_size
+                self._stats.evictions += 1
+        return text
+
+    def count_streamed(self):
+        with self._lock:
+            self._stats.streamed += 1
+
+    def stats(self) -> JSONCacheStats:
+        with self._lock:
+            stats = self._stats.model_copy()
+            stats.items = len(self._texts)
+        return stats
+
+
+JSON_TEXT_CACHE = JSONTextCache()
+
+
+def run_jq_query(file_path: str, jq_query: str) -> List:
+    '''Returns all outputs of the jq query on the JSON (or JSON Lines) file.'''
+    if os.path.getsize(file_path) >= JSON_STREAM_MIN_BYTES:
+        if is_json_lines(file_path):
+            # jq runs the query on each value of a multi-value input anyway
+            program = compile_jq(jq_query)
+            JSON_TEXT_CACHE.count_streamed()
+            return [
+                output for line in iter_json_lines(file_path)
+                for output in program.input_text(line).all()
+            ]
+
+        item_query = record_query(jq_query)
+        if item_query is not None and first_char(file_path) == "[":
+            program = compile_jq(item_query)
+            JSON_TEXT_CACHE.count_streamed()
+            return [
+                output for item in iter_array_items(file_path)
+                for output in program.input_text(item).all()
+            ]
+
+    return compile_jq(jq_query).input_text(JSON_TEXT_CACHE.get_or_load(file_path)).all()
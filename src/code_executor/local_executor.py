@@ -1,45 +1,143 @@
+import os
 import time
-import jq
-import json
 import math
 import numpy as np
 import pandas as pd
 import matplotlib
 import matplotlib.pyplot as plt
 
-from typing import List
+from typing import Iterator, List
 from src.modals.file_types.base import FileMetadata, FileDataFormat
+from src.code_executor.df_cache import DataFrameCache
+from src.data_utils.columnar_store import read_sidecar
+from src.data_utils.zip_archive import local_file_path
+from src.code_executor.json_query import run_jq_query
+from src.code_executor.df_filters import normalize_filters, filter_columns, apply_filters
+from src.utils.logger import get_module_logger
 
 
-def load_df_from_file(file_metadata: FileMetadata):
+# Rows read at a time when filtering CSV files, so only matching rows are kept in memory.
+CSV_FILTER_CHUNK_SIZE = 100_000
+DEFAULT_CHUNK_ROWS = 100_000  # Rows per chunk of iter_df
+
+logger = get_module_logger(__name__)
+
+
+def df_source_path(file_metadata: FileMetadata) -> str:
+    '''File the DataFrame is loaded from, the columnar sidecar when available (ZIP members aren't extracted then).'''
+    columnar_file_path = getattr(file_metadata, 'columnar_file_path', "")
+    if columnar_file_path != "" and os.path.exists(columnar_file_path):
+        return columnar_file_path
+    if file_metadata.file_format == FileDataFormat.LOG:
+        return file_metadata.csv_file_path
+    return local_file_path(file_metadata)
+
+
+def load_df_from_file(
+    file_metadata: FileMetadata,
+    columns: List[str] | None = None,
+    filters: List | None = None
+):
+    '''Loads only 'columns' and rows matching 'filters' when given, see df_filters.'''
     file_format = file_metadata.file_format
-    if file_format == FileDataFormat.CSV:
-        return pd.read_csv(file_metadata.file_path).infer_objects()
-    elif file_format == FileDataFormat.LOG:
-        return pd.read_csv(file_metadata.csv_file_path).infer_objects()
+    if file_format in [FileDataFormat.CSV, FileDataFormat.LOG]:
+        filters = normalize_filters(filters)
+        source_path = df_source_path(file_metadata)
+        if source_path == getattr(file_metadata, 'columnar_file_path', ""):
+            if filters is None:
+                return read_sidecar(source_path, columns)
+            try:
+                df = read_sidecar(source_path, columns, [list(item) for item in filters])
+                return df if columns is None else df[list(columns)]
+            except (ValueError, TypeError, NotImplementedError) as error:
+                # e.g. a value not comparable with the column type in Arrow, compare in pandas instead
+                logger.debug("Unable to push filters down to '%s': %s", source_path, error)
+                return apply_filters(read_sidecar(source_path, read_columns(columns, filters)), filters, columns)
+
+        if filters is None:
+            df = pd.read_csv(source_path, usecols=columns)
+        else:
+            chunks = pd.read_csv(source_path, usecols=read_columns(columns, filters), chunksize=CSV_FILTER_CHUNK_SIZE)
+            df = pd.concat([apply_filters(chunk, filters) for chunk in chunks], ignore_index=True)
+        return apply_filters(df.infer_objects(), None, columns)
     suggestion = ""
     if file_format == FileDataFormat.JSON:
         suggestion = "Use fetch_json to load JSON file."
     raise Exception(f"Unable to load given file({file_metadata.id}) with fetch_df. {suggestion}")
 
 
-def create_local_ns(file_metadatas: List[FileMetadata]):
-    '''Create default list of variables, methods and imported module.'''
+def iter_df_from_file(
+    file_metadata: FileMetadata,
+    chunksize: int = DEFAULT_CHUNK_ROWS,
+    columns: List[str] | None = None,
+    filters: List | None = None
+) -> Iterator[pd.DataFrame]:
+    '''Same as load_df_from_file() but yields the rows 'chunksize' at a time.'''
+    if file_metadata.file_format not in [FileDataFormat.CSV, FileDataFormat.LOG]:
+        raise Exception(f"Unable to load given file({file_metadata.id}) with iter_df.")
+    filters = normalize_filters(filters)
+    source_path = df_source_path(file_metadata)
+
+    def iter_chunks():
+        if source_path == getattr(file_metadata, 'columnar_file_path', ""):
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(source_path, memory_map=True)
+            for batch in parquet_file.iter_batches(batch_size=chunksize, columns=read_columns(columns, filters)):
+                yield apply_filters(batch.to_pandas(), filters, columns)
+        else:
+            with pd.read_csv(source_path, usecols=read_columns(columns, filters), chunksize=chunksize) as chunks:
+                for chunk in chunks:
+                    yield apply_filters(chunk.infer_objects(), filters, columns)
+
+    return iter_chunks()
+
+
+def read_columns(columns: List[str] | None, filters) -> List[str] | None:
+    '''Columns to read for the projection, including those only used by filters.'''
+    if columns is None:
+        return None
+    return list(dict.fromkeys(list(columns) + filter_columns(filters)))
+
+
+def create_local_ns(file_metadatas: List[FileMetadata], df_cache: DataFrameCache | None = None):
+    '''
+    Create default list of variables, methods and imported module.
+    DataFrames are reused from 'df_cache' when given.
+    '''
+
+    def fetch_df(
+        file_id: str,
+        columns: List[str] | None = None,
+        filters: List | None = None
+    ) -> pd.DataFrame:
+        for metadata in file_metadatas:
+            if metadata.id == file_id:
+                if df_cache is None or metadata.file_format not in [FileDataFormat.CSV, FileDataFormat.LOG]:
+                    return load_df_from_file(metadata, columns, filters)
+                normalized_filters = normalize_filters(filters)
+                return df_cache.get_or_load(
+                    file_id,
+                    df_source_path(metadata),
+                    lambda: load_df_from_file(metadata, columns, normalized_filters),
+                    columns,
+                    normalized_filters
+                )
 
-    def fetch_df(file_id: str) -> pd.DataFrame:
+    def iter_df(
+        file_id: str,
+        chunksize: int = DEFAULT_CHUNK_ROWS,
+        columns: List[str] | None = None,
+        filters: List | None = None
+    ) -> Iterator[pd.DataFrame]:
         for metadata in file_metadatas:
             if metadata.id == file_id:
-                return load_df_from_file(metadata)
+                return iter_df_from_file(metadata, chunksize, columns, filters)
 
     def fetch_json(file_id: str, jq_query: str) -> list:
         try:
             for metadata in file_metadatas:
                 if metadata.id == file_id:
-                    with open(metadata.file_path, 'r', encoding='utf-8') as fp:
-                        json_data = json.load(fp)
-                        compiled_query = jq.compile(jq_query)
-                        result = compiled_query.input(json_data).all()
-                        return result
+                    return run_jq_query(local_file_path(metadata), jq_query)
         except ValueError as e:
             raise e
 
@@ -50,13 +148,14 @@ def create_local_ns(file_metadatas: List[FileMetadata]):
         'plt': plt,
         'math': math,
         'fetch_df': fetch_df,
+        'iter_df': iter_df,
         'fetch_json': fetch_json,
         'time': time
     }
 
 
-def executor(code: str, file_metadatas: List[FileMetadata]):
-    local_ns = create_local_ns(file_metadatas)
+def executor(code: str, file_metadatas: List[FileMetadata], df_cache: DataFrameCache | None = None):
+    local_ns = create_local_ns(file_metadatas, df_cache)
     exec(code, local_ns, local_ns)
     if 'solver' in local_ns:
         return local_ns["solver"]()
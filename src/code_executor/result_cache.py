@@ -0,0 +1,164 @@
+import os
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from src.code_executor.local_executor import df_source_path
+from src.data_utils.zip_archive import local_file_path
+from src.code_executor.serialization import encode_cacheable_result, decode_result
+from src.modals.executor_data import SolverCacheStats
+from src.modals.file_types.base import FileMetadata, FileDataFormat
+from src.utils.config import get_env_bool, get_env_int
+from src.utils.logger import get_module_logger
+
+
+SOLVER_CACHE_ENABLED = get_env_bool('SOLVER_CACHE_ENABLED', True)
+SOLVER_CACHE_MAX_BYTES = get_env_int('SOLVER_CACHE_MAX_BYTES', 128 * 1024 * 1024)
+SOLVER_CACHE_COMPRESSION = "zstd"
+
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+# Results of code using these names can change between runs and aren't cached.
+NON_DETERMINISTIC_NAMES = {"time", "random", "now", "today", "sample"}
+
+logger = get_module_logger(__name__)
+
+_fingerprints: Dict[Tuple[str, int, int], str] = {}
+_fingerprints_lock = threading.Lock()
+
+
+def is_deterministic(tree: ast.AST) -> bool:
+    '''False when the code uses names whose results can change between runs.'''
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in NON_DETERMINISTIC_NAMES:
+            return False
+        if isinstance(node, ast.Attribute) and node.attr in NON_DETERMINISTIC_NAMES:
+            return False
+    return True
+
+
+def data_file_path(file_metadata: FileMetadata) -> str:
+    '''File the generated code reads for the metadata.'''
+    if file_metadata.file_format in [FileDataFormat.CSV, FileDataFormat.LOG]:
+        return df_source_path(file_metadata)
+    return local_file_path(file_metadata)
+
+
+def file_fingerprint(file_path: str) -> str:
+    '''Content hash of the file, computed once per file version (path, size and mtime).'''
+    stat = os.stat(file_path)
+    version = (file_path, stat.st_size, stat.st_mtime_ns)
+    with _fingerprints_lock:
+        fingerprint = _fingerprints.get(version)
+    if fingerprint is not None:
+        return fingerprint
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as fp:
+        while chunk := fp.read(FINGERPRINT_CHUNK_SIZE):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()
+
+    with _fingerprints_lock:
+        _fingerprints[version] = fingerprint
+    return fingerprint
+
+
+def referenced_metadatas(tree: ast.AST, file_metadatas: List[FileMetadata]) -> List[FileMetadata]:
+    '''Files whose ID appears as a string in the code, all of them when none does.'''
+    constants = set(
+        node.value for node in ast.walk(tree)
+        if isinstance(node, ast.Constant) and isinstance(node.value, str)
+    )
+    referenced = [metadata for metadata in file_metadatas if metadata.id in constants]
+    return referenced if len(referenced) > 0 else file_metadatas
+
+
+def make_solver_cache_key(code: str, file_metadatas: List[FileMetadata]) -> str | None:
+    '''
+    Returns the key of the code's result on the current data, None when it isn't cacheable.
+    The code is compared by its AST, so formatting and comments don't matter.
+    '''
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    if not is_deterministic(tree):
+        return None
+
+    digest = hashlib.sha256(
+        ast.dump(tree, annotate_fields=False, include_attributes=False).encode('utf-8')
+    )
+    try:
+        for metadata in sorted(referenced_metadatas(tree, file_metadatas), key=lambda m: m.id):
+            fingerprint = file_fingerprint(data_file_path(metadata))
+            digest.update(f"\0{metadata.id}\0{fingerprint}".encode('utf-8'))
+    except OSError as error:
+        logger.warning("Unable to fingerprint data files, not caching result: %s", error)
+        return None
+    return digest.hexdigest()
+
+
+class SolverResultCache:
+    '''
+    Size bounded LRU cache of serialized solver results, shared by all sessions.
+    DataFrames are stored as compressed Arrow IPC, figures as plotly specs and scalars
+    as JSON. Results which could only be pickled aren't cached.
+    '''
+    def __init__(self, max_bytes: int = SOLVER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, Tuple[str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = SolverCacheStats(max_bytes=max_bytes)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        '''Returns (found, result), every hit decodes a fresh copy of the result.'''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+        return True, decode_result(*entry)
+
+    def set(self, key: str, result: Any):
+        encoded = encode_cacheable_result(result, compression=SOLVER_CACHE_COMPRESSION)
+        if encoded is None:
+            logger.debug("Not caching solver result of type %s", type(result).__name__)
+            return
+        kind, payload = encoded
+        if len(payload) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._stats.bytes -= len(previous[1])
+            self._entries[key] = (kind, payload)
+            self._stats.bytes += len(payload)
+            self._stats.writes += 1
+
+            while self._stats.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._stats.bytes -= len(evicted)
+                self._stats.evictions += 1
+
+    def stats(self) -> SolverCacheStats:
+        with self._lock:
+            stats = self._stats.model_copy()
+            stats.items = len(self._entries)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.bytes = 0
+
+
+SOLVER_CACHE = SolverResultCache()
+
+
+def get_solver_cache() -> SolverResultCache:
+    return SOLVER_CACHE
@@ -0,0 +1,296 @@
+'''
+Runs generated solver code in a pool of pre-warmed worker processes.
+
+Each job is bound by a wall-clock timeout, an RSS limit (enforced by the parent)
+and a CPU time limit (RLIMIT_CPU in the worker). Workers exceeding a limit are
+killed and replaced without affecting the app. Results come back as Arrow IPC
+for DataFrames and pickles for anything else (e.g. matplotlib figures).
+'''
+import os
+import time
+import pickle
+import signal
+import atexit
+import threading
+import traceback
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Any, List
+
+from src.code_executor.serialization import encode_result, decode_result
+from src.errors import SandboxExecutionError, SandboxResourceError
+from src.modals.file_types.base import FileMetadata
+from src.utils.config import get_env_bool, get_env_float, get_env_int, get_env_str
+from src.utils.logger import get_module_logger
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+# Run generated code in sandbox workers instead of the app process.
+SANDBOX_ENABLED = get_env_bool('CODE_SANDBOX_ENABLED', False)
+SANDBOX_WORKERS = get_env_int('SANDBOX_WORKERS', min(os.cpu_count() or 1, 4))
+SANDBOX_TIMEOUT = get_env_float('SANDBOX_TIMEOUT', 60.0)  # Wall-clock seconds per job
+SANDBOX_CPU_SECONDS = get_env_int('SANDBOX_CPU_SECONDS', 60)  # CPU seconds per job
+SANDBOX_MAX_RSS_MB = get_env_int('SANDBOX_MAX_RSS_MB', 2048)
+# Frames cached by each worker across jobs, see src.code_executor.df_cache
+SANDBOX_DF_CACHE_MAX_BYTES = get_env_int('SANDBOX_DF_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+SANDBOX_START_METHOD = get_env_str('SANDBOX_START_METHOD', 'spawn')
+
+# Seconds a job waits for an idle worker before failing.
+SANDBOX_ACQUIRE_TIMEOUT = get_env_float('SANDBOX_ACQUIRE_TIMEOUT', 300.0)
+WORKER_STARTUP_TIMEOUT = 120.0
+RESPAWN_ATTEMPTS = 5
+RESPAWN_BACKOFF = 0.5  # Seconds before the first retry, doubled after each
+WATCHDOG_INTERVAL = 0.05  # Seconds between RSS checks while a job runs
+
+READY_MESSAGE = b"ready"
+
+logger = get_module_logger(__name__)
+
+
+def process_rss(pid: int) -> int:
+    '''Resident memory of the process in bytes, 0 when it can't be read (non Linux).'''
+    try:
+        with open(f"/proc/{pid}/statm", 'r') as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def worker_main(conn: Connection, cpu_seconds: int, df_cache_max_bytes: int):
+    '''Worker process loop, imports everything generated code needs before taking jobs.'''
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import matplotlib
+    matplotlib.use("Agg")
+    from src.code_executor.local_executor import executor
+    from src.code_executor.df_cache import COPY_ON_WRITE_SUPPORTED, DataFrameCache
+
+    # Workers only run generated code, which runs with copy-on-write
+    if COPY_ON_WRITE_SUPPORTED:
+        import pandas as pd
+        pd.set_option("mode.copy_on_write", True)
+
+    df_cache = DataFrameCache(max_bytes=df_cache_max_bytes)
+
+    def on_cpu_limit(signum, frame):
+        raise SandboxResourceError(f"Code execution exceeded CPU time limit of {cpu_seconds}s")
+
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, on_cpu_limit)
+
+    conn.send_bytes(READY_MESSAGE)
+
+    while True:
+        try:
+            code, file_metadatas = pickle.loads(conn.recv_bytes())
+        except EOFError:
+            return
+
+        if resource is not None:
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(
+                resource.RLIMIT_CPU, (int(used.ru_utime + used.ru_stime) + cpu_seconds, hard)
+            )
+        try:
+            result = executor(code=code, file_metadatas=file_metadatas, df_cache=df_cache)
+            response = ("ok",) + encode_result(result)
+        except BaseException as error:
+            response = ("error", type(error).__name__, str(error), traceback.format_exc())
+        finally:
+            if resource is not None:
+                _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+                resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+            import matplotlib.pyplot as plt
+            plt.close('all')
+
+        conn.send_bytes(pickle.dumps(response, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class SandboxWorker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe(duplex=True)
+        self.process = context.Process(
+            target=worker_main,
+            args=(child_conn, SANDBOX_CPU_SECONDS, SANDBOX_DF_CACHE_MAX_BYTES),
+            name="daita-sandbox",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self):
+        if not self.ready:
+            if not self.conn.poll(WORKER_STARTUP_TIMEOUT) or self.conn.recv_bytes() != READY_MESSAGE:
+                raise SandboxExecutionError("Sandbox worker failed to start")
+            self.ready = True
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class SandboxPool:
+    '''Fixed size pool of warm workers, one job per worker at a time.'''
+
+    def __init__(self, size: int = SANDBOX_WORKERS, start_method: str = SANDBOX_START_METHOD):
+        self.size = size
+        self.context = multiprocessing.get_context(start_method)
+        self._condition = threading.Condition()
+        self._idle: List[SandboxWorker] = []
+        # Workers idle, busy or being replaced, the pool is unusable once it drops to 0
+        self._live = size
+        self._closed = False
+        for _ in range(size):
+            self._idle.append(SandboxWorker(self.context))
+        logger.info("Started %d sandbox workers", size)
+
+    def _acquire(self, timeout: float = SANDBOX_ACQUIRE_TIMEOUT) -> SandboxWorker:
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while len(self._idle) == 0:
+                if self._closed:
+                    raise SandboxExecutionError("Sandbox pool is closed")
+                if self._live == 0:
+                    raise SandboxExecutionError("No sandbox workers available, all of them failed to start")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SandboxExecutionError(f"No sandbox worker became available within {timeout:g}s")
+                self._condition.wait(remaining)
+            return self._idle.pop()
+
+    def _release(self, worker: SandboxWorker):
+        with self._condition:
+            if self._closed:
+                worker.kill()
+                return
+            self._idle.append(worker)
+            self._condition.notify()
+
+    def _replace(self, worker: SandboxWorker):
+        '''
+        Kills the worker and starts a new one in the background, retrying with backoff.
+        When all attempts fail the pool shrinks, waiting jobs fail once no worker is left.
+        '''
+        worker.kill()
+
+        def start():
+            for attempt in range(RESPAWN_ATTEMPTS):
+                if self._closed:
+                    return
+                new_worker = None
+                try:
+                    new_worker = SandboxWorker(self.context)
+                    new_worker.wait_ready()
+                    self._release(new_worker)
+                    return
+                except Exception as error:
+                    logger.error("Unable to start sandbox worker (attempt %d): %s", attempt + 1, error)
+                    if new_worker is not None:
+                        new_worker.kill()
+                time.sleep(RESPAWN_BACKOFF * 2 ** attempt)
+
+            with self._condition:
+                self._live -= 1
+                logger.error("Gave up starting a sandbox worker, %d left", self._live)
+                self._condition.notify_all()
+
+        threading.Thread(target=start, name="daita-sandbox-start", daemon=True).start()
+
+    def run(
+        self,
+        code: str,
+        file_metadatas: List[FileMetadata],
+        timeout: float = SANDBOX_TIMEOUT,
+        max_rss: int = SANDBOX_MAX_RSS_MB * 1024 * 1024,
+        cancel: threading.Event | None = None
+    ) -> Any:
+        '''
+        Runs the code in an idle worker. Setting 'cancel' stops the job, killing
+        (and replacing) its worker, e.g. once another candidate has won.
+        '''
+        worker = self._acquire()
+        if cancel is not None and cancel.is_set():
+            self._release(worker)
+            raise SandboxExecutionError("Code execution was cancelled")
+        try:
+            worker.wait_ready()
+            worker.conn.send_bytes(pickle.dumps((code, file_metadatas), protocol=pickle.HIGHEST_PROTOCOL))
+
+            deadline = time.monotonic() + timeout
+            while not worker.conn.poll(WATCHDOG_INTERVAL):
+                if cancel is not None and cancel.is_set():
+                    raise SandboxExecutionError("Code execution was cancelled")
+                if time.monotonic() > deadline:
+                    raise SandboxResourceError(f"Code execution timed out after {timeout:g}s")
+                if process_rss(worker.process.pid) > max_rss:
+                    raise SandboxResourceError(
+                        f"Code execution exceeded memory limit of {max_rss // (1024 * 1024)} MB"
+                    )
+                if not worker.process.is_alive():
+                    break
+
+            response = pickle.loads(worker.conn.recv_bytes())
+        except (EOFError, OSError) as error:
+            self._replace(worker)
+            raise SandboxResourceError(
+                f"Code execution crashed the sandbox worker (exit code: {worker.process.exitcode})"
+            ) from error
+        except BaseException:
+            self._replace(worker)
+            raise
+
+        # Recycle workers which grew too large between jobs (e.g. leaked figures)
+        if process_rss(worker.process.pid) > max_rss:
+            self._replace(worker)
+        else:
+            self._release(worker)
+
+        if response[0] == "ok":
+            return decode_result(response[1], response[2])
+
+        _, error_type, message, worker_traceback = response
+        logger.debug("Sandbox traceback: %s", worker_traceback)
+        if error_type == SandboxResourceError.__name__:
+            raise SandboxResourceError(message)
+        raise SandboxExecutionError(message)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            workers, self._idle = self._idle, []
+            self._condition.notify_all()
+        for worker in workers:
+            worker.kill()
+
+
+_pool: SandboxPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    '''Returns the process-wide sandbox pool, shared by all sessions.'''
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SandboxPool()
+                atexit.register(_pool.close)
+    return _pool
+
+
+def sandbox_executor(
+    code: str, file_metadatas: List[FileMetadata], df_cache=None, cancel: threading.Event | None = None
+):
+    '''
+    Same as local_executor.executor() but runs in a sandbox worker, stopped once 'cancel' is set.
+    Workers keep their own DataFrame cache, 'df_cache' is not used.
+    '''
+    return get_sandbox_pool().run(code, file_metadatas, cancel=cancel)
@@ -0,0 +1,92 @@
+import io
+import json
+import pickle
+from typing import Any, Tuple
+
+import pandas as pd
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def encode_dataframe(df: pd.DataFrame, compression: str | None = None) -> bytes | None:
+    '''Arrow IPC stream of the DataFrame ('compression' being "zstd" or "lz4"), None when Arrow can't convert it.'''
+    # Arrow only roundtrips plain string column names
+    if not all(isinstance(column, str) for column in df.columns):
+        return None
+    try:
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df)
+        sink = pa.BufferOutputStream()
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    except Exception:
+        # Mixed-type columns etc. can't be converted
+        return None
+
+
+def encode_result(result: Any, compression: str | None = None) -> Tuple[str, bytes]:
+    '''
+    Serializes a solver result, DataFrames as an Arrow IPC stream and anything else
+    (e.g. matplotlib figures) as pickle.
+    '''
+    if isinstance(result, pd.DataFrame) and (payload := encode_dataframe(result, compression)) is not None:
+        return "arrow", payload
+    return "pickle", pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def encode_cacheable_result(result: Any, compression: str | None = None) -> Tuple[str, bytes] | None:
+    '''
+    Serializes a solver result without pickle: DataFrames as Arrow IPC, figures as their
+    plotly spec (how the app renders them) and scalars as JSON. None for anything else.
+    '''
+    if isinstance(result, pd.DataFrame):
+        payload = encode_dataframe(result, compression)
+        return None if payload is None else ("arrow", payload)
+    if is_figure(result):
+        import plotly.tools as tls
+        try:
+            spec = result.to_json() if is_plotly_figure(result) else tls.mpl_to_plotly(result).to_json()
+        except Exception:
+            # Some matplotlib artists have no plotly equivalent
+            return None
+        return "plotly", spec.encode('utf-8')
+    if np is not None and isinstance(result, np.generic):
+        result = result.item()
+    # Containers don't roundtrip through JSON (tuples, non-string keys)
+    if result is None or isinstance(result, (str, int, float, bool)):
+        return "json", json.dumps(result).encode('utf-8')
+    return None
+
+
+def decode_result(kind: str, payload: bytes) -> Any:
+    if kind == "arrow":
+        import pyarrow as pa
+        return pa.ipc.open_stream(io.BytesIO(payload)).read_all().to_pandas()
+    if kind == "plotly":
+        import plotly.io as pio
+        return pio.from_json(payload.decode('utf-8'))
+    if kind == "json":
+        return json.loads(payload)
+    return pickle.loads(payload)
+
+
+def is_plotly_figure(result: Any) -> bool:
+    try:
+        import plotly.graph_objects as go
+    except ImportError:
+        return False
+    return isinstance(result, go.Figure)
+
+
+def is_figure(result: Any) -> bool:
+    '''True for matplotlib and plotly figures.'''
+    try:
+        from matplotlib.figure import Figure
+    except ImportError:
+        return is_plotly_figure(result)
+    return isinstance(result, Figure) or is_plotly_figure(result)
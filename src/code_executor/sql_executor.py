@@ -0,0 +1,110 @@
+'''
+Runs generated SQL on the ingested files with DuckDB.
+
+Each file is exposed as a view over its columnar sidecar (or the CSV/JSON
+file itself), so queries are vectorized, multi-threaded and spill to disk
+instead of materializing whole files in Python memory. Only a single
+SELECT statement is accepted, and file access is limited to the views' files.
+'''
+import re
+import threading
+from typing import List
+
+import pandas as pd
+
+from src.code_executor.local_executor import df_source_path
+from src.data_utils.zip_archive import local_file_path
+from src.modals.file_types.base import FileMetadata, FileDataFormat
+from src.utils.config import get_env_bool, get_env_float, get_env_int, get_env_str
+from src.utils.logger import get_module_logger
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+SQL_ENGINE_AVAILABLE = duckdb is not None and get_env_bool('SQL_ENGINE_ENABLED', True)
+SQL_THREADS = get_env_int('SQL_THREADS', 0)  # 0 uses all cores
+SQL_MEMORY_LIMIT = get_env_str('SQL_MEMORY_LIMIT', '2GB')  # Larger intermediates spill to disk
+SQL_TEMP_DIRECTORY = get_env_str('SQL_TEMP_DIRECTORY')
+SQL_TIMEOUT = get_env_float('SQL_TIMEOUT', 60.0)
+
+SQL_FILE_FORMATS = [FileDataFormat.CSV, FileDataFormat.LOG, FileDataFormat.JSON]
+
+logger = get_module_logger(__name__)
+
+
+def table_name(file_metadata: FileMetadata) -> str:
+    '''Name of the file's view, e.g. "file-0" is "file_0".'''
+    return re.sub(r'\W', '_', file_metadata.id)
+
+
+def sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def table_source(file_metadata: FileMetadata) -> str:
+    if file_metadata.file_format == FileDataFormat.JSON:
+        return f"read_json_auto({sql_literal(local_file_path(file_metadata))})"
+    if file_metadata.file_format not in SQL_FILE_FORMATS:
+        raise ValueError(f"Unable to query file({file_metadata.id}) with SQL.")
+    source_path = df_source_path(file_metadata)
+    if source_path == getattr(file_metadata, 'columnar_file_path', ""):
+        return f"read_parquet({sql_literal(source_path)})"
+    return f"read_csv_auto({sql_literal(source_path)})"
+
+
+def connect(file_metadatas: List[FileMetadata]):
+    '''In-memory database with a view per file, locked down to reading those files.'''
+    config = {"memory_limit": SQL_MEMORY_LIMIT}
+    if SQL_THREADS > 0:
+        config["threads"] = SQL_THREADS
+    if SQL_TEMP_DIRECTORY is not None:
+        config["temp_directory"] = SQL_TEMP_DIRECTORY
+    conn = duckdb.connect(config=config)
+
+    paths = []
+    for metadata in file_metadatas:
+        conn.execute(f'CREATE VIEW "{table_name(metadata)}" AS SELECT * FROM {table_source(metadata)}')
+        paths.append(local_file_path(metadata) if metadata.file_format == FileDataFormat.JSON else df_source_path(metadata))
+
+    try:
+        conn.execute(f"SET allowed_paths = [{', '.join(sql_literal(path) for path in paths)}]")
+        conn.execute("SET enable_external_access = false")
+    except duckdb.Error as error:
+        # Older DuckDB versions can't restrict access to given paths
+        logger.warning("Unable to restrict SQL file access: %s", error)
+    conn.execute("SET lock_configuration = true")
+    return conn
+
+
+def validate_sql(sql: str):
+    statements = duckdb.extract_statements(sql)
+    if len(statements) != 1:
+        raise ValueError(f"Expected a single SQL statement, found {len(statements)}.")
+    if statements[0].type != duckdb.StatementType.SELECT:
+        raise ValueError("Only SELECT statements are allowed.")
+
+
+def sql_executor(sql: str, file_metadatas: List[FileMetadata], df_cache=None) -> pd.DataFrame:
+    '''
+    Runs the SELECT statement over the files' views and returns the result.
+    Counterpart of local_executor.executor() for SQL, 'df_cache' is not used.
+    '''
+    if duckdb is None:
+        raise ImportError("duckdb is not installed, SQL solver is unavailable")
+    validate_sql(sql)
+
+    conn = connect(file_metadatas)
+    # interrupt() makes the running query raise
+    timer = threading.Timer(SQL_TIMEOUT, conn.interrupt)
+    timer.daemon = True
+    timer.start()
+    try:
+        return conn.execute(sql).df()
+    except duckdb.InterruptException as error:
+        raise TimeoutError(f"SQL query timed out after {SQL_TIMEOUT:g}s") from error
+    finally:
+        timer.cancel()
+        conn.close()
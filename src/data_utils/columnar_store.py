@@ -0,0 +1,75 @@
+import os
+from typing import List
+
+import pandas as pd
+
+from src.utils.config import get_env_bool
+from src.utils.logger import get_module_logger
+
+
+# Write a typed Parquet copy of tabular files at ingest, which fetch_df reads instead of the text.
+COLUMNAR_SIDECAR_ENABLED = get_env_bool('COLUMNAR_SIDECAR_ENABLED', True)
+SIDECAR_EXTENSION = ".parquet"
+
+logger = get_module_logger(__name__)
+
+
+def sidecar_path(file_path: str) -> str:
+    return file_path + SIDECAR_EXTENSION
+
+
+def read_sidecar(path: str, columns: List[str] | None = None, filters: List | None = None) -> pd.DataFrame:
+    '''
+    Reads the sidecar memory mapped, loading only 'columns' when given.
+    Row groups which can't match 'filters' ((column, op, value) tuples) are skipped.
+    '''
+    return pd.read_parquet(path, engine="pyarrow", columns=columns, filters=filters, memory_map=True)
+
+
+class SidecarWriter:
+    '''
+    Writes the sidecar of 'file_path' chunk by chunk, so files needn't fit in memory.
+    Chunks are cast to the schema of the first one (e.g. ints of a chunk with nulls); when a
+    chunk doesn't fit it the sidecar is dropped and close() returns "".
+    '''
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.target_path = sidecar_path(file_path)
+        self._writer = None
+        self._failed = not COLUMNAR_SIDECAR_ENABLED
+
+    def write(self, df: pd.DataFrame):
+        if self._failed:
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.target_path, table.schema)
+            else:
+                table = table.cast(self._writer.schema)
+            self._writer.write_table(table)
+        except ImportError:
+            logger.warning("pyarrow is not installed, columnar sidecars are disabled")
+            self._abort()
+        except Exception as error:
+            logger.warning("Unable to write columnar sidecar for '%s': %s", self.file_path, error)
+            self._abort()
+
+    def _abort(self):
+        self._failed = True
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self.target_path):
+            os.remove(self.target_path)
+
+    def close(self) -> str:
+        '''Returns the sidecar path, or "" when it couldn't be written.'''
+        if self._failed or self._writer is None:
+            return ""
+        self._writer.close()
+        logger.debug("Created columnar sidecar: '%s'", self.target_path)
+        return self.target_path
@@ -1,39 +1,39 @@
+from typing import IO
+
 import pandas as pd
 
-from src.modals.file_types.csv_data import (
-    CSVField,
-    CSVFileMetadata
-)
+from src.modals.file_types.csv_data import CSVFileMetadata
+from src.data_utils.columnar_store import SidecarWriter
+from src.data_utils.df_profiler import CSV_CHUNK_ROWS, profile_chunks
 from src.utils.logger import get_module_logger
 
-CSV_UNIQUE_COL_LIMIT = 10  # max no. of unique values to be considered to index
-
 logger = get_module_logger(__name__)
 
 
 def create_csv_metadata(_id: str, file_path: str) -> CSVFileMetadata:
     '''Generate metadata for a CSV file'''
-    df = pd.read_csv(file_path).infer_objects()
-    fields = []
-
-    for col in df.columns.tolist():
-        col_series = df[col]
-        uniq_list = [str(x) for x in col_series.unique().tolist()]
-        fields.append(
-            CSVField(
-                name=str(col),
-                field_type=str(col_series.dtype),
-                null_count=col_series.isna().sum(),
-                unique_count=len(uniq_list),
-                uniques=uniq_list if len(uniq_list) <= CSV_UNIQUE_COL_LIMIT else []
-            )
+    return create_csv_metadata_chunked(_id, file_path)
+
+
+def create_csv_metadata_chunked(_id: str, file_path: str, source: IO[bytes] | None = None) -> CSVFileMetadata:
+    '''
+    Generate metadata for a CSV file reading CSV_CHUNK_ROWS rows at a time,
+    from 'source' (e.g. a ZIP member stream) instead of file_path when given.
+    '''
+    logger.info("Profiling '%s' in chunks of %d rows", file_path, CSV_CHUNK_ROWS)
+    sidecar = SidecarWriter(file_path)
+    with pd.read_csv(file_path if source is None else source, chunksize=CSV_CHUNK_ROWS) as chunks:
+        profiler = profile_chunks(
+            (chunk.infer_objects() for chunk in chunks), on_chunk=sidecar.write
         )
+    fields = profiler.fields()
     logger.debug("Creating CSV metadata for file: '%s'", file_path)
 
     return CSVFileMetadata(
         id=_id,
         file_path=file_path,
-        row_count=len(df),
+        row_count=profiler.row_count,
         col_count=len(fields),
-        fields=fields
+        fields=fields,
+        columnar_file_path=sidecar.close()
     )
@@ -0,0 +1,157 @@
+'''
+Field profiles (type, nulls, uniques) of tabular files, built chunk by chunk
+so files larger than memory can be ingested.
+'''
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from src.data_utils.hyperloglog import HyperLogLog, hash_values
+from src.modals.file_types.csv_data import CSVField
+from src.utils.config import get_env_int
+
+CSV_UNIQUE_COL_LIMIT = 10  # max no. of unique values to be considered to index
+
+# Tabular files are read and profiled in chunks of this many rows.
+CSV_CHUNK_ROWS = get_env_int('CSV_CHUNK_ROWS', 200_000)
+# Distinct values are counted exactly up to this many per field, estimated with HyperLogLog beyond.
+EXACT_DISTINCT_LIMIT = get_env_int('EXACT_DISTINCT_LIMIT', 100_000)
+UNIQUES_PROBE_ROWS = 1000
+
+
+def merge_dtypes(dtypes: List[str]) -> str:
+    '''Type of a field whose chunks were inferred as 'dtypes', like reading it at once would.'''
+    unique_dtypes = set(dtypes)
+    if len(unique_dtypes) == 1:
+        return dtypes[0]
+    if unique_dtypes.issubset({"int64", "float64"}):
+        return "float64"
+    return "object"
+
+
+class FieldProfile:
+    '''
+    Profile of a field in bounded memory: unique values are kept while there are at
+    most CSV_UNIQUE_COL_LIMIT of them, distinct values (numbers, hashes of others) up to
+    EXACT_DISTINCT_LIMIT, and a HyperLogLog sketch estimates the distinct count past that.
+
+    Chunks can be read with different dtypes (e.g. int64 until a decimal shows up), values
+    are only stringified and counted once the field's type over all chunks is known. Numbers
+    of fields which turn out to be text are taken as written like pandas does, e.g. "2.0".
+    '''
+    def __init__(self, name: str):
+        self.name = name
+        self.dtypes: List[str] = []
+        self.null_count = 0
+        # Ordered set of values, None for missing ones. None once past the limit.
+        self.uniques: Dict[Any, None] | None = {}
+        self.distinct_ints: np.ndarray | None = np.empty(0, dtype=np.int64)
+        self.distinct_floats: np.ndarray | None = np.empty(0, dtype=np.float64)
+        self.distinct_hashes: np.ndarray | None = np.empty(0, dtype=np.uint64)  # Of other values
+        self.sketch = HyperLogLog()
+
+    def update(self, series: pd.Series):
+        dtype = str(series.dtype)
+        if len(self.dtypes) == 0 or self.dtypes[-1] != dtype:
+            self.dtypes.append(dtype)
+        self.null_count += int(series.isna().sum())
+
+        hashes = hash_values(series)
+        self.sketch.update_hashes(hashes)
+        if self.distinct_hashes is not None:
+            if pd.api.types.is_integer_dtype(series.dtype):
+                self.distinct_ints = np.union1d(self.distinct_ints, series.to_numpy(dtype=np.int64))
+            elif pd.api.types.is_float_dtype(series.dtype):
+                self.distinct_floats = np.union1d(self.distinct_floats, series.to_numpy(dtype=np.float64))
+            else:
+                self.distinct_hashes = np.union1d(self.distinct_hashes, hashes)
+            distinct = len(self.distinct_ints) + len(self.distinct_floats) + len(self.distinct_hashes)
+            if distinct > EXACT_DISTINCT_LIMIT:
+                self.distinct_ints = self.distinct_floats = self.distinct_hashes = None
+
+        if self.uniques is not None:
+            # Cut off high cardinality fields on the first rows, without hashing the whole chunk
+            chunk_uniques = pd.unique(series.iloc[:UNIQUES_PROBE_ROWS])
+            if len(chunk_uniques) <= CSV_UNIQUE_COL_LIMIT and len(series) > UNIQUES_PROBE_ROWS:
+                chunk_uniques = pd.unique(series)
+            if len(chunk_uniques) > CSV_UNIQUE_COL_LIMIT:
+                self.uniques = None
+            else:
+                for value in chunk_uniques.tolist():
+                    self.uniques[None if pd.isna(value) else value] = None
+                if len(self.uniques) > CSV_UNIQUE_COL_LIMIT:
+                    self.uniques = None
+
+    def unique_labels(self, field_type: str) -> List[str]:
+        '''Unique values as str() of the values typed 'field_type', like reading the file at once.'''
+        labels = []
+        for value in self.uniques:
+            if value is None:
+                labels.append("nan")
+            elif field_type == "float64":
+                labels.append(str(float(value)))
+            else:
+                labels.append(str(value))
+        return list(dict.fromkeys(labels))
+
+    def exact_unique_count(self, field_type: str) -> int:
+        if field_type == "int64":
+            return len(self.distinct_ints)
+        numbers = np.union1d(self.distinct_ints.astype(np.float64), self.distinct_floats)
+        if field_type == "float64":
+            return len(numbers)
+        # Numbers of a text field are its strings in the file, e.g. "3" of an int64 chunk
+        numbers_as_text = pd.Series(
+            [str(value) for value in self.distinct_ints.tolist()]
+            + [np.nan if np.isnan(value) else str(value) for value in self.distinct_floats.tolist()],
+            dtype=object
+        )
+        return len(np.union1d(self.distinct_hashes, hash_values(numbers_as_text)))
+
+    def unique_count(self, field_type: str) -> int:
+        if self.uniques is not None:
+            return len(self.unique_labels(field_type))
+        if self.distinct_hashes is not None:
+            return self.exact_unique_count(field_type)
+        # Estimated, numbers and text of mixed fields may count twice
+        return max(self.sketch.count(), EXACT_DISTINCT_LIMIT + 1)
+
+    def to_field(self) -> CSVField:
+        field_type = merge_dtypes(self.dtypes)
+        return CSVField(
+            name=self.name,
+            field_type=field_type,
+            null_count=self.null_count,
+            unique_count=self.unique_count(field_type),
+            uniques=self.unique_labels(field_type) if self.uniques is not None else []
+        )
+
+
+class DataFrameProfiler:
+    '''Accumulates field profiles over chunks of the same file.'''
+
+    def __init__(self):
+        self.row_count = 0
+        self.profiles: Dict[str, FieldProfile] = {}
+
+    def update(self, df: pd.DataFrame):
+        self.row_count += len(df)
+        for col in df.columns.tolist():
+            name = str(col)
+            if name not in self.profiles:
+                self.profiles[name] = FieldProfile(name)
+            self.profiles[name].update(df[col])
+
+    def fields(self) -> List[CSVField]:
+        return [profile.to_field() for profile in self.profiles.values()]
+
+
+def profile_chunks(chunks: Iterable[pd.DataFrame], on_chunk=None) -> DataFrameProfiler:
+    '''Profiles chunks one at a time, passing each to 'on_chunk' (e.g. to write the sidecar).'''
+    profiler = DataFrameProfiler()
+    for chunk in chunks:
+        profiler.update(chunk)
+        if on_chunk is not None:
+            on_chunk(chunk)
+    return profiler
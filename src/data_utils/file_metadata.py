@@ -1,12 +1,12 @@
+import io
+import os
 import json
-import zipfile
-import tempfile
-from typing import List
-from zipfile import ZipFile
+from typing import List, Tuple
 
-from src.data_utils.csv_field_processor import create_csv_metadata
+from src.data_utils.csv_field_processor import create_csv_metadata, create_csv_metadata_chunked
 from src.data_utils.log_file_processor import create_log_metadata
 from src.data_utils.json_file_processor import create_json_metadata
+from src.data_utils.zip_archive import extract_member, list_members, member_path, open_member
 
 from src.errors import UnknownFileTypeError, UnknownObjectTypeError
 
@@ -20,25 +20,42 @@ from src.utils.logger import get_module_logger
 
 logger = get_module_logger(__name__)
 
+JSON_EXTENSIONS = [FileDataFormat.JSON, 'jsonl', 'ndjson']
+
+
+def get_file_format(file_path: str) -> FileDataFormat | None:
+    """File format by extension, None when it isn't supported"""
+    file_format = file_path.split('.')[-1].lower()
+    if file_format in JSON_EXTENSIONS:
+        return FileDataFormat.JSON
+    try:
+        return FileDataFormat(file_format)
+    except ValueError:
+        return None
+
 
 def create_metadata_from_file(
-    _id: str, file_path: str
+    _id: str, file_path: str, regex_pattern: str | None = None
 ) -> FileMetadata | List[FileMetadata]:
-    """Generate File metadata"""
+    """
+    Generate File metadata.
+    Log fields are extracted with 'regex_pattern' when given, instead of asking the LLM for it.
+    """
     logger.info("Generating file metadata: '%s'", file_path)
-    file_format = file_path.split('.')[-1].lower()
+    file_format = get_file_format(file_path)
 
     if file_format == FileDataFormat.CSV:
         return create_csv_metadata(_id, file_path)
     elif file_format == FileDataFormat.LOG:
-        return create_log_metadata(_id, file_path)
+        return create_log_metadata(_id, file_path, regex_pattern)
     elif file_format == FileDataFormat.ZIP:
         return create_zip_metadata(_id, file_path)
     elif file_format == FileDataFormat.JSON:
         return create_json_metadata(_id, file_path)
 
-    logger.error("Unknown file format '%s' for '%s'", file_format, file_format)
-    raise UnknownFileTypeError(f"Unknown file format '{file_format}' found.")
+    unknown_format = file_path.split('.')[-1].lower()
+    logger.error("Unknown file format '%s' for '%s'", unknown_format, file_path)
+    raise UnknownFileTypeError(f"Unknown file format '{unknown_format}' found.")
 
 
 def convert_metadata_to_json(file_metadata: FileMetadata) -> dict:
@@ -67,7 +84,7 @@ def get_metadata_from_json(obj: dict):
         elif file_format == FileDataFormat.LOG:
             obj["fields"] = json.loads(obj["fields"])
             return LogFileMetadata(**obj)
-        elif file_format == FileDataFormat.JSON:
+        elif file_format in [FileDataFormat.JSON, 'jsonl', 'ndjson']:
             obj["json_keys"] = json.loads(obj["json_keys"])
             return JSONFileMetadata(**obj)
         raise UnknownFileTypeError()
@@ -76,21 +93,56 @@ def get_metadata_from_json(obj: dict):
         raise UnknownObjectTypeError() from error
 
 
+def is_supported_member(member_name: str) -> bool:
+    """Whether the ZIP member is profiled, nested archives are not"""
+    file_format = get_file_format(member_name)
+    return file_format is not None and file_format != FileDataFormat.ZIP
+
+
+def list_zip_members(_id: str, file_path: str, target_dir: str) -> List[Tuple[str, str, str]]:
+    """
+    (file ID, extraction path, member name) of supported files of the ZIP, nothing is extracted.
+    Raises ArchiveLimitError when the archive is over the limits.
+    """
+    return [
+        (f"{_id}-{idx}", member_path(target_dir, idx, member.filename), member.filename)
+        for idx, member in enumerate(list_members(file_path, is_supported_member))
+    ]
+
+
+def create_member_metadata(
+    _id: str, file_path: str, archive_path: str, member_name: str, regex_pattern: str | None = None
+) -> FileMetadata:
+    """
+    Generate metadata of a ZIP member, extracted to file_path when needed.
+    Logs are parsed in several passes so they are extracted, others are profiled from the archive stream.
+    """
+    logger.info("Generating file metadata: '%s' of '%s'", member_name, archive_path)
+    file_format = get_file_format(member_name)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    if file_format == FileDataFormat.LOG:
+        if not os.path.exists(file_path):
+            extract_member(archive_path, member_name, file_path)
+        file_metadata = create_log_metadata(_id, file_path, regex_pattern)
+    elif file_format == FileDataFormat.CSV:
+        with open_member(archive_path, member_name) as source:
+            file_metadata = create_csv_metadata_chunked(_id, file_path, source)
+    elif file_format == FileDataFormat.JSON:
+        with open_member(archive_path, member_name) as source:
+            file_metadata = create_json_metadata(_id, file_path, io.TextIOWrapper(source, encoding='utf-8'))
+    else:
+        raise UnknownFileTypeError(f"Unknown file format for '{member_name}'.")
+
+    file_metadata.archive_path = archive_path
+    file_metadata.archive_member = member_name
+    return file_metadata
+
+
 def create_zip_metadata(_id: str, file_path: str) -> List[FileMetadata]:
-    """Looks into ZIP file and extracts valid metadata files"""
-    temp_dir = tempfile.mkdtemp(prefix="daita")
-    # First extract the file into temp directory then move it into vectordb later in the callee
-    file_metadatas = []
-    if zipfile.is_zipfile(file_path):
-        with ZipFile(file_path, "r") as zip_ref:
-            for file in zip_ref.namelist():
-                new_file_id = f"{_id}-{len(file_metadatas)}"
-                target_path = zip_ref.extract(file, path=temp_dir)
-                try:
-                    if not target_path.endswith(".zip"):
-                        file_metadatas.append(
-                            create_metadata_from_file(new_file_id, target_path)
-                        )
-                except UnknownFileTypeError:
-                    pass
-    return file_metadatas
+    """Looks into ZIP file and profiles its valid members, extracting them next to it only when needed"""
+    target_dir = os.path.join(os.path.dirname(file_path), _id)
+    return [
+        create_member_metadata(member_id, target_path, file_path, member_name)
+        for member_id, target_path, member_name in list_zip_members(_id, file_path, target_dir)
+    ]
@@ -0,0 +1,190 @@
+'''
+Ingestion of a batch of files (and members of ZIP archives).
+
+Files are profiled in a pool of worker processes, ZIP members straight from the archive. Log files first need a regex
+pattern from the LLM; those calls run concurrently on the shared event loop and
+each log is profiled as soon as its pattern arrives.
+'''
+import os
+import atexit
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Tuple
+
+from src.data_utils.file_metadata import (
+    create_member_metadata,
+    create_metadata_from_file,
+    get_file_format,
+    list_zip_members,
+)
+from src.data_utils.log_file_processor import log_field_extractor_task, read_sample_lines
+from src.data_utils.log_parser import share_parse_workers
+from src.data_utils.zip_archive import extract_member
+from src.llm.event_loop import submit
+from src.llm.llm_executor import LLMTaskExecutor
+from src.modals.file_types.base import FileDataFormat, FileMetadata
+from src.modals.vectordb_data import IngestProgress
+from src.utils.config import get_env_int, get_env_str
+from src.utils.logger import get_module_logger
+
+
+INGEST_WORKERS = get_env_int('INGEST_WORKERS', min(os.cpu_count() or 1, 8))
+INGEST_START_METHOD = get_env_str('INGEST_START_METHOD', 'spawn')
+
+logger = get_module_logger(__name__)
+
+# Receives progress after each file is profiled (or failed).
+IngestProgressCallback = Callable[[IngestProgress], None]
+
+_pool: concurrent.futures.ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_ingest_pool() -> concurrent.futures.ProcessPoolExecutor:
+    '''Returns the process-wide pool profiling files, shared by all sessions.'''
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Workers share the log parsing processes instead of starting LOG_PARSE_WORKERS each
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                INGEST_WORKERS,
+                mp_context=multiprocessing.get_context(INGEST_START_METHOD),
+                initializer=share_parse_workers,
+                initargs=(INGEST_WORKERS,),
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def reset_ingest_pool():
+    '''Drops a pool broken by a crashed worker (e.g. out of memory), the next batch starts a new one.'''
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def expand_files(
+    files: List[Tuple[str, str]], extract_dir: str
+) -> Tuple[List[Tuple[str, str, str, str]], List[Tuple[str, Exception]]]:
+    '''
+    (file ID, path, archive path, member name) of each file to profile, archives are replaced
+    by their members ("" archive for other files). Also returns the archives which failed.
+    '''
+    jobs = []
+    failures = []
+    for file_id, file_path in files:
+        if get_file_format(file_path) != FileDataFormat.ZIP:
+            jobs.append((file_id, file_path, "", ""))
+            continue
+        try:
+            for member_id, member_path, member_name in list_zip_members(
+                file_id, file_path, os.path.join(extract_dir, file_id)
+            ):
+                # The LLM is asked for log patterns from their first lines, before profiling
+                if get_file_format(member_name) == FileDataFormat.LOG:
+                    extract_member(file_path, member_name, member_path)
+                jobs.append((member_id, member_path, file_path, member_name))
+        except Exception as error:
+            logger.error("Unable to ingest '%s': %s", file_path, error)
+            failures.append((file_path, error))
+    return jobs, failures
+
+
+def submit_profiling(
+    profiler: concurrent.futures.Executor,
+    job: Tuple[str, str, str, str],
+    regex_pattern: str | None = None
+) -> concurrent.futures.Future:
+    file_id, file_path, archive_path, member_name = job
+    if archive_path != "":
+        return profiler.submit(create_member_metadata, file_id, file_path, archive_path, member_name, regex_pattern)
+    return profiler.submit(create_metadata_from_file, file_id, file_path, regex_pattern)
+
+
+def ingest_files(
+    files: List[Tuple[str, str]],
+    extract_dir: str,
+    progress_cb: IngestProgressCallback | None = None
+) -> Tuple[List[FileMetadata], List[Tuple[str, Exception]]]:
+    '''
+    Profiles files given as (file ID, path), archives are extracted into 'extract_dir'.
+    Returns metadata of the files profiled successfully and the (file path, error) of the others.
+    '''
+    jobs, failures = expand_files(files, extract_dir)
+    if len(jobs) == 0:
+        return [], failures
+
+    # A single file isn't worth starting worker processes for
+    use_processes = len(jobs) > 1 and INGEST_WORKERS > 1
+    profiler = get_ingest_pool() if use_processes else concurrent.futures.ThreadPoolExecutor(1)
+
+    # Future to the job it profiles, or of the log it extracts fields of
+    profiling: Dict[concurrent.futures.Future, Tuple[str, str, str, str]] = {}
+    extracting: Dict[concurrent.futures.Future, Tuple[str, str, str, str]] = {}
+    metadatas: List[FileMetadata] = []
+    total = len(jobs) + len(failures)
+
+    def report(file_path: str, error: Exception | None = None):
+        if error is not None:
+            logger.error("Unable to ingest '%s': %s", file_path, error)
+            failures.append((file_path, error))
+        if progress_cb is not None:
+            progress_cb(IngestProgress(
+                file_name=os.path.basename(file_path),
+                done=len(metadatas) + len(failures),
+                total=total,
+                error=str(error) if error is not None else None,
+            ))
+
+    for job in jobs:
+        file_path = job[1]
+        if get_file_format(file_path) == FileDataFormat.LOG:
+            try:
+                task = log_field_extractor_task(file_path, read_sample_lines(file_path))
+            except Exception as error:
+                report(file_path, error)
+                continue
+            extracting[submit(LLMTaskExecutor().execute_async(task))] = job
+        else:
+            profiling[submit_profiling(profiler, job)] = job
+
+    try:
+        while len(profiling) + len(extracting) != 0:
+            done, _ = concurrent.futures.wait(
+                list(profiling) + list(extracting), return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future in extracting:
+                    job = extracting.pop(future)
+                    file_path = job[1]
+                    try:
+                        profiling[submit_profiling(profiler, job, future.result().text)] = job
+                    except Exception as error:
+                        report(file_path, error)
+                    continue
+
+                file_path = profiling.pop(future)[1]
+                try:
+                    metadatas.append(future.result())
+                except BrokenProcessPool as error:
+                    reset_ingest_pool()
+                    report(file_path, error)
+                    continue
+                except Exception as error:
+                    report(file_path, error)
+                    continue
+                report(file_path)
+    finally:
+        for future in list(profiling) + list(extracting):
+            future.cancel()
+        if not use_processes:
+            profiler.shutdown(wait=False)
+
+    # Keep the order files were given in
+    order = {job[0]: idx for idx, job in enumerate(jobs)}
+    metadatas.sort(key=lambda metadata: order[metadata.id])
+    return metadatas, failures
@@ -1,5 +1,5 @@
 import json
-from typing import List
+from typing import IO, List
 from src.modals.file_types.json_data import JSONFileMetadata, JSONKey, JSONType
 from src.utils.logger import get_module_logger
 
@@ -8,12 +8,13 @@ logger = get_module_logger(__name__)
 MAX_ITEM_LOOK_UP_FOR_TYPE = 100
 
 
-def create_json_metadata(_id: str, file_path: str) -> JSONFileMetadata:
-    '''Generate metadata for JSON file'''
-    json_data = None
-
-    with open(file_path, 'r', encoding='utf-8') as fp:
-        json_data = json.load(fp)
+def create_json_metadata(_id: str, file_path: str, source: IO[str] | None = None) -> JSONFileMetadata:
+    '''Generate metadata for JSON file, read from the seekable 'source' (e.g. a ZIP member) when given'''
+    if source is None:
+        with open(file_path, 'r', encoding='utf-8') as fp:
+            json_data = read_json_sample(fp)
+    else:
+        json_data = read_json_sample(source)
 
     json_keys = generate_json_keys_for_obj(json_data)
 
@@ -24,6 +25,30 @@ def create_json_metadata(_id: str, file_path: str) -> JSONFileMetadata:
     )
 
 
+def read_json_sample(fp):
+    '''Whole JSON value, or the first values of a JSON Lines file'''
+    try:
+        return json.load(fp)
+    except json.JSONDecodeError as e:
+        # JSON Lines, keys are looked up from the first values
+        if e.msg != "Extra data":
+            raise e
+        fp.seek(0)
+        return read_json_lines(fp, MAX_ITEM_LOOK_UP_FOR_TYPE)
+
+
+def read_json_lines(fp, max_items: int) -> list:
+    '''Parse up to max_items values of a JSON Lines file'''
+    items = []
+    for line in fp:
+        if line.strip() == "":
+            continue
+        items.append(json.loads(line))
+        if len(items) >= max_items:
+            break
+    return items
+
+
 def generate_json_keys_for_obj(obj: dict | list) -> List[JSONKey]:
     '''Flattens json data'''
     result_keys = []
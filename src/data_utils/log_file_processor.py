@@ -1,11 +1,22 @@
-import re
 import os
 import random
-from typing import List
+from itertools import islice
+from typing import Iterator, List
 import pandas as pd
-from src.data_utils.csv_field_processor import CSV_UNIQUE_COL_LIMIT
-from src.modals.file_types.csv_data import CSVField
-from src.modals.file_types.log_data import LogFileMetadata
+from src.data_utils.columnar_store import SidecarWriter
+from src.data_utils.df_profiler import profile_chunks
+from src.data_utils.log_parser import (
+    LOG_PARSE_CHUNK_BYTES,
+    UNMATCHED_SAMPLE_SIZE,
+    ColumnTypeMismatch,
+    ColumnTypes,
+    infer_column_types,
+    iter_parsed_ranges,
+    log_parse_stats,
+    parse_lines,
+    split_lines,
+)
+from src.modals.file_types.log_data import LogFileMetadata, LogParseStats
 from src.llm.llm_executor import LLMTaskExecutor
 from src.llm.tasks.log_field_extractor import LogFieldExtractorTask
 from src.utils.logger import get_module_logger
@@ -13,75 +24,100 @@ from src.utils.logger import get_module_logger
 logger = get_module_logger(__name__)
 
 TOP_K_LINES = 5  # No. of log lines to pass in the context of LogFieldExtractor
-
-
-def create_log_metadata(_id: str, file_path: str) -> LogFileMetadata:
-    '''Generate metadata for a Log file'''
-    log_lines = open(file_path, 'r', encoding='utf-8').readlines()
-
-    # Generate regex pattern to extract fields from log
-    regex_pattern = extract_regex_pattern(file_path, log_lines)
-
-    parsed_logs = []
-
-    for i, line in enumerate(log_lines):
+SAMPLE_LINES = 10_000  # First lines of the file which TOP_K_LINES are sampled from
+
+
+def create_log_metadata(_id: str, file_path: str, regex_pattern: str | None = None) -> LogFileMetadata:
+    '''
+    Generate metadata for a Log file, asking the LLM for the regex pattern when not given.
+    The file is parsed in chunks of LOG_PARSE_CHUNK_BYTES, in parallel when there are several.
+    Column types are inferred from the first lines and widened (restarting) when a chunk doesn't fit.
+    '''
+    sample_lines = read_sample_lines(file_path)
+    if regex_pattern is None:
+        regex_pattern = extract_regex_pattern(file_path, sample_lines)
+    column_types = infer_column_types(parse_lines(regex_pattern, split_lines("".join(sample_lines)))[0])
+
+    while True:
+        logger.info("Parsing '%s' in chunks of %d bytes", file_path, LOG_PARSE_CHUNK_BYTES)
+        stats = LogParseStats()
+        sidecar = SidecarWriter(file_path)
         try:
-            match = re.match(regex_pattern, line)
-            if match:
-                parsed_logs.append(
-                    match.groupdict()
-                )
-            else:
-                raise Exception("Match not found!")
-        except Exception as error:
-            logger.error("Unable to parse log line id: %s (error: %s)", i, error)
-
-    if len(parsed_logs) == 0:
-        raise Exception("Unable to parse log file")
-
-    df = pd.DataFrame(parsed_logs).infer_objects()
-
-    logger.info("No. of log fields identified: %d", df.shape[1])
-
-    fields = []
-
-    for col in df.columns.tolist():
-        col_series = df[col]
-        uniq_list = [str(x) for x in col_series.unique().tolist()]
-        fields.append(
-            CSVField(
-                name=str(col),
-                field_type=str(col_series.dtype),
-                null_count=col_series.isna().sum(),
-                unique_count=len(uniq_list),
-                uniques=uniq_list if len(uniq_list) <= CSV_UNIQUE_COL_LIMIT else []
+            profiler = profile_chunks(
+                iter_parsed_chunks(file_path, regex_pattern, column_types, stats), on_chunk=sidecar.write
             )
-        )
+            break
+        except ColumnTypeMismatch as mismatch:
+            if (partial_path := sidecar.close()) != "":
+                os.remove(partial_path)
+            logger.info("Reparsing '%s': %s", file_path, mismatch)
+            column_types = mismatch.column_types
+
+    log_parse_stats(file_path, stats)
+    if profiler.row_count == 0:
+        raise Exception("Unable to parse log file")
+    logger.info("No. of log fields identified: %d", len(profiler.profiles))
 
-    # Store Parsed Log into CSV
-    df_path = file_path.replace(".log", "") + ".csv"
-    df.to_csv(df_path, index=False)
+    # Store Parsed Log as Parquet, falling back to CSV
+    columnar_path = sidecar.close()
+    df_path = ""
+    if columnar_path == "":
+        df_path = log_csv_path(file_path)
+        for idx, chunk in enumerate(iter_parsed_chunks(file_path, regex_pattern, column_types)):
+            chunk.to_csv(df_path, index=False, mode='w' if idx == 0 else 'a', header=idx == 0)
 
+    fields = profiler.fields()
     logger.debug("Creating Log metadata for file: '%s'", file_path)
 
     return LogFileMetadata(
         id=_id,
         file_path=file_path,
-        row_count=len(df),
+        row_count=profiler.row_count,
         col_count=len(fields),
         fields=fields,
-        log_line_count=len(log_lines),
-        csv_file_path=df_path
+        log_line_count=stats.line_count,
+        unmatched_line_count=stats.line_count - stats.matched_count,
+        csv_file_path=df_path,
+        columnar_file_path=columnar_path
     )
 
 
+def read_sample_lines(file_path: str) -> List[str]:
+    '''Lines TOP_K_LINES are sampled from, the first SAMPLE_LINES of the file'''
+    with open(file_path, 'r', encoding='utf-8') as fp:
+        return list(islice(fp, SAMPLE_LINES))
+
+
+def log_field_extractor_task(file_path: str, log_lines: List[str], metadata=None) -> LogFieldExtractorTask:
+    return LogFieldExtractorTask(
+        file_name=os.path.basename(file_path),
+        log_lines=random.choices(log_lines, k=TOP_K_LINES),
+        metadata=metadata
+    )
+
+
+def log_csv_path(file_path: str) -> str:
+    return file_path.replace(".log", "") + ".csv"
+
+
+def iter_parsed_chunks(
+    file_path: str,
+    regex_pattern: str,
+    column_types: ColumnTypes,
+    stats: LogParseStats | None = None
+) -> Iterator[pd.DataFrame]:
+    '''Typed DataFrames of parsed lines in file order, match statistics are added to stats'''
+    for df, chunk_stats in iter_parsed_ranges(file_path, regex_pattern, column_types):
+        if stats is not None:
+            stats.merge(chunk_stats, UNMATCHED_SAMPLE_SIZE)
+        if len(df) != 0:
+            yield df
+
+
 def extract_regex_pattern(file_path: str, log_lines: List[str]) -> str:
     '''Pass logs to LLM to extract log fileds'''
     llm_executor = LLMTaskExecutor()
 
-    regex_pattern = llm_executor.execute(LogFieldExtractorTask(
-        file_name=os.path.basename(file_path),
-        log_lines=random.choices(log_lines, k=TOP_K_LINES)
-    )).text
+    regex_pattern = llm_executor.execute(log_field_extractor_task(file_path, log_lines)).text
 
     return regex_pattern
@@ -0,0 +1,261 @@
+'''
+Parsing of log files with the regex pattern extracted by the LLM.
+
+The pattern is compiled once and matched line by line into tuples, which become typed
+DataFrame columns. Files are split into byte ranges on line boundaries, parsed in
+parallel by worker processes when there are several and yielded back in order.
+'''
+import os
+import re
+import atexit
+import threading
+import multiprocessing
+import concurrent.futures
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+from src.modals.file_types.log_data import LogParseStats
+from src.utils.config import get_env_int, get_env_str
+from src.utils.logger import get_module_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+
+LOG_PARSE_WORKERS = get_env_int('LOG_PARSE_WORKERS', os.cpu_count() or 1)
+LOG_PARSE_CHUNK_BYTES = get_env_int('LOG_PARSE_CHUNK_BYTES', 32 * 1024 * 1024)
+LOG_PARSE_START_METHOD = get_env_str('LOG_PARSE_START_METHOD', 'spawn')
+UNMATCHED_SAMPLE_SIZE = 5  # Unmatched lines kept to report
+
+logger = get_module_logger(__name__)
+
+# Field name to "int64", "float64" or "object", the type of the field's column
+ColumnTypes = Dict[str, str]
+COLUMN_TYPE_ORDER = ["int64", "float64", "object"]  # Narrowest first
+
+_pool: concurrent.futures.ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_parse_workers = LOG_PARSE_WORKERS  # Fewer in processes of another pool (e.g. ingest workers)
+
+
+class ColumnTypeMismatch(Exception):
+    '''A chunk has values which don't fit the column types, parsing restarts with wider ones.'''
+    def __init__(self, column_types: ColumnTypes):
+        super().__init__(f"Column types changed to {column_types}")
+        self.column_types = column_types
+
+
+@lru_cache(maxsize=32)
+def compile_log_pattern(regex_pattern: str) -> re.Pattern:
+    return re.compile(regex_pattern)
+
+
+def parse_numbers(values: pd.Series) -> pd.Series | None:
+    '''
+    Parsed strings, int64 unless there are nulls or decimals (float64).
+    None when some aren't numbers. Arrow parses them much faster than pandas.
+    '''
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return values
+    if pa is None:
+        try:
+            return pd.to_numeric(values)
+        except (ValueError, TypeError):
+            return None
+    try:
+        strings = pa.array(values, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    for number_type in ([pa.int64()] if strings.null_count == 0 else []) + [pa.float64()]:
+        try:
+            numbers = pc.cast(strings, number_type)
+        except pa.ArrowInvalid:
+            continue
+        return pd.Series(numbers.to_numpy(zero_copy_only=False), index=values.index, name=values.name)
+    return None
+
+
+def infer_column_types(df: pd.DataFrame) -> ColumnTypes:
+    '''Fields whose values are all numbers are numeric, the others strings.'''
+    column_types = {}
+    for col in df.columns:
+        numbers = parse_numbers(df[col])
+        if numbers is None:
+            column_types[col] = "object"
+        else:
+            column_types[col] = "int64" if str(numbers.dtype) == "int64" else "float64"
+    return column_types
+
+
+def merge_column_types(column_types: ColumnTypes, other: ColumnTypes) -> ColumnTypes:
+    '''Narrowest column types fitting the values of both.'''
+    return {
+        col: max(col_type, other.get(col, col_type), key=COLUMN_TYPE_ORDER.index)
+        for col, col_type in column_types.items()
+    }
+
+
+def apply_column_types(df: pd.DataFrame, column_types: ColumnTypes) -> pd.DataFrame:
+    '''Converts numeric columns, raises ColumnTypeMismatch when values don't fit their type.'''
+    for col, col_type in column_types.items():
+        if col_type == "object" or col not in df.columns:
+            continue
+        if len(df) == 0:
+            df[col] = df[col].astype(col_type)
+            continue
+        numbers = parse_numbers(df[col])
+        if numbers is None or (col_type == "int64" and str(numbers.dtype) != "int64"):
+            raise ColumnTypeMismatch(merge_column_types(column_types, infer_column_types(df)))
+        df[col] = numbers.astype(col_type)
+    return df
+
+
+def parse_lines(
+    regex_pattern: str, lines: List[str], column_types: ColumnTypes | None = None
+) -> Tuple[pd.DataFrame, LogParseStats]:
+    '''
+    Named groups of the lines matching the pattern as columns, typed with 'column_types'
+    (inferred from the lines when not given), and match statistics.
+    '''
+    pattern = compile_log_pattern(regex_pattern)
+    matches = list(map(pattern.match, lines))
+    rows = [match.groups() for match in matches if match is not None]
+
+    names = sorted(pattern.groupindex, key=pattern.groupindex.get)
+    df = pd.DataFrame(rows, columns=range(1, pattern.groups + 1))
+    df = df[[pattern.groupindex[name] for name in names]]
+    df.columns = names
+
+    stats = LogParseStats(line_count=len(lines), matched_count=len(rows))
+    if len(rows) != len(lines):
+        stats.unmatched_samples = [
+            line for line, match in zip(lines, matches) if match is None
+        ][:UNMATCHED_SAMPLE_SIZE]
+
+    if column_types is None:
+        column_types = infer_column_types(df)
+    return apply_column_types(df, column_types), stats
+
+
+def split_lines(text: str) -> List[str]:
+    '''Lines of the text without line endings, like reading it in text mode'''
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+def chunk_ranges(file_path: str, chunk_bytes: int = LOG_PARSE_CHUNK_BYTES) -> List[Tuple[int, int]]:
+    '''(start, end) byte offsets of about 'chunk_bytes' each, ending on line boundaries'''
+    file_size = os.path.getsize(file_path)
+    ranges = []
+    start = 0
+    with open(file_path, 'rb') as fp:
+        while start < file_size:
+            fp.seek(min(start + chunk_bytes, file_size))
+            fp.readline()
+            end = min(fp.tell(), file_size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(
+    file_path: str, start: int, end: int, regex_pattern: str, column_types: ColumnTypes | None
+) -> Tuple[pd.DataFrame, LogParseStats]:
+    '''parse_lines() of the lines between the byte offsets, run in worker processes'''
+    with open(file_path, 'rb') as fp:
+        fp.seek(start)
+        text = fp.read(end - start).decode('utf-8')
+    return parse_lines(regex_pattern, split_lines(text), column_types)
+
+
+def share_parse_workers(pool_size: int):
+    '''
+    Initializer of worker processes of a pool of 'pool_size', which share LOG_PARSE_WORKERS
+    between them. When there are fewer workers than the pool, logs are parsed inline.
+    '''
+    global _parse_workers
+    _parse_workers = max(1, LOG_PARSE_WORKERS // max(1, pool_size))
+
+
+def get_parse_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                _parse_workers, mp_context=multiprocessing.get_context(LOG_PARSE_START_METHOD)
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def iter_parsed_ranges(
+    file_path: str, regex_pattern: str, column_types: ColumnTypes
+) -> Iterator[Tuple[pd.DataFrame, LogParseStats]]:
+    '''
+    Parsed chunks of the file in order, several at a time in worker processes.
+    When chunks don't fit 'column_types', the rest of the file is still parsed to raise
+    ColumnTypeMismatch with types fitting all of it, so a single reparse is needed.
+    '''
+    widened: ColumnTypes | None = None
+    for get_result in iter_range_results(file_path, regex_pattern, column_types):
+        try:
+            result = get_result()
+        except ColumnTypeMismatch as mismatch:
+            widened = merge_column_types(widened or column_types, mismatch.column_types)
+            continue
+        if widened is None:
+            yield result
+    if widened is not None:
+        raise ColumnTypeMismatch(widened)
+
+
+def iter_range_results(
+    file_path: str, regex_pattern: str, column_types: ColumnTypes
+) -> Iterator[Callable[[], Tuple[pd.DataFrame, LogParseStats]]]:
+    '''Functions returning the parsed chunks in order, computed ahead by the pool for large files.'''
+    ranges = chunk_ranges(file_path)
+    if len(ranges) <= 1 or _parse_workers <= 1:
+        for start, end in ranges:
+            yield partial(parse_range, file_path, start, end, regex_pattern, column_types)
+        return
+
+    pool = get_parse_pool()
+    # Bounded number of chunks in flight, so memory doesn't grow with the file
+    pending: List[concurrent.futures.Future] = []
+    next_range = iter(ranges)
+    try:
+        for start, end in next_range:
+            pending.append(pool.submit(parse_range, file_path, start, end, regex_pattern, column_types))
+            if len(pending) >= 2 * _parse_workers:
+                break
+        while len(pending) != 0:
+            future = pending.pop(0)
+            for start, end in next_range:
+                pending.append(pool.submit(parse_range, file_path, start, end, regex_pattern, column_types))
+                break
+            yield future.result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def log_parse_stats(file_path: str, stats: LogParseStats):
+    logger.info(
+        "Parsed %d of %d lines of '%s' (%.2f%%)",
+        stats.matched_count, stats.line_count, file_path, 100 * stats.match_rate
+    )
+    if len(stats.unmatched_samples) > 0:
+        logger.warning(
+            "%d lines of '%s' don't match the log pattern, e.g.: %s",
+            stats.line_count - stats.matched_count, file_path, stats.unmatched_samples
+        )
@@ -0,0 +1,111 @@
+'''
+Members of ZIP archives, filtered from the central directory before anything is
+decompressed. Tabular and JSON members are profiled from the archive stream and
+only extracted when generated code needs the raw file (e.g. no columnar sidecar).
+'''
+import os
+import shutil
+import threading
+import zipfile
+from typing import IO, Callable, List
+
+from src.errors import ArchiveLimitError
+from src.modals.file_types.base import FileMetadata
+from src.utils.config import get_env_int
+from src.utils.logger import get_module_logger
+
+
+ZIP_MAX_MEMBERS = get_env_int('ZIP_MAX_MEMBERS', 1000)  # Supported members per archive
+ZIP_MAX_TOTAL_BYTES = get_env_int('ZIP_MAX_TOTAL_BYTES', 8 * 1024 * 1024 * 1024)  # Uncompressed
+ZIP_MAX_MEMBER_BYTES = get_env_int('ZIP_MAX_MEMBER_BYTES', 4 * 1024 * 1024 * 1024)  # Larger ones are skipped
+# Uncompressed to compressed size of members, higher ones are taken for ZIP bombs
+ZIP_MAX_COMPRESSION_RATIO = get_env_int('ZIP_MAX_COMPRESSION_RATIO', 200)
+ZIP_RATIO_MIN_BYTES = 1024 * 1024  # Smaller members can't expand to much, whatever their ratio
+EXTRACT_CHUNK_SIZE = 1024 * 1024
+
+logger = get_module_logger(__name__)
+
+_extract_lock = threading.Lock()
+
+
+def list_members(file_path: str, is_supported: Callable[[str], bool]) -> List[zipfile.ZipInfo]:
+    '''
+    Members of the archive whose name 'is_supported', within the size limit, without decompressing any.
+    Raises ArchiveLimitError when they exceed ZIP_MAX_MEMBERS or ZIP_MAX_TOTAL_BYTES, or one
+    expands more than ZIP_MAX_COMPRESSION_RATIO times. Reading a member never yields more than
+    its listed size, zipfile stops there.
+    '''
+    if not zipfile.is_zipfile(file_path):
+        return []
+    members = []
+    with zipfile.ZipFile(file_path, "r") as zip_ref:
+        for member in zip_ref.infolist():
+            if member.is_dir() or not is_supported(member.filename):
+                continue
+            if member.file_size > ZIP_MAX_MEMBER_BYTES:
+                logger.warning(
+                    "Skipping '%s' of '%s': %d bytes uncompressed", member.filename, file_path, member.file_size
+                )
+                continue
+            ratio = member.file_size / max(member.compress_size, 1)
+            if member.file_size >= ZIP_RATIO_MIN_BYTES and ratio > ZIP_MAX_COMPRESSION_RATIO:
+                raise ArchiveLimitError(
+                    f"'{member.filename}' expands {ratio:.0f} times, the limit is {ZIP_MAX_COMPRESSION_RATIO}."
+                )
+            members.append(member)
+
+    if len(members) > ZIP_MAX_MEMBERS:
+        raise ArchiveLimitError(f"Archive has {len(members)} files, the limit is {ZIP_MAX_MEMBERS}.")
+    total_bytes = sum(member.file_size for member in members)
+    if total_bytes > ZIP_MAX_TOTAL_BYTES:
+        raise ArchiveLimitError(
+            f"Archive has {total_bytes} bytes uncompressed, the limit is {ZIP_MAX_TOTAL_BYTES}."
+        )
+    return members
+
+
+def member_path(target_dir: str, idx: int, member_name: str) -> str:
+    '''
+    Where the idx-th member is (or would be) extracted, a directory per member avoids name clashes.
+    Only the base name is kept, so names like "../x.csv" can't escape 'target_dir'.
+    '''
+    return os.path.join(target_dir, str(idx), os.path.basename(member_name))
+
+
+def open_member(archive_path: str, member_name: str) -> IO[bytes]:
+    '''Decompressing stream of the member, closing the archive with it.'''
+    zip_ref = zipfile.ZipFile(archive_path, "r")
+    try:
+        stream = zip_ref.open(member_name, "r")
+    except Exception:
+        zip_ref.close()
+        raise
+    # ZipFile closes its file once the last open member is closed
+    zip_ref.close()
+    return stream
+
+
+def extract_member(archive_path: str, member_name: str, target_path: str) -> str:
+    '''Streams the member to 'target_path', atomically so concurrent readers never see a partial file.'''
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    partial_path = f"{target_path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with open_member(archive_path, member_name) as source, open(partial_path, "wb") as target:
+            shutil.copyfileobj(source, target, EXTRACT_CHUNK_SIZE)
+        os.replace(partial_path, target_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    logger.debug("Extracted '%s' of '%s'", member_name, archive_path)
+    return target_path
+
+
+def local_file_path(file_metadata: FileMetadata) -> str:
+    '''Path of the raw file, extracting it from its archive on first use.'''
+    file_path = file_metadata.file_path
+    if file_metadata.archive_path == "" or os.path.exists(file_path):
+        return file_path
+    with _extract_lock:
+        if not os.path.exists(file_path):
+            extract_member(file_metadata.archive_path, file_metadata.archive_member, file_path)
+    return file_path
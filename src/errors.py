@@ -4,3 +4,23 @@ class UnknownFileTypeError(Exception):
 
 class UnknownObjectTypeError(Exception):
     pass
+
+
+class SandboxExecutionError(Exception):
+    '''Generated code raised an error inside a sandbox worker.'''
+    pass
+
+
+class SandboxResourceError(SandboxExecutionError):
+    '''Sandbox worker exceeded its time, memory or CPU limit.'''
+    pass
+
+
+class CodeValidationError(Exception):
+    '''Generated code failed static checks before execution.'''
+    pass
+
+
+class ArchiveLimitError(Exception):
+    '''Archive exceeds the member count, uncompressed size or compression ratio limits.'''
+    pass
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+from typing import Any, Coroutine
+
+from src.utils.config import get_env_int
+from src.utils.logger import get_module_logger
+
+
+MAX_CONCURRENT_LLM_CALLS = get_env_int('LLM_MAX_CONCURRENCY', 256)
+
+logger = get_module_logger(__name__)
+
+_lock = threading.Lock()
+_loop: asyncio.AbstractEventLoop | None = None
+_semaphore: asyncio.Semaphore | None = None
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    '''
+    Returns the process-wide event loop used for async LLM calls.
+    The loop runs in a daemon thread and is shared by all Streamlit sessions.
+    '''
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="daita-llm-loop",
+                    daemon=True
+                )
+                thread.start()
+                _loop = loop
+                logger.info("Started shared LLM event loop")
+    return _loop
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    '''
+    Global semaphore bounding in-flight LLM calls across sessions.
+    Must only be used from the shared event loop.
+    '''
+    global _semaphore
+    if _semaphore is None:
+        with _lock:
+            if _semaphore is None:
+                _semaphore = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+    return _semaphore
+
+
+def submit(coro: Coroutine) -> concurrent.futures.Future:
+    '''
+    Schedules coroutine on the shared loop and returns a concurrent future.
+    The coroutine runs in a copy of the caller's context, so context variables
+    (e.g. the active trace, see src.utils.tracing) carry over.
+    '''
+    loop = get_event_loop()
+    future = concurrent.futures.Future()
+
+    def copy_result(task: asyncio.Task):
+        if task.cancelled():
+            future.cancel()
+        # Future stays pending (cancellable) until the task is done
+        if not future.set_running_or_notify_cancel():
+            return
+        if task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def start():
+        if future.cancelled():
+            coro.close()
+            return
+        task = loop.create_task(coro)
+        task.add_done_callback(copy_result)
+        future.add_done_callback(
+            lambda _: future.cancelled() and loop.call_soon_threadsafe(task.cancel)
+        )
+
+    loop.call_soon_threadsafe(start, context=contextvars.copy_context())
+    return future
+
+
+def run_coroutine(coro: Coroutine) -> Any:
+    '''
+    Runs coroutine on the shared loop and blocks until it completes.
+    Must not be called from the shared loop itself.
+    '''
+    return submit(coro).result()
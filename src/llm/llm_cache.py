@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import List
+
+from src.modals.llm_data import CacheStats
+from src.utils.config import (
+    get_env_bool,
+    get_env_int,
+    get_env_float,
+    get_env_str,
+    get_env_list,
+)
+from src.utils.logger import get_module_logger
+
+
+LLM_CACHE_ENABLED = get_env_bool('LLM_CACHE_ENABLED', True)
+LLM_CACHE_MEMORY_ITEMS = get_env_int('LLM_CACHE_MEMORY_ITEMS', 1024)
+LLM_CACHE_DISK_PATH = get_env_str(
+    'LLM_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), "daita", "llm_cache.sqlite3")
+)
+LLM_CACHE_DISK_MAX_BYTES = get_env_int('LLM_CACHE_DISK_MAX_BYTES', 256 * 1024 * 1024)
+LLM_CACHE_TTL_SECONDS = get_env_float('LLM_CACHE_TTL_SECONDS', 7 * 24 * 60 * 60)
+# Comma separated TasksTag values which should never be served from cache.
+LLM_CACHE_DISABLED_TAGS = get_env_list('LLM_CACHE_DISABLED_TAGS')
+
+logger = get_module_logger(__name__)
+
+
+def make_cache_key(model: str, sys_prompt: str, user_prompt: str, sampling_params: dict) -> str:
+    '''Content address of an LLM request.'''
+    payload = json.dumps(
+        {
+            "model": model,
+            "system": sys_prompt,
+            "user": user_prompt,
+            "sampling": sampling_params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryLRUCache:
+    '''Thread-safe in-memory LRU tier with TTL.'''
+
+    def __init__(self, max_items: int, ttl: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, created_at = item
+            if time.time() - created_at > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, created_at: float | None = None):
+        with self._lock:
+            self._items[key] = (value, created_at or time.time())
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class SQLiteCache:
+    '''On-disk tier, evicts least recently accessed entries beyond max_bytes.'''
+
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> tuple | None:
+        '''Returns (response, created_at) for a live entry.'''
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return row
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        deleted = self._conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)
+        ).rowcount
+        total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()[0]
+        if total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM llm_cache ORDER BY accessed_at ASC"
+            ).fetchall()
+            stale_keys = []
+            for key, size in rows:
+                if total_bytes <= self.max_bytes:
+                    break
+                stale_keys.append((key,))
+                total_bytes -= size
+            self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", stale_keys)
+            deleted += len(stale_keys)
+        self.evictions += deleted
+
+    def size(self) -> tuple:
+        '''Returns (items, bytes) stored on disk.'''
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+class LLMResponseCache:
+    '''
+    Two tier (memory LRU + SQLite) cache of raw LLM responses keyed on
+    make_cache_key(). Only deterministic requests should be cached.
+    '''
+
+    def __init__(
+        self,
+        enabled: bool = LLM_CACHE_ENABLED,
+        memory_items: int = LLM_CACHE_MEMORY_ITEMS,
+        disk_path: str | None = LLM_CACHE_DISK_PATH,
+        disk_max_bytes: int = LLM_CACHE_DISK_MAX_BYTES,
+        ttl: float = LLM_CACHE_TTL_SECONDS,
+        disabled_tags: List[str] = LLM_CACHE_DISABLED_TAGS,
+    ):
+        self.enabled = enabled
+        self.disabled_tags = set(disabled_tags)
+        self.memory = MemoryLRUCache(memory_items, ttl)
+        self.disk = None
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+        if enabled and disk_path:
+            try:
+                self.disk = SQLiteCache(disk_path, disk_max_bytes, ttl)
+            except (sqlite3.Error, OSError) as error:
+                logger.warning("LLM disk cache disabled, unable to open '%s': %s", disk_path, error)
+
+    def is_cacheable(self, tags: list) -> bool:
+        if not self.enabled:
+            return False
+        task_tags = {getattr(tag, 'value', tag) for tag in tags}
+        return len(self.disabled_tags & task_tags) == 0
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self._stats, counter, getattr(self._stats, counter) + 1)
+
+    def get(self, key: str) -> str | None:
+        response = self.memory.get(key)
+        if response is not None:
+            self._count('memory_hits')
+            return response
+
+        if self.disk is not None:
+            try:
+                row = self.disk.get(key)
+            except sqlite3.Error as error:
+                logger.warning("LLM disk cache read failed: %s", error)
+                row = None
+            if row is not None:
+                # Promote into memory tier, keeping the original creation time for TTL.
+                self.memory.set(key, row[0], created_at=row[1])
+                self._count('disk_hits')
+                return row[0]
+
+        self._count('misses')
+        return None
+
+    def set(self, key: str, response: str):
+        self.memory.set(key, response)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, response)
+            except sqlite3.Error as error:
+                logger.warning("LLM disk cache write failed: %s", error)
+        self._count('writes')
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            stats = self._stats.model_copy()
+        stats.memory_items = len(self.memory)
+        stats.evictions = self.memory.evictions
+        if self.disk is not None:
+            stats.disk_items, stats.disk_bytes = self.disk.size()
+            stats.evictions += self.disk.evictions
+        return stats
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+LLM_CACHE = LLMResponseCache()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    return LLM_CACHE
@@ -1,12 +1,42 @@
 import os
+import time
+import threading
+from typing import Iterator
 
-from dotenv import load_dotenv
-from openai import OpenAI
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 
-from src.modals.llm_data import LLM_Client_Type
+from src.modals.llm_data import LLM_Client_Type, LLMClientConfig, PoolStats
+from src.llm.llm_recorder import get_recorder
+from src.utils import tracing
+from src.utils.config import get_env_int, get_env_float
+from src.utils.logger import get_module_logger
 
 
-def query_openai_client(model: str, client: OpenAI, system_prompt: str, user_prompt: str) -> str:
+logger = get_module_logger(__name__)
+
+# Deterministic sampling, which also makes responses safe to cache.
+DEFAULT_SAMPLING_PARAMS = {
+    "temperature": 0,
+    "top_p": 1,
+    "max_tokens": 512,
+}
+
+# Tells OpenAI-compatible stand-ins (src.llm.stand_in_server) which task sent the request.
+TASK_TAG_HEADER = "X-Daita-Task"
+
+
+def trace_usage(completion):
+    '''Adds token usage reported by the server to the current trace span.'''
+    usage = getattr(completion, 'usage', None)
+    if usage is not None:
+        tracing.set_attributes(
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+        )
+
+
+def query_openai_client(model: str, client: OpenAI, system_prompt: str, user_prompt: str, extra_headers: dict | None = None, sampling_params: dict | None = None) -> str:
     '''
     Returns OpenAI compliant client
     '''
@@ -16,13 +46,182 @@ def query_openai_client(model: str, client: OpenAI, system_prompt: str, user_pro
             {"role": "assistant", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
-        temperature=0,
-        top_p=1,
-        max_tokens=512,
+        extra_headers=extra_headers,
+        **(sampling_params or DEFAULT_SAMPLING_PARAMS),
+    )
+    trace_usage(completion)
+    return completion.choices[0].message.content
+
+
+def stream_openai_client(model: str, client: OpenAI, system_prompt: str, user_prompt: str, extra_headers: dict | None = None, sampling_params: dict | None = None) -> Iterator[str]:
+    '''
+    Yields response content deltas as they arrive
+    '''
+    stream = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "assistant", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        stream=True,
+        extra_headers=extra_headers,
+        **(sampling_params or DEFAULT_SAMPLING_PARAMS),
     )
+    with stream:
+        for chunk in stream:
+            if len(chunk.choices) == 0:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+async def aquery_openai_client(model: str, client: AsyncOpenAI, system_prompt: str, user_prompt: str, extra_headers: dict | None = None, sampling_params: dict | None = None) -> str:
+    '''
+    Async variant of query_openai_client
+    '''
+    completion = await client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "assistant", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        extra_headers=extra_headers,
+        **(sampling_params or DEFAULT_SAMPLING_PARAMS),
+    )
+    trace_usage(completion)
     return completion.choices[0].message.content
 
 
+def load_client_config() -> LLMClientConfig:
+    '''Reads LLM client configuration from environment.'''
+    return LLMClientConfig(
+        api_base=os.getenv('OPENAI_API_BASE'),
+        api_key=os.getenv('OPENAI_API_KEY'),
+        model=os.getenv('MODEL'),
+        max_connections=get_env_int('LLM_POOL_MAX_CONNECTIONS', 20),
+        max_keepalive_connections=get_env_int('LLM_POOL_MAX_KEEPALIVE', 10),
+        keepalive_expiry=get_env_float('LLM_POOL_KEEPALIVE_EXPIRY', 30.0),
+        timeout=get_env_float('LLM_REQUEST_TIMEOUT', 120.0),
+    )
+
+
+class LLMClientRegistry:
+    '''
+    Process-wide registry of LLM clients.
+
+    Configuration is read once and all clients share a single keep-alive
+    HTTP connection pool, so executors and Streamlit sessions reuse
+    connections instead of paying TLS setup on every task.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._config: LLMClientConfig | None = None
+        self._http_client: httpx.Client | None = None
+        self._async_http_client: httpx.AsyncClient | None = None
+        self._clients = {}
+
+    @property
+    def config(self) -> LLMClientConfig:
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    self._config = load_client_config()
+        return self._config
+
+    def get_http_client(self) -> httpx.Client:
+        '''Returns the shared keep-alive HTTP client.'''
+        if self._http_client is None:
+            config = self.config
+            with self._lock:
+                if self._http_client is None:
+                    self._http_client = DefaultHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=config.max_connections,
+                            max_keepalive_connections=config.max_keepalive_connections,
+                            keepalive_expiry=config.keepalive_expiry,
+                        ),
+                        timeout=config.timeout,
+                    )
+                    logger.info(
+                        "Initialized LLM connection pool (max: %d, keep-alive: %d)",
+                        config.max_connections, config.max_keepalive_connections
+                    )
+        return self._http_client
+
+    def get_async_http_client(self) -> httpx.AsyncClient:
+        '''
+        Returns the shared keep-alive async HTTP client.
+        Its connections are bound to the shared event loop (see src.llm.event_loop).
+        '''
+        if self._async_http_client is None:
+            config = self.config
+            with self._lock:
+                if self._async_http_client is None:
+                    self._async_http_client = DefaultAsyncHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=config.max_connections,
+                            max_keepalive_connections=config.max_keepalive_connections,
+                            keepalive_expiry=config.keepalive_expiry,
+                        ),
+                        timeout=config.timeout,
+                    )
+        return self._async_http_client
+
+    def get_client(self, llm_type: LLM_Client_Type = LLM_Client_Type.openai) -> 'LLM_Client':
+        '''Returns the shared LLM_Client for given type.'''
+        client = self._clients.get(llm_type)
+        if client is None:
+            # Construct outside the lock, LLM_Client itself reads from the registry.
+            new_client = LLM_Client(llm_type)
+            with self._lock:
+                client = self._clients.setdefault(llm_type, new_client)
+        return client
+
+    def pool_stats(self) -> PoolStats:
+        '''Returns open, idle and in-use connection counts of the shared pool.'''
+        config = self.config
+        stats = PoolStats(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+        )
+        # httpx doesn't expose its pool publicly, read it from the transport if available.
+        for http_client in [self._http_client, self._async_http_client]:
+            transport = getattr(http_client, '_transport', None)
+            pool = getattr(transport, '_pool', None)
+            if pool is None:
+                continue
+
+            connections = [conn for conn in pool.connections if not conn.is_closed()]
+            idle = len([conn for conn in connections if conn.is_idle()])
+            stats.open += len(connections)
+            stats.idle += idle
+            stats.in_use += len(connections) - idle
+        return stats
+
+    def close(self):
+        '''Closes the shared connection pool.'''
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            # Async pool is bound to the shared event loop and closes along with it.
+            self._async_http_client = None
+            self._clients = {}
+
+
+CLIENT_REGISTRY = LLMClientRegistry()
+
+
+def get_llm_client(llm_type: LLM_Client_Type = LLM_Client_Type.openai) -> 'LLM_Client':
+    '''Returns the process-wide LLM_Client.'''
+    return CLIENT_REGISTRY.get_client(llm_type)
+
+
+def get_pool_stats() -> PoolStats:
+    return CLIENT_REGISTRY.pool_stats()
+
+
 class LLM_Client:
     '''
     Generic class to handle calls to LLM services.
@@ -33,22 +232,88 @@ class LLM_Client:
             self.__init_openai__()
 
     def __init_openai__(self):
-        load_dotenv()
-        OPENAI_API_BASE = os.getenv('OPENAI_API_BASE')
-        OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-        self.model = os.getenv('MODEL')
+        config = CLIENT_REGISTRY.config
+        self.model = config.model
+        self.endpoint = config.api_base
         self.openai_client = OpenAI(
-            base_url=OPENAI_API_BASE,
-            api_key=OPENAI_API_KEY
+            base_url=config.api_base,
+            api_key=config.api_key,
+            http_client=CLIENT_REGISTRY.get_http_client(),
+            # Retries are handled by the scheduler (src.llm.llm_scheduler)
+            max_retries=0,
+        )
+        self.async_openai_client = AsyncOpenAI(
+            base_url=config.api_base,
+            api_key=config.api_key,
+            http_client=CLIENT_REGISTRY.get_async_http_client(),
+            # Retries are handled by the scheduler (src.llm.llm_scheduler)
+            max_retries=0,
         )
 
-    def invoke(self, sys_prompt: str, user_prompt: str):
+    def _headers(self, task_tag: str | None) -> dict | None:
+        if task_tag is None:
+            return None
+        return {TASK_TAG_HEADER: getattr(task_tag, 'value', task_tag)}
+
+    def _record(self, task_tag: str | None, sys_prompt: str, user_prompt: str, response: str, started_at: float):
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.record(
+                task_tag=getattr(task_tag, 'value', task_tag),
+                model=self.model,
+                sys_prompt=sys_prompt,
+                user_prompt=user_prompt,
+                response=response,
+                latency=time.monotonic() - started_at
+            )
+
+    def invoke(self, sys_prompt: str, user_prompt: str, task_tag: str | None = None, sampling_params: dict | None = None):
         '''Returns the result from LLM Service'''
         if self.type == LLM_Client_Type.openai:
-            return query_openai_client(
+            started_at = time.monotonic()
+            response = query_openai_client(
+                model=self.model,
+                client=self.openai_client,
+                system_prompt=sys_prompt,
+                user_prompt=user_prompt,
+                extra_headers=self._headers(task_tag),
+                sampling_params=sampling_params,
+            )
+            self._record(task_tag, sys_prompt, user_prompt, response, started_at)
+            return response
+        raise Exception("Unknown model type!")
+
+    def stream(self, sys_prompt: str, user_prompt: str, task_tag: str | None = None, sampling_params: dict | None = None) -> Iterator[str]:
+        '''Yields the result from LLM Service as text deltas'''
+        if self.type == LLM_Client_Type.openai:
+            started_at = time.monotonic()
+            response = ""
+            for delta in stream_openai_client(
                 model=self.model,
                 client=self.openai_client,
                 system_prompt=sys_prompt,
-                user_prompt=user_prompt
+                user_prompt=user_prompt,
+                extra_headers=self._headers(task_tag),
+                sampling_params=sampling_params,
+            ):
+                response += delta
+                yield delta
+            self._record(task_tag, sys_prompt, user_prompt, response, started_at)
+            return
+        raise Exception("Unknown model type!")
+
+    async def ainvoke(self, sys_prompt: str, user_prompt: str, task_tag: str | None = None, sampling_params: dict | None = None):
+        '''Returns the result from LLM Service without blocking the event loop'''
+        if self.type == LLM_Client_Type.openai:
+            started_at = time.monotonic()
+            response = await aquery_openai_client(
+                model=self.model,
+                client=self.async_openai_client,
+                system_prompt=sys_prompt,
+                user_prompt=user_prompt,
+                extra_headers=self._headers(task_tag),
+                sampling_params=sampling_params,
             )
+            self._record(task_tag, sys_prompt, user_prompt, response, started_at)
+            return response
         raise Exception("Unknown model type!")
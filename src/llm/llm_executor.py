@@ -1,4 +1,7 @@
-from typing import List
+import asyncio
+import contextvars
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Tuple
 import concurrent.futures
 
 from src.modals.llm_data import (
@@ -9,19 +12,35 @@ from src.modals.llm_data import (
 
 from src.llm.llm_task import LLMTask
 from src.utils.logger import get_module_logger
-from src.llm.llm_client import LLM_Client
+from src.llm.llm_client import (
+    LLM_Client,
+    DEFAULT_SAMPLING_PARAMS,
+    get_llm_client,
+    get_pool_stats,
+)
+from src.llm.llm_cache import LLM_CACHE, make_cache_key
+from src.llm.prompt_budget import count_tokens
+from src.llm.llm_scheduler import get_scheduler, get_scheduler_metrics
+from src.llm.event_loop import get_llm_semaphore, submit
+from src.utils.config import get_env_bool
+from src.utils import tracing
 
 
 MAX_WORKERS = 20
+# Run tasks on the shared event loop instead of a thread per request.
+ASYNC_MODE = get_env_bool('LLM_ASYNC_EXECUTOR', True)
 
 logger = get_module_logger(__name__)
 
 
 class LLMTaskExecutor:
-    def __init__(self):
+    def __init__(self, async_mode: bool = ASYNC_MODE):
         # Lists to track tasks
         self.tasks: List[LLMTask] = []
         self.results: List[ModelResponse] = []
+        # Tag to results having it, for fetch_results()
+        self.results_by_tag: Dict[str, List[ModelResponse]] = defaultdict(list)
+        self.async_mode = async_mode
 
     def __len__(self):
         # Return length of task stack
@@ -33,8 +52,15 @@ class LLMTaskExecutor:
     def clear(self):
         self.tasks = []
         self.results = []
+        self.results_by_tag = defaultdict(list)
 
-    def execute(self, task: LLMTask) -> ModelResponse:
+    def add_result(self, model_response: ModelResponse):
+        self.results.append(model_response)
+        for tag in set(model_response.tags):
+            self.results_by_tag[tag].append(model_response)
+
+    def build_prompts(self, task: LLMTask) -> Tuple[str, str]:
+        '''Returns the rendered system and user prompt for the task.'''
         # Parameters passed in from user
         query_params = task.preprocess()
 
@@ -55,65 +81,271 @@ class LLMTaskExecutor:
         logger.debug("System Prompt: %s", sys_prompt)
         logger.debug("User Prompt: %s", user_prompt)
 
-        # Initialize LLM Client
-        llm_client = LLM_Client()
+        # Record tokens used by each section of the prompt
+        task.prompt_token_usage = {
+            name: count_tokens(str(value)) for name, value in query_params.items()
+        }
+        task.prompt_token_usage["system"] = count_tokens(sys_prompt)
+        task.prompt_token_usage["user"] = count_tokens(user_prompt)
+        logger.debug("Prompt token usage: %s", task.prompt_token_usage)
+
+        return sys_prompt, user_prompt
 
-        # Run LLM Prompt
-        response = llm_client.invoke(
+    def sampling_params(self, task: LLMTask) -> dict:
+        return {**DEFAULT_SAMPLING_PARAMS, **(task.sampling_params or {})}
+
+    def cache_key(self, task: LLMTask, llm_client: LLM_Client, sys_prompt: str, user_prompt: str) -> str | None:
+        '''
+        Returns the response cache key, None when the task opted out of caching
+        or samples with a temperature (e.g. speculative candidates), as only deterministic
+        requests are cached.
+        '''
+        sampling_params = self.sampling_params(task)
+        if not LLM_CACHE.is_cacheable(task.tags) or sampling_params.get("temperature", 0) > 0:
+            return None
+        return make_cache_key(
+            model=llm_client.model,
             sys_prompt=sys_prompt,
             user_prompt=user_prompt,
+            sampling_params=sampling_params
         )
 
-        logger.debug("LLM Response: %s", response)
+    def trace_call(self, task: LLMTask, llm_client: LLM_Client):
+        '''Span around a single task, see src.utils.tracing.'''
+        tag = getattr(task.tags[0], 'value', task.tags[0])
+        return tracing.span(
+            f"llm.{tag}",
+            task=tag,
+            model=str(llm_client.model),
+            temperature=self.sampling_params(task)["temperature"],
+            retries=0,
+        )
+
+    def postprocess(self, task: LLMTask, response: str, cached: bool) -> ModelResponse:
+        logger.debug("LLM Response (cached: %s): %s", cached, response)
 
-        model_response = task.postprocess(
+        current_span = tracing.current_span()
+        if current_span is not None:
+            current_span.attributes["cache_hit"] = cached
+            # Estimates, unless the server reported usage for the call
+            prompt_usage = task.prompt_token_usage or {}
+            current_span.attributes.setdefault(
+                "prompt_tokens", prompt_usage.get("system", 0) + prompt_usage.get("user", 0)
+            )
+            current_span.attributes.setdefault("completion_tokens", count_tokens(response))
+
+        return task.postprocess(
             response
         )
 
-        return model_response
+    def execute(self, task: LLMTask) -> ModelResponse:
+        # Process-wide client sharing the keep-alive connection pool
+        llm_client = get_llm_client()
 
-    def run_tasks(self, max_workers=MAX_WORKERS, update_progress_cb=None):
+        with self.trace_call(task, llm_client):
+            sys_prompt, user_prompt = self.build_prompts(task)
+
+            cache_key = self.cache_key(task, llm_client, sys_prompt, user_prompt)
+            response = LLM_CACHE.get(cache_key) if cache_key is not None else None
+            cached = response is not None
+
+            if not cached:
+                # Run LLM Prompt, rate limited and retried per endpoint
+                response = get_scheduler(llm_client.endpoint).run_sync(
+                    lambda: llm_client.invoke(
+                        sys_prompt=sys_prompt,
+                        user_prompt=user_prompt,
+                        task_tag=task.tags[0],
+                        sampling_params=self.sampling_params(task),
+                    )
+                )
+
+            model_response = self.postprocess(task, response, cached)
+            # Only store responses the task could make sense of
+            if cache_key is not None and not cached:
+                LLM_CACHE.set(cache_key, response)
+            return model_response
+
+    def execute_stream(self, task: LLMTask, on_partial: Callable[[str], None]) -> ModelResponse:
         '''
-        Starts running available tasks concurrently with MAX_WORKERS(20) tasks running at a time.
-        Additionally you can pass a callback function 'update_progress_cb' to update progress in UI.
+        Same as execute() but streams the response, calling 'on_partial' with the task's
+        postprocess_partial() preview as tokens arrive. Callback runs in the calling thread.
+        '''
+        llm_client = get_llm_client()
+
+        with self.trace_call(task, llm_client):
+            sys_prompt, user_prompt = self.build_prompts(task)
+
+            cache_key = self.cache_key(task, llm_client, sys_prompt, user_prompt)
+            response = LLM_CACHE.get(cache_key) if cache_key is not None else None
+            cached = response is not None
+
+            if cached:
+                preview = task.postprocess_partial(response)
+                if preview is not None:
+                    on_partial(preview)
+            else:
+                def stream_response() -> str:
+                    # A retried stream starts over, previews restart with it.
+                    response = ""
+                    for delta in llm_client.stream(
+                        sys_prompt, user_prompt, task_tag=task.tags[0], sampling_params=self.sampling_params(task)
+                    ):
+                        response += delta
+                        preview = task.postprocess_partial(response)
+                        if preview is not None:
+                            on_partial(preview)
+                    return response
+
+                response = get_scheduler(llm_client.endpoint).run_sync(stream_response)
+
+            model_response = self.postprocess(task, response, cached)
+            if cache_key is not None and not cached:
+                LLM_CACHE.set(cache_key, response)
+            return model_response
+
+    async def execute_async(self, task: LLMTask) -> ModelResponse:
+        '''Same as execute() but awaits the LLM call, must run on the shared event loop.'''
+        llm_client = get_llm_client()
+
+        with self.trace_call(task, llm_client):
+            # Prompt budgeting embeds and counts tokens, which would stall every call on the loop
+            sys_prompt, user_prompt = await asyncio.to_thread(self.build_prompts, task)
+
+            cache_key = self.cache_key(task, llm_client, sys_prompt, user_prompt)
+            # The persistent tier reads and writes SQLite, kept off the loop
+            response = await asyncio.to_thread(LLM_CACHE.get, cache_key) if cache_key is not None else None
+            cached = response is not None
+
+            if not cached:
+                async def invoke() -> str:
+                    # Global bound on in-flight calls across all sessions
+                    async with get_llm_semaphore():
+                        return await llm_client.ainvoke(
+                            sys_prompt=sys_prompt,
+                            user_prompt=user_prompt,
+                            task_tag=task.tags[0],
+                            sampling_params=self.sampling_params(task),
+                        )
+
+                response = await get_scheduler(llm_client.endpoint).run(invoke)
+
+            model_response = self.postprocess(task, response, cached)
+            if cache_key is not None and not cached:
+                await asyncio.to_thread(LLM_CACHE.set, cache_key, response)
+            return model_response
+
+    def _submit_tasks(self) -> List[concurrent.futures.Future]:
+        '''Schedules all pending tasks on the shared event loop.'''
+        futures = []
+        while len(self.tasks) != 0:
+            task = self.tasks.pop()
+            futures.append(submit(self.execute_async(task)))
+        return futures
+
+    def _log_stats(self):
+        logger.debug("LLM connection pool: %s", get_pool_stats())
+        logger.debug("LLM cache: %s", LLM_CACHE.stats())
+        logger.debug("LLM scheduler: %s", get_scheduler_metrics())
+
+    def _update_progress(self, update_progress_cb, total: int):
+        if update_progress_cb is not None and callable(update_progress_cb):
+            update_progress_cb(len(self.results) / total)
+
+    def iter_results(self, max_workers=MAX_WORKERS, update_progress_cb=None) -> Iterator[ModelResponse]:
+        '''
+        Runs available tasks like run_tasks() and yields each ModelResponse as soon as it completes.
+        Results are also collected for fetch_results(). Stop iterating (break or close())
+        to cancel the tasks which are still pending.
         '''
         if len(self.tasks) == 0:
             logger.info("No tasks found to execute!")
             return
 
-        futures = []  # Store promises for task
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        thread_pool = None
+        if self.async_mode:
+            futures = self._submit_tasks()
+        else:
+            thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers)
+            futures = []
             while len(self.tasks) != 0:
                 task = self.tasks.pop()
-                future = executor.submit(
-                    self.execute, task=task
-                )
-                futures.append(future)
+                # Each task runs in a copy of the caller's context (active trace)
+                futures.append(thread_pool.submit(
+                    contextvars.copy_context().run, self.execute, task
+                ))
 
+        total = len(self.results) + len(futures)
+        try:
+            # Wait in the calling thread so callbacks can update the UI.
             for future in concurrent.futures.as_completed(futures):
                 model_response = future.result()
-                self.results.append(model_response)
+                self.add_result(model_response)
+                self._update_progress(update_progress_cb, total)
+                yield model_response
+        finally:
+            cancelled = len([future for future in futures if future.cancel()])
+            if cancelled > 0:
+                logger.debug("Cancelled %d pending LLM tasks", cancelled)
+            if thread_pool is not None:
+                thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._log_stats()
+
+    async def aiter_results(self, update_progress_cb=None) -> AsyncIterator[ModelResponse]:
+        '''
+        Async variant of iter_results(), tasks run on the shared event loop and
+        can be iterated from any event loop.
+        '''
+        if len(self.tasks) == 0:
+            logger.info("No tasks found to execute!")
+            return
+
+        futures = self._submit_tasks()
+        total = len(self.results) + len(futures)
+        try:
+            for future in asyncio.as_completed([asyncio.wrap_future(future) for future in futures]):
+                model_response = await future
+                self.add_result(model_response)
+                self._update_progress(update_progress_cb, total)
+                yield model_response
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def run_tasks_async(self, update_progress_cb=None):
+        '''
+        Runs available tasks on the shared event loop, bounded by the global LLM semaphore.
+        Can be awaited from any event loop; 'update_progress_cb' is called from the awaiting loop.
+        '''
+        async for _ in self.aiter_results(update_progress_cb):
+            pass
+
+    def run_tasks(self, max_workers=MAX_WORKERS, update_progress_cb=None):
+        '''
+        Starts running available tasks concurrently with MAX_WORKERS(20) tasks running at a time.
+        Additionally you can pass a callback function 'update_progress_cb' to update progress in UI.
 
-                if update_progress_cb is not None and callable(update_progress_cb):
-                    completed = len(self.results)
-                    pending = len(self.tasks)
-                    update_progress_cb(completed / (completed + pending))
+        In async mode, tasks run on the shared event loop and 'max_workers' is ignored
+        in favour of the global LLM_MAX_CONCURRENCY limit.
+        '''
+        for _ in self.iter_results(max_workers, update_progress_cb):
+            pass
 
     def fetch_results(self, search_tags: List[str] = []) -> List[ModelResponse]:
         '''Fetch results from model runs.'''
         if len(search_tags) == 0:
             return self.results
 
-        # Filter results list which matches the tags
-        results = []
-
-        for model_response in self.results:
-            result_tags = model_response.tags
-            # If search tags are available in result tags then add it to response ot result
-            a = set(search_tags)
-            b = set(result_tags)
-            if a & b == a:
-                results.append(model_response)
+        # Start from the smallest group of results having one of the tags
+        candidates = min(
+            (self.results_by_tag.get(tag, []) for tag in search_tags), key=len
+        )
+        if len(search_tags) == 1:
+            return list(candidates)
 
-        return results
+        # If search tags are available in result tags then add it to response ot result
+        search_tags = set(search_tags)
+        return [
+            model_response for model_response in candidates
+            if search_tags.issubset(model_response.tags)
+        ]
@@ -0,0 +1,85 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List
+
+from src.utils.config import get_env_str
+from src.utils.logger import get_module_logger
+
+
+# JSONL file to capture LLM traffic into, used as fixtures by the stand-in server.
+LLM_RECORD_PATH = get_env_str('LLM_RECORD_PATH')
+
+logger = get_module_logger(__name__)
+
+
+def make_replay_key(sys_prompt: str, user_prompt: str) -> str:
+    '''Identifies a recorded exchange independent of model and endpoint.'''
+    payload = json.dumps({"system": sys_prompt, "user": user_prompt}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMRecorder:
+    '''Appends LLM requests and responses to a JSONL fixture file.'''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(
+        self,
+        task_tag: str | None,
+        model: str | None,
+        sys_prompt: str,
+        user_prompt: str,
+        response: str,
+        latency: float
+    ):
+        entry = {
+            "key": make_replay_key(sys_prompt, user_prompt),
+            "task_tag": task_tag,
+            "model": model,
+            "system": sys_prompt,
+            "user": user_prompt,
+            "response": response,
+            "latency": round(latency, 4),
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as fp:
+                fp.write(line)
+
+
+def load_recordings(path: str) -> List[Dict]:
+    '''Reads entries from a fixture file written by LLMRecorder.'''
+    entries = []
+    with open(path, 'r', encoding='utf-8') as fp:
+        for line_no, line in enumerate(fp):
+            if line.strip() == "":
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError as error:
+                logger.error("Skipping invalid recording at line %d: %s", line_no + 1, error)
+    return entries
+
+
+_recorder: LLMRecorder | None = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> LLMRecorder | None:
+    '''Returns the process-wide recorder when LLM_RECORD_PATH is set.'''
+    global _recorder
+    if LLM_RECORD_PATH is None:
+        return None
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = LLMRecorder(LLM_RECORD_PATH)
+                logger.info("Recording LLM traffic into '%s'", LLM_RECORD_PATH)
+    return _recorder
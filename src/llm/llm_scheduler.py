@@ -0,0 +1,288 @@
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, TypeVar
+
+import openai
+
+from src.llm.event_loop import get_event_loop, run_coroutine
+from src.modals.llm_data import SchedulerMetrics
+from src.utils.config import get_env_float, get_env_int
+from src.utils.logger import get_module_logger
+from src.utils import tracing
+
+
+# Requests per second allowed per endpoint, 0 disables rate limiting.
+LLM_RATE_LIMIT_RPS = get_env_float('LLM_RATE_LIMIT_RPS', 0)
+LLM_RATE_LIMIT_BURST = get_env_int('LLM_RATE_LIMIT_BURST', 10)
+# AIMD bounds for concurrent requests per endpoint.
+LLM_MIN_CONCURRENCY = get_env_int('LLM_MIN_CONCURRENCY', 1)
+LLM_ENDPOINT_MAX_CONCURRENCY = get_env_int('LLM_ENDPOINT_MAX_CONCURRENCY', 20)
+LLM_MAX_RETRIES = get_env_int('LLM_MAX_RETRIES', 5)
+LLM_RETRY_BASE_DELAY = get_env_float('LLM_RETRY_BASE_DELAY', 0.5)
+LLM_RETRY_MAX_DELAY = get_env_float('LLM_RETRY_MAX_DELAY', 30.0)
+
+# Min. seconds between two multiplicative decreases, so a burst of 429s counts once.
+DECREASE_COOLDOWN = 1.0
+DECREASE_FACTOR = 0.5
+
+T = TypeVar('T')
+
+logger = get_module_logger(__name__)
+
+
+def is_throttled(error: Exception) -> bool:
+    if isinstance(error, openai.RateLimitError):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code == 503
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        # APITimeoutError is a subclass of APIConnectionError
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def parse_retry_after(error: Exception) -> float | None:
+    '''Returns seconds to wait from Retry-After(-ms) headers of the error response.'''
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    try:
+        if headers.get('retry-after-ms') is not None:
+            return float(headers['retry-after-ms']) / 1000
+
+        retry_after = headers.get('retry-after')
+        if retry_after is None:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            # HTTP-date format
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def compute_retry_delay(
+    error: Exception,
+    attempt: int,
+    base_delay: float = LLM_RETRY_BASE_DELAY,
+    max_delay: float = LLM_RETRY_MAX_DELAY
+) -> float:
+    '''Full jitter exponential backoff, never sooner than the server's Retry-After.'''
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+    retry_after = parse_retry_after(error)
+    if retry_after is not None:
+        delay = max(delay, min(max_delay, retry_after) + random.uniform(0, base_delay))
+    return delay
+
+
+class TokenBucket:
+    '''Thread-safe token bucket, reserve() returns seconds to wait for a token.'''
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            # Tokens may go negative, which queues later callers behind this one.
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class EndpointScheduler:
+    '''
+    Schedules LLM calls against one endpoint with token bucket rate limiting,
+    AIMD adaptive concurrency and jittered exponential retries.
+
+    Admission state lives on the shared event loop; sync callers are bridged onto it.
+    '''
+
+    def __init__(
+        self,
+        endpoint: str,
+        rate: float = LLM_RATE_LIMIT_RPS,
+        burst: int = LLM_RATE_LIMIT_BURST,
+        min_concurrency: int = LLM_MIN_CONCURRENCY,
+        max_concurrency: int = LLM_ENDPOINT_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+    ):
+        self.endpoint = endpoint
+        self.bucket = TokenBucket(rate, burst)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.last_decrease_at = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._metrics = SchedulerMetrics(endpoint=endpoint)
+        self._metrics_lock = threading.Lock()
+
+    def _count(self, counter: str):
+        with self._metrics_lock:
+            setattr(self._metrics, counter, getattr(self._metrics, counter) + 1)
+
+    def metrics(self) -> SchedulerMetrics:
+        with self._metrics_lock:
+            metrics = self._metrics.model_copy()
+        metrics.queue_depth = self.queue_depth
+        metrics.in_flight = self.in_flight
+        metrics.concurrency_limit = round(self.limit, 2)
+        return metrics
+
+    async def _acquire(self):
+        '''Waits for a rate limit token and a concurrency slot. Runs on the shared loop.'''
+        self.queue_depth += 1
+        try:
+            delay = self.bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # Drop waiters which were cancelled while queued
+            if any(waiter.done() for waiter in self._waiters):
+                self._waiters = deque(waiter for waiter in self._waiters if not waiter.done())
+
+            if self.in_flight < int(self.limit) and len(self._waiters) == 0:
+                self.in_flight += 1
+                return
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Slot was handed over right before cancellation, give it back.
+                if waiter.done() and not waiter.cancelled():
+                    self._release(throttled=False, success=False)
+                raise
+        finally:
+            self.queue_depth -= 1
+
+    def _release(self, throttled: bool, success: bool):
+        '''Frees a slot and adjusts the concurrency limit. Runs on the shared loop.'''
+        self.in_flight -= 1
+
+        if throttled:
+            now = time.monotonic()
+            if now - self.last_decrease_at > DECREASE_COOLDOWN:
+                self.limit = max(self.min_concurrency, self.limit * DECREASE_FACTOR)
+                self.last_decrease_at = now
+                logger.warning(
+                    "Throttled by '%s', concurrency limit reduced to %.2f", self.endpoint, self.limit
+                )
+        elif success:
+            # Additive increase of ~1 slot per limit's worth of successful calls
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+        while self.in_flight < int(self.limit) and len(self._waiters) != 0:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _on_error(self, error: Exception, attempt: int) -> float | None:
+        '''Records a failed attempt, returns retry delay or None when it shouldn't be retried.'''
+        if is_throttled(error):
+            self._count('throttle_events')
+
+        if attempt >= self.max_retries or not is_retryable(error):
+            self._count('failures')
+            return None
+
+        self._count('retries')
+        tracing.increment_attribute('retries')
+        delay = compute_retry_delay(error, attempt)
+        logger.warning(
+            "LLM call to '%s' failed (%s), retrying in %.2fs", self.endpoint, error, delay
+        )
+        return delay
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        '''Runs the async call with retries. Must be awaited on the shared event loop.'''
+        attempt = 0
+        while True:
+            await self._acquire()
+            throttled, success, failure = False, False, None
+            try:
+                result = await call()
+                success = True
+            except Exception as error:
+                throttled, failure = is_throttled(error), error
+            finally:
+                # Also frees the slot on cancellation (e.g. a losing speculative candidate)
+                self._release(throttled=throttled, success=success)
+
+            if success:
+                self._count('completed')
+                return result
+            delay = self._on_error(failure, attempt)
+            if delay is None:
+                raise failure
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def run_sync(self, call: Callable[[], T]) -> T:
+        '''Runs the blocking call with retries in the calling thread.'''
+        loop = get_event_loop()
+        attempt = 0
+        while True:
+            run_coroutine(self._acquire())
+            throttled, success, failure = False, False, None
+            try:
+                result = call()
+                success = True
+            except Exception as error:
+                throttled, failure = is_throttled(error), error
+            finally:
+                # Also frees the slot on GeneratorExit, KeyboardInterrupt etc.
+                loop.call_soon_threadsafe(self._release, throttled, success)
+
+            if success:
+                self._count('completed')
+                return result
+            delay = self._on_error(failure, attempt)
+            if delay is None:
+                raise failure
+            attempt += 1
+            time.sleep(delay)
+
+
+_schedulers: Dict[str, EndpointScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(endpoint: str | None) -> EndpointScheduler:
+    '''Returns the process-wide scheduler for the endpoint.'''
+    endpoint = endpoint or "default"
+    with _schedulers_lock:
+        if endpoint not in _schedulers:
+            _schedulers[endpoint] = EndpointScheduler(endpoint)
+        return _schedulers[endpoint]
+
+
+def get_scheduler_metrics() -> Dict[str, SchedulerMetrics]:
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    return {scheduler.endpoint: scheduler.metrics() for scheduler in schedulers}
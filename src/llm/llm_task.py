@@ -1,9 +1,14 @@
 from abc import ABC, abstractmethod
+from typing import Any, Dict
 
 from src.modals.llm_data import ModelResponse
 
 
 class LLMTask(ABC):
+    # Tokens used by each prompt section, filled in by LLMTaskExecutor
+    prompt_token_usage: Dict[str, int] | None = None
+    # Overrides of DEFAULT_SAMPLING_PARAMS (e.g. temperature) for this task
+    sampling_params: Dict[str, Any] | None = None
 
     @property
     @abstractmethod
@@ -24,3 +29,8 @@ class LLMTask(ABC):
     def postprocess(self, response: str) -> ModelResponse:
         # Takes in raw string response from LLM and returns a ModelResponse object
         pass
+
+    def postprocess_partial(self, partial_response: str) -> str | None:
+        # Optional: takes the response streamed so far and returns a displayable preview.
+        # Returning None skips the update.
+        return None
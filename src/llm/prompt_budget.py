@@ -0,0 +1,116 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+
+from src.utils.config import get_env_int
+from src.utils.logger import get_module_logger
+
+
+# Max. tokens for the file definitions section of code generation prompts.
+FILE_INFO_TOKEN_BUDGET = get_env_int('FILE_INFO_TOKEN_BUDGET', 2048)
+# Rough characters per token when no tokenizer is available.
+CHARS_PER_TOKEN = 4
+MAX_CACHED_EMBEDDINGS = 10000
+
+logger = get_module_logger(__name__)
+
+_lock = threading.Lock()
+_tokenizer = None
+_tokenizer_loaded = False
+_embedding_function = None
+_embedding_failed = False
+# LRU of normalized embeddings by text, shared by prompt builds on any thread
+_embedding_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+
+def get_tokenizer():
+    '''Returns tiktoken encoder when available, otherwise None.'''
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        with _lock:
+            if not _tokenizer_loaded:
+                try:
+                    import tiktoken
+                    _tokenizer = tiktoken.get_encoding("cl100k_base")
+                except Exception as error:
+                    logger.info("tiktoken unavailable, estimating token counts: %s", error)
+                _tokenizer_loaded = True
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def get_embedding_function():
+    '''Same embedding model used by the VectorDB session.'''
+    global _embedding_function
+    if _embedding_function is None:
+        with _lock:
+            if _embedding_function is None:
+                from chromadb.utils import embedding_functions
+                _embedding_function = embedding_functions.DefaultEmbeddingFunction()
+    return _embedding_function
+
+
+def embed(texts: List[str]) -> np.ndarray:
+    '''Returns normalized embeddings, caching up to MAX_CACHED_EMBEDDINGS texts.'''
+    embeddings: Dict[str, np.ndarray] = {}
+    with _embedding_cache_lock:
+        for text in set(texts):
+            if text in _embedding_cache:
+                _embedding_cache.move_to_end(text)
+                embeddings[text] = _embedding_cache[text]
+    missing = [text for text in set(texts) if text not in embeddings]
+
+    if len(missing) > 0:
+        # Embedded outside the lock, concurrent builds may embed the same text twice
+        for text, embedding in zip(missing, get_embedding_function()(missing)):
+            embedding = np.asarray(embedding, dtype=np.float32)
+            embeddings[text] = embedding / (np.linalg.norm(embedding) or 1.0)
+        with _embedding_cache_lock:
+            for text in missing:
+                _embedding_cache[text] = embeddings[text]
+            while len(_embedding_cache) > MAX_CACHED_EMBEDDINGS:
+                _embedding_cache.popitem(last=False)
+    return np.stack([embeddings[text] for text in texts])
+
+
+def lexical_scores(query: str, names: List[str]) -> List[float]:
+    '''Fallback relevance, share of name words found in the query.'''
+    query_words = set(re.findall(r"[a-z0-9]+", query.lower()))
+    scores = []
+    for name in names:
+        words = re.findall(r"[a-z0-9]+", name.lower())
+        scores.append(
+            len([word for word in words if word in query_words]) / max(len(words), 1)
+        )
+    return scores
+
+
+def rank_by_relevance(query: str, names: List[str]) -> List[int]:
+    '''Returns indexes of names ordered from most to least relevant to the query.'''
+    global _embedding_failed
+    scores = None
+    if not _embedding_failed:
+        try:
+            embeddings = embed([query] + names)
+            scores = (embeddings[1:] @ embeddings[0]).tolist()
+        except Exception as error:
+            # Don't retry (e.g. model download) on every prompt
+            _embedding_failed = True
+            logger.warning("Unable to embed fields, ranking lexically: %s", error)
+    if scores is None:
+        scores = lexical_scores(query, names)
+    # Exact mentions in the query always go first
+    boosts = lexical_scores(query, names)
+    return sorted(
+        range(len(names)), key=lambda idx: (boosts[idx], scores[idx]), reverse=True
+    )
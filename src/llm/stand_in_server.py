@@ -0,0 +1,302 @@
+'''
+OpenAI-compatible stand-in server for offline benchmarks and CI.
+
+Serves /v1/chat/completions (including streaming) with canned responses per
+TasksTag or replayed recordings (see LLM_RECORD_PATH in src.llm.llm_recorder),
+with configurable latency and fault injection.
+
+Usage:
+    python -m src.llm.stand_in_server --port 8000 --latency uniform:0.2,0.8 --fault-429 0.1
+    OPENAI_API_BASE=http://127.0.0.1:8000/v1 daita
+'''
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Tuple
+
+from src.llm.llm_client import TASK_TAG_HEADER
+from src.llm.llm_recorder import load_recordings, make_replay_key
+from src.modals.llm_data import TasksTag
+from src.utils.logger import get_module_logger
+
+
+CHAT_COMPLETIONS_PATH = "/v1/chat/completions"
+STREAM_CHUNK_CHARS = 8  # Characters per streamed delta
+
+FILE_DEFINITION_PATTERN = r"File ID: (\S+)\s+Filename: [^\n]*\s+(?:Rows: \d+\s+)?(Fields|Keys):"
+TABLE_DEFINITION_PATTERN = r"Table: (\S+)"
+
+logger = get_module_logger(__name__)
+
+
+def canned_code(sys_prompt: str) -> str:
+    '''Code which loads the first defined file, so the pipeline can run end to end.'''
+    match = re.search(FILE_DEFINITION_PATTERN, sys_prompt)
+    if match is None:
+        body = 'return "stand-in response"'
+    elif match.group(2) == "Keys":
+        body = f'return fetch_json("{match.group(1)}", ".")'
+    else:
+        body = f'return fetch_df("{match.group(1)}").head(5)'
+    return f"```python\ndef solver():\n    {body}\n```"
+
+
+def canned_sql(sys_prompt: str) -> str:
+    '''Query which selects from the first defined table.'''
+    match = re.search(TABLE_DEFINITION_PATTERN, sys_prompt)
+    if match is None:
+        return "```sql\nSELECT 'stand-in response' AS response\n```"
+    return f'```sql\nSELECT * FROM "{match.group(1)}" LIMIT 5\n```'
+
+
+def default_canned_response(task_tag: str | None, sys_prompt: str) -> str:
+    if task_tag == TasksTag.data_for_task:
+        return "Yes"
+    if task_tag == TasksTag.batch_data_for_task:
+        return json.dumps(re.findall(r"File ID: (\S+)", sys_prompt))
+    if task_tag in [TasksTag.code_solver, TasksTag.code_refinement]:
+        return canned_code(sys_prompt)
+    if task_tag in [TasksTag.sql_solver, TasksTag.sql_refinement]:
+        return canned_sql(sys_prompt)
+    if task_tag == TasksTag.log_field_extractor:
+        return "r'^(?P<message>.*)$'"
+    return "This is a stand-in response."
+
+
+def parse_latency(spec: str):
+    '''
+    Returns a sampler for latency specs:
+    "fixed:S", "uniform:MIN,MAX", "normal:MEAN,STD" or "lognormal:MU,SIGMA" (seconds).
+    '''
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value != ""]
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency spec '{spec}'")
+
+
+class StandInLLM:
+    '''Decides the response, latency and injected faults for each request.'''
+
+    def __init__(
+        self,
+        canned: Dict[str, str] | None = None,
+        replay_path: str | None = None,
+        latency: str = "fixed:0",
+        token_delay: float = 0.0,
+        fault_429: float = 0.0,
+        fault_500: float = 0.0,
+        fault_timeout: float = 0.0,
+        retry_after: float = 1.0,
+        timeout_delay: float = 600.0,
+        seed: int | None = None,
+    ):
+        self.canned = canned or {}
+        self.replays: Dict[str, str] = {}
+        if replay_path is not None:
+            for entry in load_recordings(replay_path):
+                self.replays[entry["key"]] = entry["response"]
+            logger.info("Loaded %d recorded responses from '%s'", len(self.replays), replay_path)
+
+        self.sample_latency = parse_latency(latency)
+        self.token_delay = token_delay
+        self.fault_429 = fault_429
+        self.fault_500 = fault_500
+        self.fault_timeout = fault_timeout
+        self.retry_after = retry_after
+        self.timeout_delay = timeout_delay
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.request_count = 0
+
+    def pick_fault(self) -> str | None:
+        with self._lock:
+            self.request_count += 1
+            roll = self._rng.random()
+        for fault, rate in [("429", self.fault_429), ("500", self.fault_500), ("timeout", self.fault_timeout)]:
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+    def latency(self) -> float:
+        with self._lock:
+            return self.sample_latency(self._rng)
+
+    def respond(self, task_tag: str | None, sys_prompt: str, user_prompt: str) -> str:
+        replayed = self.replays.get(make_replay_key(sys_prompt, user_prompt))
+        if replayed is not None:
+            return replayed
+        if task_tag is not None and task_tag in self.canned:
+            return self.canned[task_tag]
+        return default_canned_response(task_tag, sys_prompt)
+
+
+def extract_prompts(body: dict) -> Tuple[str, str]:
+    messages = body.get("messages", [])
+    if len(messages) == 0:
+        return "", ""
+    return messages[0].get("content", ""), messages[-1].get("content", "")
+
+
+def make_handler(llm: StandInLLM):
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+        def send_json(self, status: int, payload: dict, headers: Dict[str, str] = {}):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/v1/models":
+                self.send_json(200, {"object": "list", "data": [{"id": "stand-in", "object": "model"}]})
+                return
+            self.send_json(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path.rstrip("/") != CHAT_COMPLETIONS_PATH:
+                self.send_json(404, {"error": {"message": "Not found"}})
+                return
+
+            fault = llm.pick_fault()
+            if fault == "429":
+                self.send_json(
+                    429,
+                    {"error": {"message": "Rate limit reached (injected)", "type": "rate_limit"}},
+                    {"Retry-After": str(llm.retry_after)}
+                )
+                return
+            if fault == "500":
+                self.send_json(500, {"error": {"message": "Server error (injected)"}})
+                return
+            if fault == "timeout":
+                time.sleep(llm.timeout_delay)
+
+            time.sleep(llm.latency())
+
+            sys_prompt, user_prompt = extract_prompts(body)
+            text = llm.respond(self.headers.get(TASK_TAG_HEADER), sys_prompt, user_prompt)
+            model = body.get("model") or "stand-in"
+
+            if body.get("stream"):
+                self.stream_response(model, text)
+                return
+
+            self.send_json(200, {
+                "id": f"chatcmpl-standin-{llm.request_count}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": (len(sys_prompt) + len(user_prompt)) // 4,
+                    "completion_tokens": len(text) // 4,
+                    "total_tokens": (len(sys_prompt) + len(user_prompt) + len(text)) // 4,
+                },
+            })
+
+        def stream_response(self, model: str, text: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def chunk(delta: dict, finish_reason: str | None = None) -> bytes:
+                payload = {
+                    "id": f"chatcmpl-standin-{llm.request_count}",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(payload)}\n\n".encode('utf-8')
+
+            self.wfile.write(chunk({"role": "assistant", "content": ""}))
+            for start in range(0, len(text), STREAM_CHUNK_CHARS):
+                if llm.token_delay > 0:
+                    time.sleep(llm.token_delay)
+                self.wfile.write(chunk({"content": text[start:start + STREAM_CHUNK_CHARS]}))
+                self.wfile.flush()
+            self.wfile.write(chunk({}, "stop"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return StandInHandler
+
+
+def start_server(llm: StandInLLM, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    '''Starts the server in a daemon thread, port 0 picks a free port (see server.server_port).'''
+    server = ThreadingHTTPServer((host, port), make_handler(llm))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="daita-stand-in", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in server for d.AI.ta")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--canned", help="JSON file mapping task tags to responses")
+    parser.add_argument("--replay", help="JSONL recordings written with LLM_RECORD_PATH")
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S, uniform:MIN,MAX, normal:MEAN,STD, lognormal:MU,SIGMA")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--fault-429", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--fault-500", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--fault-timeout", type=float, default=0.0, help="Share of requests that hang")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    canned = None
+    if args.canned is not None:
+        with open(args.canned, 'r', encoding='utf-8') as fp:
+            canned = json.load(fp)
+
+    llm = StandInLLM(
+        canned=canned,
+        replay_path=args.replay,
+        latency=args.latency,
+        token_delay=args.token_delay,
+        fault_429=args.fault_429,
+        fault_500=args.fault_500,
+        fault_timeout=args.fault_timeout,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(llm))
+    logger.info("Stand-in LLM server listening on http://%s:%d/v1", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,12 @@ from src.modals.llm_data import (
 )
 from src.modals.file_types.base import FileMetadata
 
-from src.llm.tasks.code_solver import generate_file_info, REGEX_PATTERN
+from src.llm.tasks.code_solver import (
+    generate_file_info,
+    extract_partial_code,
+    CHUNKED_ROW_THRESHOLD,
+    REGEX_PATTERN,
+)
 from src.llm.llm_task import LLMTask
 from src.utils.logger import get_module_logger
 
@@ -21,28 +26,48 @@ Make sure to follow the below rules while generating the code:
 - Do NOT under any circumstances call the solver method.
 - Do NOT make random assumptions about the data.
 - Use the appropriate data loader functions based on the data source:
-    - To access data from CSV, LOG files, you need to make use of a helper method "fetch_df" that is pre-defined.
+    - To access data from CSV, LOG files, you need to make use of a helper method "fetch_df" that is pre-defined. Pass only the "columns" the answer needs and filter rows with "filters" when possible, loading is much faster.
+    - When a CSV, LOG file has more than {chunked_row_threshold} rows, do NOT load it with "fetch_df". Use the pre-defined helper "iter_df" instead to aggregate it chunk by chunk.
     - To access data from JSON files, you need to make use of a helper method "fetch_json" that is pre-defined. It takes second argument called "jq_query" in which you can specify a "jq" utility query.
 - Do NOT import any modules. You can make use of the imported modules defined below.
+- Update DataFrames with "df.loc[mask, column] = value", chained assignment like "df[column][mask] = value" may NOT modify "df".
 - When the user query involves drawing a plot, make sure to use matplotlib and return the Figure object from "solver" method. Also make sure to add appropriate labels and legends as required.
 - Always generate minimalistic answers to the question.
 
 Definition of fetch_df:
 ```
-def fetch_df(file_id: str) -> pd.DataFrame:
+def fetch_df(
+    file_id: str,
+    columns: list[str] | None = None,
+    filters: list[tuple] | None = None
+) -> pd.DataFrame:
+    # columns: load only these fields.
+    # filters: load only rows matching all (field, op, value) tuples, op is one of
+    #   "==", "!=", "<", "<=", ">", ">=", "in", "not in" (value is a list for "in", "not in").
     ...
 ```
+e.g. fetch_df(file_id, columns=["city", "temperature"], filters=[("city", "in", ["Pune", "Delhi"]), ("temperature", ">", 30)])
+
+Definition of iter_df:
+```
+def iter_df(
+    file_id: str,
+    chunksize: int = 100000,
+    columns: list[str] | None = None,
+    filters: list[tuple] | None = None
+) -> Iterator[pd.DataFrame]:
+    # Yields the rows of fetch_df(file_id, columns, filters) "chunksize" rows at a time.
+    ...
+```
+e.g. counts = sum((chunk["status"].value_counts() for chunk in iter_df(file_id, columns=["status"])), pd.Series(dtype="int64"))
 
 Definition of fetch_json:
 ```
 def fetch_json(file_id: str, jq_query: str) -> list:
-    try:
-        json_data: dict | list = load_json_data(file_id)
-        compiled_query = jq.compile(jq_query)
-        result = compiled_query.input(json_data).all()
-        return result
-    except Exception as e:
-        raise e
+    # Runs the jq query on the JSON file and returns all of its outputs as a list.
+    # For JSON Lines files (one JSON value per line) the query runs on each line's value,
+    # e.g. fetch_json(file_id, ".status") returns the status of every line.
+    ...
 ```
 
 Input Dataframes:
@@ -102,8 +127,9 @@ class CodeRefinement(LLMTask):
     def preprocess(self):
         return {
             "code": self.code,
-            "file_infos": generate_file_info(self.file_metadatas),
-            "query": self.query
+            "file_infos": generate_file_info(self.file_metadatas, query=self.query),
+            "query": self.query,
+            "chunked_row_threshold": CHUNKED_ROW_THRESHOLD
         }
 
     def prompt(self):
@@ -117,3 +143,6 @@ class CodeRefinement(LLMTask):
             tags=tags,
             metadata=self.metadata
         )
+
+    def postprocess_partial(self, partial_response: str) -> str | None:
+        return extract_partial_code(partial_response)
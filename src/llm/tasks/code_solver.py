@@ -1,20 +1,25 @@
 import re
-from typing import Any, List
+from typing import Any, Dict, List
 
 from src.modals.llm_data import (
     TasksTag,
     ModelResponse
 )
 from src.modals.file_types.base import FileMetadata, FileDataFormat
-from src.modals.file_types.csv_data import CSVFileMetadata
+from src.modals.file_types.csv_data import CSVField
 from src.modals.file_types.json_data import JSONKey
 
 from src.llm.llm_task import LLMTask
+from src.llm.prompt_budget import FILE_INFO_TOKEN_BUDGET, count_tokens, rank_by_relevance
+from src.utils.config import get_env_int
 from src.utils.logger import get_module_logger
 
 
 logger = get_module_logger(__name__)
 
+# Files with more rows are to be processed with iter_df instead of fetch_df.
+CHUNKED_ROW_THRESHOLD = get_env_int('CHUNKED_ROW_THRESHOLD', 5_000_000)
+
 
 SYS_PROMPT = """Given below is a definition of dataframes, your task is to create a Python method 'solver' to compute the answer to the user's query.
 
@@ -22,28 +27,48 @@ Make sure to follow the below rules while generating the code:
 - Do NOT under any circumstances call the solver method.
 - Do NOT make random assumptions about the data.
 - Use the appropriate data loader functions based on the data source: 
-    - To access data from CSV, LOG files, you need to make use of a helper method "fetch_df" that is pre-defined.
+    - To access data from CSV, LOG files, you need to make use of a helper method "fetch_df" that is pre-defined. Pass only the "columns" the answer needs and filter rows with "filters" when possible, loading is much faster.
+    - When a CSV, LOG file has more than {chunked_row_threshold} rows, do NOT load it with "fetch_df". Use the pre-defined helper "iter_df" instead to aggregate it chunk by chunk.
     - To access data from JSON files, you need to make use of a helper method "fetch_json" that is pre-defined. It takes second argument called "jq_query" in which you can specify a "jq" utility query.
 - Do NOT import any modules. You can make use of the imported modules defined below.
+- Update DataFrames with "df.loc[mask, column] = value", chained assignment like "df[column][mask] = value" may NOT modify "df".
 - When the user query involves drawing a plot, make sure to use matplotlib and return the Figure object from "solver" method. Also make sure to add appropriate labels and legends as required.
 - Always generate minimalistic answers to the question.
 
 Definition of fetch_df:
 ```
-def fetch_df(file_id: str) -> pd.DataFrame:
+def fetch_df(
+    file_id: str,
+    columns: list[str] | None = None,
+    filters: list[tuple] | None = None
+) -> pd.DataFrame:
+    # columns: load only these fields.
+    # filters: load only rows matching all (field, op, value) tuples, op is one of
+    #   "==", "!=", "<", "<=", ">", ">=", "in", "not in" (value is a list for "in", "not in").
+    ...
+```
+e.g. fetch_df(file_id, columns=["city", "temperature"], filters=[("city", "in", ["Pune", "Delhi"]), ("temperature", ">", 30)])
+
+Definition of iter_df:
+```
+def iter_df(
+    file_id: str,
+    chunksize: int = 100000,
+    columns: list[str] | None = None,
+    filters: list[tuple] | None = None
+) -> Iterator[pd.DataFrame]:
+    # Yields the rows of fetch_df(file_id, columns, filters) "chunksize" rows at a time.
     ...
 ```
+e.g. counts = sum((chunk["status"].value_counts() for chunk in iter_df(file_id, columns=["status"])), pd.Series(dtype="int64"))
 
 Definition of fetch_json:
 ```
 def fetch_json(file_id: str, jq_query: str) -> list:
-    try:
-        json_data: dict | list = load_json_data(file_id)
-        compiled_query = jq.compile(jq_query)
-        result = compiled_query.input(json_data).all()
-        return result
-    except Exception as e:
-        raise e
+    # Runs the jq query on the JSON file and returns all of its outputs as a list.
+    # For JSON Lines files (one JSON value per line) the query runs on each line's value,
+    # e.g. fetch_json(file_id, ".status") returns the status of every line.
+    ...
 ```
 
 Input Dataframes:
@@ -72,10 +97,13 @@ USER_PROMPT = """### Query
 """
 
 REGEX_PATTERN = r"```python([\s\S]*)```"
+CODE_BLOCK_START = "```python"
+CODE_BLOCK_END = "```"
 
 
 CSV_INFO_TEMPLATE = '''{idx}. File ID: {file_id}
  Filename: {file_name}
+ Rows: {row_count}
  Fields:
 {fields}
 '''
@@ -90,6 +118,10 @@ JSON_INFO_TEMPLATE = '''{idx}. File ID: {file_id}
 '''
 JSON_KEY_INFO_TEMPLATE = '''  - "{name}" (type: {type})'''
 
+OMITTED_FIELDS_TEMPLATE = '''  - ({count} less relevant fields not shown{names})'''
+# Share of a file's token budget kept for listing names of omitted fields
+OMITTED_FIELDS_BUDGET_RATIO = 0.15
+
 
 class CodeSolver(LLMTask):
     """
@@ -101,12 +133,15 @@ class CodeSolver(LLMTask):
         file_metadatas: List[FileMetadata],
         query: str,
         tags: List = [],
-        metadata: Any = None
+        metadata: Any = None,
+        sampling_params: Dict[str, Any] | None = None
     ):
         self._tags = tags
         self.file_metadatas = file_metadatas
         self.query = query
         self.metadata = metadata
+        # e.g. a higher temperature for speculative candidates
+        self.sampling_params = sampling_params
 
     @property
     def tags(self):
@@ -114,8 +149,9 @@ class CodeSolver(LLMTask):
 
     def preprocess(self):
         return {
-            "file_infos": generate_file_info(self.file_metadatas),
-            "query": self.query
+            "file_infos": generate_file_info(self.file_metadatas, query=self.query),
+            "query": self.query,
+            "chunked_row_threshold": CHUNKED_ROW_THRESHOLD
         }
 
     def prompt(self):
@@ -130,17 +166,37 @@ class CodeSolver(LLMTask):
             metadata=self.metadata
         )
 
+    def postprocess_partial(self, partial_response: str) -> str | None:
+        return extract_partial_code(partial_response)
+
+
+def extract_partial_code(partial_response: str) -> str | None:
+    '''Returns the code streamed so far inside the python code block.'''
+    start = partial_response.find(CODE_BLOCK_START)
+    if start == -1:
+        return None
+    code = partial_response[start + len(CODE_BLOCK_START):]
+    end = code.find(CODE_BLOCK_END)
+    if end != -1:
+        return code[:end]
+    # Hide a closing fence which is only partially streamed
+    return code.rstrip('`')
 
-def fetch_fields(fields: List[CSVFileMetadata]):
+
+def fetch_field_info(field: CSVField, with_uniques: bool = True) -> str:
+    return CSV_FIELD_INFO_TEMPLATE.format(
+        name=field.name,
+        type=field.field_type,
+        unique_count=field.unique_count,
+        uniques=" ,uniques=[{unique}]".format(
+            unique=", ".join(field.uniques)
+        ) if with_uniques and len(field.uniques) > 0 else '',
+    )
+
+
+def fetch_fields(fields: List[CSVField]):
     return '\n'.join([
-        CSV_FIELD_INFO_TEMPLATE.format(
-            name=field.name,
-            type=field.field_type,
-            unique_count=field.unique_count,
-            uniques=" ,uniques=[{unique}]".format(
-                unique=", ".join(field.uniques)
-            ) if len(field.uniques) > 0 else '',
-        ) for field in fields
+        fetch_field_info(field) for field in fields
     ])
 
 
@@ -159,6 +215,7 @@ def fetch_file_info(idx, file_metadata: FileMetadata) -> str:
             idx=idx,
             file_id=file_metadata.id,
             file_name=file_metadata.file_name,
+            row_count=file_metadata.row_count,
             fields=fetch_fields(file_metadata.fields)
         )
     elif file_metadata.file_format == FileDataFormat.LOG:
@@ -166,6 +223,7 @@ def fetch_file_info(idx, file_metadata: FileMetadata) -> str:
             idx=idx,
             file_id=file_metadata.id,
             file_name=file_metadata.file_name,
+            row_count=file_metadata.row_count,
             fields=fetch_fields(file_metadata.fields)
         )
     elif file_metadata.file_format == FileDataFormat.JSON:
@@ -178,7 +236,100 @@ def fetch_file_info(idx, file_metadata: FileMetadata) -> str:
     return ""
 
 
-def generate_file_info(file_metadatas: List[FileMetadata]) -> str:
-    return "\n".join([
-        fetch_file_info(idx + 1, metadata) for idx, metadata in enumerate(file_metadatas)
-    ])
+def fetch_file_info_within_budget(idx, file_metadata: FileMetadata, query: str, token_budget: int) -> str:
+    '''
+    Returns file info limited to token_budget. Fields are kept in order of relevance
+    to the query, dropping uniques first and listing names of the remaining fields.
+    '''
+    file_info = fetch_file_info(idx, file_metadata)
+    if count_tokens(file_info) <= token_budget:
+        return file_info
+
+    if file_metadata.file_format in [FileDataFormat.CSV, FileDataFormat.LOG]:
+        items, names = file_metadata.fields, [field.name for field in file_metadata.fields]
+        template, section = CSV_INFO_TEMPLATE, "fields"
+        template_params = {"row_count": file_metadata.row_count}
+
+        def render(field, full):
+            return fetch_field_info(field, with_uniques=full)
+    elif file_metadata.file_format == FileDataFormat.JSON:
+        items, names = file_metadata.json_keys, [item.key for item in file_metadata.json_keys]
+        template, section = JSON_INFO_TEMPLATE, "keys"
+        template_params = {}
+
+        def render(item, full):
+            return JSON_KEY_INFO_TEMPLATE.format(name=item.key, type=item.type)
+    else:
+        return file_info
+
+    header = template.format(
+        idx=idx, file_id=file_metadata.id, file_name=file_metadata.file_name, **template_params, **{section: ""}
+    )
+    omitted_budget = int(token_budget * OMITTED_FIELDS_BUDGET_RATIO)
+    remaining = token_budget - count_tokens(header) - omitted_budget
+
+    selected, omitted = {}, []
+    for item_idx in rank_by_relevance(query, names):
+        for full in (True, False):
+            line = render(items[item_idx], full)
+            cost = count_tokens(line) + 1
+            if cost <= remaining:
+                selected[item_idx] = line
+                remaining -= cost
+                break
+        else:
+            omitted.append(item_idx)
+
+    # Keep fields in file order
+    lines = [selected[item_idx] for item_idx in sorted(selected)]
+
+    if len(omitted) > 0:
+        omitted_budget += max(remaining, 0)
+        omitted_names = []
+        for item_idx in omitted:
+            cost = count_tokens(f'"{names[item_idx]}", ')
+            if cost > omitted_budget:
+                break
+            omitted_names.append(f'"{names[item_idx]}"')
+            omitted_budget -= cost
+        lines.append(OMITTED_FIELDS_TEMPLATE.format(
+            count=len(omitted),
+            names=": " + ", ".join(omitted_names) if len(omitted_names) > 0 else ""
+        ))
+
+    return template.format(
+        idx=idx,
+        file_id=file_metadata.id,
+        file_name=file_metadata.file_name,
+        **template_params,
+        **{section: "\n".join(lines)}
+    )
+
+
+def generate_file_info(
+    file_metadatas: List[FileMetadata],
+    query: str | None = None,
+    token_budget: int = FILE_INFO_TOKEN_BUDGET
+) -> str:
+    '''
+    Returns definitions of all files. When query is given, the definitions are
+    compacted to fit token_budget, sharing it between files.
+    '''
+    if query is None:
+        return "\n".join([
+            fetch_file_info(idx + 1, metadata) for idx, metadata in enumerate(file_metadatas)
+        ])
+
+    # Visit small files first so budget they don't use goes to larger files
+    sizes = [count_tokens(fetch_file_info(idx + 1, metadata)) for idx, metadata in enumerate(file_metadatas)]
+    file_infos = [""] * len(file_metadatas)
+    remaining_budget = token_budget
+
+    for position, idx in enumerate(sorted(range(len(file_metadatas)), key=lambda i: sizes[i])):
+        file_budget = remaining_budget // (len(file_metadatas) - position)
+        file_infos[idx] = fetch_file_info_within_budget(
+            idx + 1, file_metadatas[idx], query, file_budget
+        )
+        remaining_budget -= count_tokens(file_infos[idx])
+
+    return "\n".join(file_infos)
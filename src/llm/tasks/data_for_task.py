@@ -1,8 +1,11 @@
+import json
+import re
 from typing import Any, List
 
 from src.modals.llm_data import (
     TasksTag,
-    ModelBooleanResponse
+    ModelBooleanResponse,
+    ModelResponseList
 )
 from src.modals.file_types.base import FileMetadata, FileDataFormat
 
@@ -26,6 +29,20 @@ USER_PROMPT = """### Query
 {query}
 """
 
+BATCH_SYS_PROMPT = """Given below are definitions of files.
+Validate which of the given files have relevant context to the user query.
+You must return a JSON list with the File IDs of all the relevant files, for example: ["file-0", "file-3"]. Return [] if none of the files are relevant.
+Do NOT under any circumstances try to generate a code. Do NOT return anything other than the JSON list.
+
+{file_infos}
+"""
+
+BATCH_FILE_INFO_TEMPLATE = '''- File ID: {file_id}
+  Filename: {file_name}
+  {additional_file_info}'''
+
+JSON_LIST_REGEX_PATTERN = r"\[[\s\S]*?\]"
+
 
 def fetch_additional_file_info(file_metadata: FileMetadata) -> str:
     if file_metadata.file_format == FileDataFormat.CSV:
@@ -84,3 +101,63 @@ class DataForTask(LLMTask):
             tags=tags,
             metadata=self.metadata
         )
+
+
+class BatchDataForTask(LLMTask):
+    """
+    Checks which of the given metadata files are relevant to the user query in a single call.
+    Raises ValueError from postprocess when the response can't be parsed.
+    """
+
+    def __init__(
+        self,
+        file_metadatas: List[FileMetadata],
+        query: str,
+        tags: List = [],
+        metadata: Any = None
+    ):
+        self._tags = tags
+        self.file_metadatas = file_metadatas
+        self.query = query
+        self.metadata = metadata
+
+    @property
+    def tags(self):
+        return [TasksTag.batch_data_for_task] + self._tags
+
+    def preprocess(self):
+        return {
+            "file_infos": "\n".join([
+                BATCH_FILE_INFO_TEMPLATE.format(
+                    file_id=file_metadata.id,
+                    file_name=file_metadata.file_name,
+                    additional_file_info=fetch_additional_file_info(file_metadata)
+                ) for file_metadata in self.file_metadatas
+            ]),
+            "query": self.query
+        }
+
+    def prompt(self):
+        return {"system": BATCH_SYS_PROMPT, "user": USER_PROMPT}
+
+    def postprocess(self, result: str) -> ModelResponseList:
+        match = re.search(JSON_LIST_REGEX_PATTERN, result)
+        if match is None:
+            raise ValueError(f"No JSON list found in response: {result}")
+
+        file_ids = json.loads(match.group(0))
+        if not isinstance(file_ids, list):
+            raise ValueError(f"Expected a list of file IDs, found: {file_ids}")
+        file_ids = set(str(file_id).strip() for file_id in file_ids)
+
+        # Keep original (vector search) ordering, ignore unknown IDs
+        relevant_metadatas = [
+            file_metadata for file_metadata in self.file_metadatas
+            if file_metadata.id in file_ids
+        ]
+        return ModelResponseList(
+            items=relevant_metadatas,
+            text=result,
+            tags=self.tags,
+            metadata=self.metadata
+        )
@@ -0,0 +1,186 @@
+import re
+from typing import Any, Dict, List
+
+from src.modals.llm_data import (
+    TasksTag,
+    ModelResponse
+)
+from src.modals.file_types.base import FileMetadata, FileDataFormat
+
+from src.code_executor.sql_executor import table_name
+from src.llm.llm_task import LLMTask
+from src.llm.tasks.code_solver import fetch_fields, fetch_json_keys
+from src.utils.logger import get_module_logger
+
+
+logger = get_module_logger(__name__)
+
+
+SYS_PROMPT = """Given below is a definition of tables, your task is to write a DuckDB SQL query to compute the answer to the user's query.
+
+Make sure to follow the below rules while generating the query:
+- Write a single SELECT statement (CTEs are allowed), do NOT modify any data.
+- Do NOT make random assumptions about the data.
+- Use only the tables and fields defined below, always quote field names with double quotes, e.g. "Field Name".
+- JSON tables have nested fields as STRUCT and LIST columns, e.g. "user"."name" or unnest("items").
+- Always generate minimalistic answers to the question, return only the columns needed to answer it.
+
+Input Tables:
+{table_infos}
+
+Output Format:
+```sql
+<Query Here>
+```
+"""
+
+REFINEMENT_SYS_PROMPT = """Given below is a definition of tables and a DuckDB SQL query, your task is to refine the query based on user's query.
+
+Make sure to follow the below rules while generating the query:
+- Write a single SELECT statement (CTEs are allowed), do NOT modify any data.
+- Do NOT make random assumptions about the data.
+- Use only the tables and fields defined below, always quote field names with double quotes, e.g. "Field Name".
+- JSON tables have nested fields as STRUCT and LIST columns, e.g. "user"."name" or unnest("items").
+- Always generate minimalistic answers to the question, return only the columns needed to answer it.
+
+Input Tables:
+{table_infos}
+
+Output Format:
+```sql
+<Query Here>
+```
+"""
+
+USER_PROMPT = """### Query
+{query}
+"""
+
+REFINEMENT_USER_PROMPT = """### SQL
+```sql
+{code}
+```
+
+### Query
+{query}
+"""
+
+REGEX_PATTERN = r"```sql([\s\S]*?)```"
+CODE_BLOCK_START = "```sql"
+CODE_BLOCK_END = "```"
+
+
+TABLE_INFO_TEMPLATE = '''{idx}. Table: {table}
+ Filename: {file_name}
+ {section}:
+{fields}
+'''
+
+
+def fetch_table_info(idx, file_metadata: FileMetadata) -> str:
+    if file_metadata.file_format in [FileDataFormat.CSV, FileDataFormat.LOG]:
+        section, fields = "Fields", fetch_fields(file_metadata.fields)
+    elif file_metadata.file_format == FileDataFormat.JSON:
+        section, fields = "Keys", fetch_json_keys(file_metadata.json_keys)
+    else:
+        return ""
+    return TABLE_INFO_TEMPLATE.format(
+        idx=idx,
+        table=table_name(file_metadata),
+        file_name=file_metadata.file_name,
+        section=section,
+        fields=fields
+    )
+
+
+def generate_table_info(file_metadatas: List[FileMetadata]) -> str:
+    return "\n".join([
+        fetch_table_info(idx + 1, metadata) for idx, metadata in enumerate(file_metadatas)
+    ])
+
+
+def extract_partial_sql(partial_response: str) -> str | None:
+    '''Returns the query streamed so far inside the sql code block.'''
+    start = partial_response.find(CODE_BLOCK_START)
+    if start == -1:
+        return None
+    sql = partial_response[start + len(CODE_BLOCK_START):]
+    end = sql.find(CODE_BLOCK_END)
+    if end != -1:
+        return sql[:end]
+    return sql.rstrip('`')
+
+
+class SQLSolver(LLMTask):
+    """
+    Generate a SQL query over the files' tables to solve user query.
+    """
+
+    def __init__(
+        self,
+        file_metadatas: List[FileMetadata],
+        query: str,
+        tags: List = [],
+        metadata: Any = None,
+        sampling_params: Dict[str, Any] | None = None
+    ):
+        self._tags = tags
+        self.file_metadatas = file_metadatas
+        self.query = query
+        self.metadata = metadata
+        self.sampling_params = sampling_params
+
+    @property
+    def tags(self):
+        return [TasksTag.sql_solver] + self._tags
+
+    def preprocess(self):
+        return {
+            "table_infos": generate_table_info(self.file_metadatas),
+            "query": self.query
+        }
+
+    def prompt(self):
+        return {"system": SYS_PROMPT, "user": USER_PROMPT}
+
+    def postprocess(self, result: str) -> ModelResponse:
+        sql = re.findall(REGEX_PATTERN, result, re.DOTALL)[-1]
+        return ModelResponse(
+            text=sql.strip(),
+            tags=self.tags,
+            metadata=self.metadata
+        )
+
+    def postprocess_partial(self, partial_response: str) -> str | None:
+        return extract_partial_sql(partial_response)
+
+
+class SQLRefinement(SQLSolver):
+    """
+    Refine the given SQL query based on user feedback.
+    """
+
+    def __init__(
+        self,
+        code: str,
+        file_metadatas: List[FileMetadata],
+        query: str,
+        tags: List = [],
+        metadata: Any = None
+    ):
+        super().__init__(file_metadatas=file_metadatas, query=query, tags=tags, metadata=metadata)
+        self.code = code
+
+    @property
+    def tags(self):
+        return [TasksTag.sql_refinement] + self._tags
+
+    def preprocess(self):
+        return {
+            "code": self.code,
+            "table_infos": generate_table_info(self.file_metadatas),
+            "query": self.query
+        }
+
+    def prompt(self):
+        return {"system": REFINEMENT_SYS_PROMPT, "user": REFINEMENT_USER_PROMPT}
@@ -49,7 +49,7 @@ class Summarizer(LLMTask):
 
     @property
     def tags(self):
-        return [TasksTag.data_for_task] + self._tags
+        return [TasksTag.summarizer] + self._tags
 
     def preprocess(self):
         return {
@@ -66,3 +66,6 @@ class Summarizer(LLMTask):
             tags=self.tags,
             metadata=self.metadata
         )
+
+    def postprocess_partial(self, partial_response: str) -> str | None:
+        return partial_response
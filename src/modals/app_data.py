@@ -1,6 +1,8 @@
 from typing import List, Any
 from pydantic import BaseModel, ConfigDict
 
+from src.modals.trace_data import Span
+
 
 CODE_EXECUTION_RETRIES = 5
 
@@ -13,4 +15,6 @@ class AppResult(BaseModel):
     message: str | None = None
     model_result: Any = None
     code: str = ""
+    code_language: str = "python"  # "python" or "sql", see app_workflow.choose_solver_backend
     file_metadata_ids: List[str] = []
+    trace: List[Span] = []  # Timings of each stage, see src.utils.tracing
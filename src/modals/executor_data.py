@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+
+
+class DataFrameCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    items: int = 0
+    bytes: int = 0
+    max_bytes: int = 0
+
+
+class SolverCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    items: int = 0
+    bytes: int = 0
+    max_bytes: int = 0
+
+
+class JSONCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    streamed: int = 0
+    items: int = 0
+    bytes: int = 0
+    max_bytes: int = 0
@@ -14,6 +14,9 @@ class FileMetadata(BaseModel):
     id: str
     file_path: str
     file_format: FileDataFormat
+    # ZIP the file is a member of, it is extracted to file_path on first use
+    archive_path: str = ""
+    archive_member: str = ""
 
     @computed_field
     @property
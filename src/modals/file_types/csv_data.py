@@ -18,6 +18,8 @@ class CSVFileMetadata(FileMetadata):
     fields: List[CSVField] = []
     row_count: int = 0
     col_count: int = 0
+    # Typed Parquet copy written at ingest, "" when not available
+    columnar_file_path: str = ""
 
     @computed_field
     @property
@@ -1,3 +1,5 @@
+from typing import List
+from pydantic import BaseModel, computed_field
 from src.modals.file_types.base import FileDataFormat
 from src.modals.file_types.csv_data import CSVFileMetadata
 
@@ -5,4 +7,24 @@ from src.modals.file_types.csv_data import CSVFileMetadata
 class LogFileMetadata(CSVFileMetadata):
     log_line_count: int
     file_format: FileDataFormat = FileDataFormat.LOG
-    csv_file_path: str
+    # Parsed log lines, only written when there is no columnar copy
+    csv_file_path: str = ""
+    # Lines not matching the regex pattern, left out of the parsed rows
+    unmatched_line_count: int = 0
+
+
+class LogParseStats(BaseModel):
+    '''Lines of a log matched by its regex pattern'''
+    line_count: int = 0
+    matched_count: int = 0
+    unmatched_samples: List[str] = []  # First few unmatched lines
+
+    @computed_field
+    @property
+    def match_rate(self) -> float:
+        return self.matched_count / self.line_count if self.line_count > 0 else 0.0
+
+    def merge(self, other: 'LogParseStats', max_samples: int):
+        self.line_count += other.line_count
+        self.matched_count += other.matched_count
+        self.unmatched_samples.extend(other.unmatched_samples[:max_samples - len(self.unmatched_samples)])
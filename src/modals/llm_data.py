@@ -11,11 +11,55 @@ class LLM_Client_Type(str, Enum):
     openai = 'openai'
 
 
+# LLM Client
+class LLMClientConfig(BaseModel):
+    api_base: str | None = None
+    api_key: str | None = None
+    model: str | None = None
+    max_connections: int = 20  # Max. open connections in the shared pool
+    max_keepalive_connections: int = 10  # Max. idle connections kept alive
+    keepalive_expiry: float = 30.0  # Seconds an idle connection is kept alive
+    timeout: float = 120.0
+
+
+class PoolStats(BaseModel):
+    open: int = 0
+    idle: int = 0
+    in_use: int = 0
+    max_connections: int = 0
+    max_keepalive_connections: int = 0
+
+
+class CacheStats(BaseModel):
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    memory_items: int = 0
+    disk_items: int = 0
+    disk_bytes: int = 0
+
+
+class SchedulerMetrics(BaseModel):
+    endpoint: str
+    queue_depth: int = 0  # Calls waiting for a rate limit token or concurrency slot
+    in_flight: int = 0
+    concurrency_limit: float = 0
+    throttle_events: int = 0  # 429/503 responses received
+    retries: int = 0
+    failures: int = 0
+    completed: int = 0
+
+
 # LLM Tasks
 class TasksTag(str, Enum):
     data_for_task = 'data_for_task'
+    batch_data_for_task = 'batch_data_for_task'
     code_solver = 'code_solver'
     code_refinement = 'code_refinement'
+    sql_solver = 'sql_solver'
+    sql_refinement = 'sql_refinement'
     log_field_extractor = 'log_field_extractor'
     summarizer = 'summarizer'
 
@@ -0,0 +1,20 @@
+from typing import Any, Dict
+from pydantic import BaseModel, computed_field
+
+
+class Span(BaseModel):
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None = None
+    name: str
+    start_time_ns: int  # Unix epoch
+    end_time_ns: int | None = None
+    status: str = "ok"
+    attributes: Dict[str, Any] = {}
+
+    @computed_field
+    @property
+    def duration_ms(self) -> float:
+        if self.end_time_ns is None:
+            return 0.0
+        return (self.end_time_ns - self.start_time_ns) / 1e6
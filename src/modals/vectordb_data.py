@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+
+from src.modals.file_types.base import FileMetadata
+
+
+class ScoredFileMetadata(BaseModel):
+    '''File metadata returned from a vector search along with its distance to the query.'''
+    file_metadata: FileMetadata
+    distance: float
+
+
+class IngestProgress(BaseModel):
+    '''Reported after each file of an ingested batch is profiled.'''
+    file_name: str
+    done: int
+    total: int
+    error: str | None = None  # Set when the file couldn't be ingested
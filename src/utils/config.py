@@ -0,0 +1,39 @@
+import os
+
+from dotenv import load_dotenv
+
+# Load `.env` once when the first module needs configuration.
+load_dotenv()
+
+
+def get_env_str(name: str, default: str | None = None) -> str | None:
+    '''Returns the env variable value or the default when it is unset or empty.'''
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip()
+
+
+def get_env_int(name: str, default: int) -> int:
+    value = get_env_str(name)
+    return int(value) if value is not None else default
+
+
+def get_env_float(name: str, default: float) -> float:
+    value = get_env_str(name)
+    return float(value) if value is not None else default
+
+
+def get_env_bool(name: str, default: bool) -> bool:
+    value = get_env_str(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def get_env_list(name: str, default: list | None = None) -> list:
+    '''Returns comma separated env variable as a list of stripped values.'''
+    value = get_env_str(name)
+    if value is None:
+        return list(default or [])
+    return [item.strip() for item in value.split(",") if item.strip() != ""]
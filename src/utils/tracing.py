@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+from src.modals.trace_data import Span
+from src.utils.config import get_env_bool, get_env_str
+from src.utils.logger import get_module_logger
+
+
+# JSONL file to append finished traces to, one OpenTelemetry (OTLP/JSON) span per line.
+TRACE_EXPORT_PATH = get_env_str('TRACE_EXPORT_PATH')
+# Also emit spans through the OpenTelemetry SDK when it is installed and configured.
+TRACE_OTEL_EXPORT = get_env_bool('TRACE_OTEL_EXPORT', False)
+
+SERVICE_NAME = "daita"
+
+logger = get_module_logger(__name__)
+
+_current_trace: contextvars.ContextVar['Trace | None'] = contextvars.ContextVar('daita_trace', default=None)
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar('daita_span', default=None)
+_export_lock = threading.Lock()
+
+
+class Trace:
+    '''Spans recorded for one request, shared across threads and tasks.'''
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def finished_spans(self) -> List[Span]:
+        with self._lock:
+            return sorted(
+                [span for span in self.spans if span.end_time_ns is not None],
+                key=lambda span: span.start_time_ns
+            )
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    '''
+    Records a span under the current span. Without an active trace the span
+    is still yielded (so attributes can be set) but not recorded.
+    '''
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    new_span = Span(
+        trace_id=trace.trace_id if trace is not None else "",
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent.span_id if parent is not None else None,
+        name=name,
+        start_time_ns=time.time_ns(),
+        attributes=dict(attributes),
+    )
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as error:
+        new_span.status = "error"
+        new_span.attributes["error"] = str(error)
+        raise
+    finally:
+        new_span.end_time_ns = time.time_ns()
+        _current_span.reset(token)
+        if trace is not None:
+            trace.add(new_span)
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    '''Starts a new trace with a root span, exporting it when finished.'''
+    trace = Trace(name)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        export_trace(trace)
+
+
+def set_attributes(**attributes):
+    '''Sets attributes on the current span.'''
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def increment_attribute(name: str, value: int = 1):
+    current = _current_span.get()
+    if current is not None:
+        current.attributes[name] = current.attributes.get(name, 0) + value
+
+
+def otel_attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otel_span(span: Span) -> Dict[str, Any]:
+    '''Converts span into the OTLP/JSON span representation.'''
+    otel_span = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_time_ns),
+        "endTimeUnixNano": str(span.end_time_ns),
+        "attributes": [
+            {"key": key, "value": otel_attribute_value(value)}
+            for key, value in span.attributes.items()
+        ],
+        "status": {"code": 2 if span.status == "error" else 1},
+        "resource": {"service.name": SERVICE_NAME},
+    }
+    if span.parent_span_id is not None:
+        otel_span["parentSpanId"] = span.parent_span_id
+    return otel_span
+
+
+def export_trace(trace: Trace):
+    spans = trace.finished_spans()
+    if TRACE_EXPORT_PATH is not None:
+        try:
+            lines = "".join(json.dumps(to_otel_span(span)) + "\n" for span in spans)
+            with _export_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(TRACE_EXPORT_PATH)), exist_ok=True)
+                with open(TRACE_EXPORT_PATH, 'a', encoding='utf-8') as fp:
+                    fp.write(lines)
+        except OSError as error:
+            logger.error("Unable to export trace to '%s': %s", TRACE_EXPORT_PATH, error)
+
+    if TRACE_OTEL_EXPORT:
+        export_to_opentelemetry(spans)
+
+
+def export_to_opentelemetry(spans: List[Span]):
+    '''Replays finished spans through the globally configured OpenTelemetry tracer.'''
+    try:
+        from opentelemetry import trace as otel_trace
+    except ImportError:
+        logger.warning("TRACE_OTEL_EXPORT is set but opentelemetry is not installed")
+        return
+
+    tracer = otel_trace.get_tracer(SERVICE_NAME)
+    otel_spans = {}
+    # Spans are sorted by start time, so parents are created before children.
+    for span in spans:
+        parent = otel_spans.get(span.parent_span_id)
+        context = otel_trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = tracer.start_span(
+            span.name,
+            context=context,
+            start_time=span.start_time_ns,
+            attributes={
+                key: value if isinstance(value, (str, bool, int, float)) else str(value)
+                for key, value in span.attributes.items()
+            },
+        )
+        if span.status == "error":
+            otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+        otel_spans[span.span_id] = otel_span
+
+    for span in spans:
+        otel_spans[span.span_id].end(end_time=span.end_time_ns)
@@ -2,17 +2,19 @@ import os
 import json
 import tempfile
 from shutil import rmtree
-from typing import List
+from typing import List, Tuple
 
 import chromadb
 
 from src.data_utils.file_metadata import (
-    create_metadata_from_file,
     get_metadata_from_json,
     convert_metadata_to_json,
 )
+from src.data_utils.ingest import IngestProgressCallback, ingest_files
+from src.code_executor.df_cache import DataFrameCache
 from src.utils.logger import get_module_logger
 from src.modals.file_types.base import FileMetadata
+from src.modals.vectordb_data import ScoredFileMetadata
 
 VECTORDB_COLLECTION_NAME = "data-collection"
 TEMP_DIR_PREFIX = "daita"
@@ -40,9 +42,15 @@ class VectorDBSession:
         self.collection = self.chroma_client.get_or_create_collection(
             name=(VECTORDB_COLLECTION_NAME + f"-{random_id}").rstrip('_-')
         )
+
+        # DataFrames loaded by generated code, reused across retries and follow-ups
+        self.df_cache = DataFrameCache()
+        # Index of the next added file, for its ID
+        self._next_file_idx = 0
         logger.info("Initialized Logger")
 
     def __del__(self):
+        self.df_cache.clear()
         rmtree(self.temp_dir)
 
     def __len__(self):
@@ -53,55 +61,79 @@ class VectorDBSession:
         The method persists the file into a temp directory location, while
         creating the metadata in VectorDB.
         """
-        # Save file into temp location
-        file_path = os.path.join(self.temp_dir, file_name)
-        file_id = f"file-{self.collection.count()}"
-
-        with open(file_path, "wb") as file_writer:
-            file_writer.write(file_bytes)
-
-        # Save metadata
-        file_metadata_s = create_metadata_from_file(_id=file_id, file_path=file_path)
-        if isinstance(file_metadata_s, list):
-            for file_metadata in file_metadata_s:
-                self.add_file_metadata_to_db(file_metadata)
-        else:
-            self.add_file_metadata_to_db(file_metadata_s)
+        _, failures = self.add_files([(file_name, file_bytes)])
+        if len(failures) > 0:
+            raise failures[0][1]
+
+    def add_files(
+        self,
+        files: List[Tuple[str, bytes]],
+        progress_cb: IngestProgressCallback | None = None
+    ) -> Tuple[List[FileMetadata], List[Tuple[str, Exception]]]:
+        """
+        Persists the (file name, bytes) files into the temp directory, profiles them in
+        parallel and adds their metadata to VectorDB in one batch. 'progress_cb' is called
+        after each file (or archive member) is profiled.
+        Returns the metadata added and the (file path, error) of files which failed.
+        """
+        saved_files = []
+        for file_name, file_bytes in files:
+            file_path = os.path.join(self.temp_dir, file_name)
+            with open(file_path, "wb") as file_writer:
+                file_writer.write(file_bytes)
+            saved_files.append((f"file-{self._next_file_idx}", file_path))
+            self._next_file_idx += 1
+
+        file_metadatas, failures = ingest_files(saved_files, self.temp_dir, progress_cb)
+        self.add_file_metadatas_to_db(file_metadatas)
+        return file_metadatas, failures
 
     def add_file_metadata_to_db(self, file_metadata: FileMetadata):
         """Adds file_metadata info into VectorDB"""
-        metadata_json = convert_metadata_to_json(file_metadata)
+        self.add_file_metadatas_to_db([file_metadata])
 
-        logger.debug("%s", json.dumps(metadata_json, indent=2))
+    def add_file_metadatas_to_db(self, file_metadatas: List[FileMetadata]):
+        """Adds info of all file_metadatas into VectorDB in one call"""
+        if len(file_metadatas) == 0:
+            return
+        metadata_jsons = [convert_metadata_to_json(file_metadata) for file_metadata in file_metadatas]
+
+        for metadata_json in metadata_jsons:
+            logger.debug("%s", json.dumps(metadata_json, indent=2))
 
         self.collection.add(
-            ids=file_metadata.id,
-            documents=file_metadata.doc_string,
-            metadatas=metadata_json,
+            ids=[file_metadata.id for file_metadata in file_metadatas],
+            documents=[file_metadata.doc_string for file_metadata in file_metadatas],
+            metadatas=metadata_jsons,
         )
-        logger.info("Created new %s document", file_metadata.file_format)
+        for file_metadata in file_metadatas:
+            logger.info("Created new %s document", file_metadata.file_format)
 
-    def query(self, query_text, top_n=TOP_N_RESULTS) -> List[FileMetadata]:
-        """Query for similar data items in vector db"""
+    def query(self, query_text, top_n=TOP_N_RESULTS) -> List[ScoredFileMetadata]:
+        """Query for similar data items in vector db, closest first"""
         results = self.collection.query(
             query_texts=query_text,  # Chroma will embed this for you
             n_results=top_n,  # how many results to return
+            include=["metadatas", "distances"],
         )
         # Convert ChromaDB Query Result into FileMetadata
-        file_metadata_lists: List[FileMetadata] = []
+        scored_results: List[ScoredFileMetadata] = []
 
         # 0'th index because only 1 text query requested at a time
-        total_results = len(results["documents"][0])
+        total_results = len(results["metadatas"][0])
 
         for i in range(total_results):
             try:
                 metadata = results["metadatas"][0][i]
                 file_metadata = get_metadata_from_json(metadata)
-                file_metadata_lists.append(file_metadata)
+                scored_results.append(ScoredFileMetadata(
+                    file_metadata=file_metadata,
+                    distance=results["distances"][0][i]
+                ))
             except Exception as error:
                 logger.error("Something happened while parsing metadata: %s", error)
 
-        return file_metadata_lists
+        return scored_results
 
     def fetch_metadata_by_ids(self, ids: List[str]) -> List[FileMetadata]:
         """Return file metadata by ids"""
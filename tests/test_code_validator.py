@@ -0,0 +1,51 @@
+import pytest
+
+from src.code_executor.code_validator import validate_code
+from src.errors import CodeValidationError
+from src.modals.file_types.csv_data import CSVField, CSVFileMetadata
+
+
+METADATA = CSVFileMetadata(
+    id="weather",
+    file_path="/tmp/weather.csv",
+    row_count=1,
+    col_count=1,
+    fields=[CSVField(name="temp", field_type="int64", null_count=0, unique_count=1, uniques=[])],
+)
+
+
+def solver(*lines: str) -> str:
+    body = "".join(f"    {line}\n" for line in lines)
+    return f'def solver():\n    df = fetch_df("weather")\n{body}'
+
+
+@pytest.mark.parametrize("lines", [
+    ['df["hot"] = df["temp"] > 30', 'return df["hot"].sum()'],
+    ['df.loc[df["temp"] > 30, "hot"] = True', 'return df["hot"].sum()'],
+    ['df.at[0, "hot"] = True', 'return df["hot"]'],
+    ['df.insert(0, "hot", 1)', 'return df.groupby("hot").size()'],
+    ['df.insert(loc=0, column="hot", value=1)', 'return df.sort_values("hot")'],
+    ['df = df.assign(hot=df["temp"] > 30)', 'return df["hot"].sum()'],
+])
+def test_added_columns_are_known(lines):
+    code = solver(*lines)
+    assert validate_code(code, [METADATA]) == code
+
+
+@pytest.mark.parametrize("lines", [
+    ['column = "hot"', 'df[column] = 1', 'return df["hot"]'],
+    ['column = "hot"', 'df.loc[df["temp"] > 30, column] = True', 'return df["hot"]'],
+    ['columns = {"hot": 1}', 'df = df.assign(**columns)', 'return df["hot"]'],
+])
+def test_unresolved_mutations_stop_tracking(lines):
+    code = solver(*lines)
+    assert validate_code(code, [METADATA]) == code
+
+
+def test_unknown_column_is_rejected():
+    with pytest.raises(CodeValidationError, match="Unknown column 'hot' of file 'weather'"):
+        validate_code(solver('df.loc[df["temp"] > 30, "warm"] = True', 'return df["hot"].sum()'), [METADATA])
+
+
+def test_column_case_is_fixed():
+    assert validate_code(solver('return df["Temp"]'), [METADATA]) == solver('return df[\'temp\']')
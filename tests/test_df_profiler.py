@@ -0,0 +1,51 @@
+import io
+
+import pandas as pd
+import pytest
+
+from src.data_utils.df_profiler import CSV_UNIQUE_COL_LIMIT, profile_chunks
+from src.modals.file_types.csv_data import CSVField
+
+
+CHUNK_ROWS = 4
+
+
+def baseline_fields(df: pd.DataFrame):
+    '''Profile of the file read at once, as create_csv_metadata() built it before chunking.'''
+    fields = []
+    for col in df.columns.tolist():
+        uniques = [str(value) for value in df[col].unique().tolist()]
+        fields.append(CSVField(
+            name=str(col),
+            field_type=str(df[col].dtype),
+            null_count=int(df[col].isna().sum()),
+            unique_count=len(uniques),
+            uniques=uniques if len(uniques) <= CSV_UNIQUE_COL_LIMIT else []
+        ))
+    return fields
+
+
+def chunked_fields(text: str):
+    with pd.read_csv(io.StringIO(text), chunksize=CHUNK_ROWS) as chunks:
+        return profile_chunks(chunk.infer_objects() for chunk in chunks).fields()
+
+
+@pytest.mark.parametrize("values", [
+    # int64 chunk, then a float64 chunk (decimal and missing value) repeating its values
+    ["1", "2", "3", "1", "1", "2.5", "", "3"],
+    # int64 chunk, then an object chunk repeating its values as text
+    ["1", "2", "3", "1", "1", "x", "2", "y"],
+    # float64 chunk, then an object chunk
+    ["1.5", "", "2.5", "1.5", "x", "1.5", "", "y"],
+    # More distinct values than uniques are listed for, int64 then float64 then object
+    [str(idx) for idx in range(8)] + [str(idx) for idx in range(4)] + ["0.5", "", "1.5", "2.0"]
+    + ["a", "1", "b", "3"],
+])
+def test_chunks_with_changing_dtypes_match_unchunked_profile(values):
+    # An id column keeps missing values from being skipped as blank lines
+    text = "id,value\n" + "".join(f"{idx},{value}\n" for idx, value in enumerate(values))
+    chunked = chunked_fields(text)
+    with pd.read_csv(io.StringIO(text), chunksize=CHUNK_ROWS) as chunks:
+        assert len(set(str(chunk["value"].dtype) for chunk in chunks)) > 1
+
+    assert chunked == baseline_fields(pd.read_csv(io.StringIO(text)).infer_objects())
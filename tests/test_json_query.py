@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from src.code_executor import json_query
+from src.code_executor.json_query import is_json_lines, iter_array_items, record_query, run_jq_query
+
+
+RECORDS = [{"id": 1, "tags": ["a", "b"]}, {"id": 2, "name": "x, ] y"}, {"id": 3, "score": 12345678.5}]
+
+
+@pytest.fixture(autouse=True)
+def stream_everything(monkeypatch):
+    '''Streams files of any size, in chunks small enough to split items.'''
+    monkeypatch.setattr(json_query, "JSON_STREAM_MIN_BYTES", 0)
+    monkeypatch.setattr(json_query, "JSON_STREAM_CHUNK_SIZE", 5)
+
+
+def write(tmp_path, name: str, text: str) -> str:
+    file_path = tmp_path / name
+    file_path.write_text(text, encoding="utf-8")
+    return str(file_path)
+
+
+def test_record_query():
+    assert record_query(".[] | .id").split() == [".", "|", ".id"]
+    assert record_query(".[].tags") == ".tags"
+    assert record_query(".[]") == "."
+    assert record_query("map(.id)") is None
+    assert record_query(".[] |") is None
+
+
+def test_top_level_array_is_streamed_by_item(tmp_path):
+    file_path = write(tmp_path, "records.json", json.dumps(RECORDS, indent=2))
+
+    assert [json.loads(item) for item in iter_array_items(file_path)] == RECORDS
+    assert run_jq_query(file_path, ".[] | .id") == [1, 2, 3]
+    assert run_jq_query(file_path, ".[].tags") == [["a", "b"], None, None]
+    # Other queries run on the whole document
+    assert run_jq_query(file_path, "length") == [3]
+
+
+def test_json_lines_are_streamed_by_line(tmp_path):
+    file_path = write(tmp_path, "records.jsonl", "\n".join(json.dumps(record) for record in RECORDS) + "\n\n")
+
+    assert is_json_lines(file_path)
+    assert run_jq_query(file_path, ".id") == [1, 2, 3]
+    assert run_jq_query(file_path, "select(.id > 1) | .id") == [2, 3]
+
+
+def test_malformed_json_line_raises(tmp_path):
+    file_path = write(tmp_path, "records.jsonl", '{"id": 1}\n{"id": 2}\n{"id": \n')
+
+    with pytest.raises(ValueError):
+        run_jq_query(file_path, ".id")
+
+
+def test_malformed_array_item_raises(tmp_path):
+    file_path = write(tmp_path, "records.json", '[{"id": 1}, {"id": }]')
+
+    with pytest.raises(ValueError):
+        list(iter_array_items(file_path))
+
+
+def test_unterminated_array_raises(tmp_path):
+    file_path = write(tmp_path, "records.json", '[{"id": 1}, {"id": 2}')
+
+    with pytest.raises(ValueError, match="Unterminated JSON array"):
+        list(iter_array_items(file_path))
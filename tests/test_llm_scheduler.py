@@ -0,0 +1,117 @@
+import time
+import asyncio
+import inspect
+
+import openai
+import pytest
+
+from src.llm.event_loop import run_coroutine
+from src.llm.llm_scheduler import DECREASE_FACTOR, EndpointScheduler
+from src.llm.stand_in_server import StandInLLM, start_server
+
+
+RETRY_AFTER = 1.0  # Longer than the first backoff (LLM_RETRY_BASE_DELAY), so only Retry-After explains the wait
+MAX_CONCURRENCY = 8
+MESSAGES = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def llm():
+    llm = StandInLLM(canned={}, fault_429=1.0, retry_after=RETRY_AFTER)
+    server = start_server(llm)
+    llm.base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    yield llm
+    server.shutdown()
+    server.server_close()
+
+
+def throttled_once(llm: StandInLLM, create, attempts: list):
+    '''
+    Call of 'create' (blocking or async) answered with 429 the first time only,
+    recording when each attempt starts.
+    '''
+    def answered():
+        llm.fault_429 = 0.0
+
+    async def awaited(response):
+        try:
+            return await response
+        finally:
+            answered()
+
+    def call():
+        attempts.append(time.monotonic())
+        try:
+            response = create(model="stand-in", messages=MESSAGES)
+        except Exception:
+            answered()
+            raise
+        if inspect.isawaitable(response):
+            return awaited(response)
+        answered()
+        return response
+    return call
+
+
+def test_run_retries_after_retry_after_and_decreases_concurrency(llm):
+    client = openai.AsyncOpenAI(base_url=llm.base_url, api_key="test", max_retries=0)
+    scheduler = EndpointScheduler("test", max_concurrency=MAX_CONCURRENCY, max_retries=2)
+    attempts = []
+    call = throttled_once(llm, client.chat.completions.create, attempts)
+
+    async def run():
+        return await scheduler.run(call)
+    response = run_coroutine(run())
+
+    assert response.choices[0].message.content == "This is a stand-in response."
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= RETRY_AFTER
+
+    metrics = scheduler.metrics()
+    assert (metrics.retries, metrics.throttle_events, metrics.completed, metrics.failures) == (1, 1, 1, 0)
+    # Halved by the 429, then one additive increase for the successful retry
+    decreased = MAX_CONCURRENCY * DECREASE_FACTOR
+    assert metrics.concurrency_limit == pytest.approx(decreased + 1 / decreased, abs=0.01)
+    assert metrics.in_flight == 0
+
+
+def test_run_sync_retries_after_retry_after(llm):
+    client = openai.OpenAI(base_url=llm.base_url, api_key="test", max_retries=0)
+    scheduler = EndpointScheduler("test", max_concurrency=MAX_CONCURRENCY, max_retries=2)
+    attempts = []
+
+    response = scheduler.run_sync(throttled_once(llm, client.chat.completions.create, attempts))
+
+    assert response.choices[0].message.content == "This is a stand-in response."
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= RETRY_AFTER
+    metrics = scheduler.metrics()
+    assert (metrics.retries, metrics.throttle_events, metrics.completed) == (1, 1, 1)
+
+
+def test_burst_of_throttles_decreases_concurrency_once(llm):
+    client = openai.OpenAI(base_url=llm.base_url, api_key="test", max_retries=0)
+    scheduler = EndpointScheduler("test", max_concurrency=MAX_CONCURRENCY, max_retries=0)
+
+    for _ in range(3):
+        with pytest.raises(openai.RateLimitError):
+            scheduler.run_sync(lambda: client.chat.completions.create(model="stand-in", messages=MESSAGES))
+    # Releases are queued onto the shared loop, let them run
+    run_coroutine(asyncio.sleep(0))
+
+    metrics = scheduler.metrics()
+    assert (metrics.retries, metrics.throttle_events, metrics.failures) == (0, 3, 3)
+    assert metrics.concurrency_limit == MAX_CONCURRENCY * DECREASE_FACTOR
+
+
+def test_run_sync_releases_slot_on_base_exception(llm):
+    scheduler = EndpointScheduler("test", max_concurrency=1, max_retries=0)
+
+    def interrupted():
+        raise KeyboardInterrupt()
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.run_sync(interrupted)
+    run_coroutine(asyncio.sleep(0))
+
+    assert scheduler.metrics().in_flight == 0
+    assert scheduler.run_sync(lambda: "ok") == "ok"
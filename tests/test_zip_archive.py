@@ -0,0 +1,84 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from src.data_utils import zip_archive
+from src.data_utils.zip_archive import extract_member, list_members, member_path
+from src.errors import ArchiveLimitError
+
+
+CSV_TEXT = "id,value\n1,a\n2,b\n"
+
+
+def is_csv(name: str) -> bool:
+    return name.endswith(".csv")
+
+
+def write_zip(tmp_path, members, compression=zipfile.ZIP_STORED) -> str:
+    '''Archive of (name, text) members, built in memory.'''
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=compression) as zip_ref:
+        for name, text in members:
+            zip_ref.writestr(name, text)
+    file_path = tmp_path / "archive.zip"
+    file_path.write_bytes(buffer.getvalue())
+    return str(file_path)
+
+
+def test_lists_supported_members(tmp_path):
+    file_path = write_zip(tmp_path, [("a.csv", CSV_TEXT), ("notes.txt", "x"), ("dir/b.csv", CSV_TEXT)])
+
+    assert [member.filename for member in list_members(file_path, is_csv)] == ["a.csv", "dir/b.csv"]
+
+
+def test_member_count_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_archive, "ZIP_MAX_MEMBERS", 2)
+    file_path = write_zip(tmp_path, [(f"{idx}.csv", CSV_TEXT) for idx in range(3)] + [("notes.txt", "x")])
+
+    with pytest.raises(ArchiveLimitError, match="3 files, the limit is 2"):
+        list_members(file_path, is_csv)
+
+
+def test_total_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_archive, "ZIP_MAX_TOTAL_BYTES", 2 * len(CSV_TEXT))
+    file_path = write_zip(tmp_path, [(f"{idx}.csv", CSV_TEXT) for idx in range(3)])
+
+    with pytest.raises(ArchiveLimitError, match="the limit is"):
+        list_members(file_path, is_csv)
+
+
+def test_members_over_size_limit_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_archive, "ZIP_MAX_MEMBER_BYTES", len(CSV_TEXT))
+    file_path = write_zip(tmp_path, [("small.csv", CSV_TEXT), ("large.csv", CSV_TEXT * 2)])
+
+    assert [member.filename for member in list_members(file_path, is_csv)] == ["small.csv"]
+
+
+def test_compression_ratio_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_archive, "ZIP_RATIO_MIN_BYTES", 1024)
+    text = "id,value\n" + "1,a\n" * 100_000
+    file_path = write_zip(tmp_path, [("bomb.csv", text)], compression=zipfile.ZIP_DEFLATED)
+
+    with pytest.raises(ArchiveLimitError, match="'bomb.csv' expands"):
+        list_members(file_path, is_csv)
+
+    # Small members may compress well without being bombs
+    monkeypatch.setattr(zip_archive, "ZIP_RATIO_MIN_BYTES", len(text) + 1)
+    assert len(list_members(file_path, is_csv)) == 1
+
+
+@pytest.mark.parametrize("name", ["../../evil.csv", "/etc/evil.csv", "a/../../../evil.csv"])
+def test_member_names_cannot_escape_target_dir(tmp_path, name):
+    file_path = write_zip(tmp_path, [(name, CSV_TEXT)])
+    target_dir = tmp_path / "extracted"
+    member = list_members(file_path, is_csv)[0]
+
+    target_path = extract_member(file_path, member.filename, member_path(str(target_dir), 0, member.filename))
+
+    assert os.path.commonpath([os.path.realpath(target_path), os.path.realpath(target_dir)]) \
+        == os.path.realpath(target_dir)
+    with open(target_path) as fp:
+        assert fp.read() == CSV_TEXT
+    assert not (tmp_path.parent / "evil.csv").exists()